@@ -21,14 +21,14 @@ export class AnalysisService {
     
     /**
      * 獲取線性剖面數據
-     * @param imageData 圖像數據
+     * @param imageData 數據集 handle 或圖像數據
      * @param startPoint 起始點
      * @param endPoint 終止點
      * @param scale 物理尺度
      * @param shiftZero 是否將最小值歸零
      * @returns 返回剖面數據
      */
-    static async getLineProfile(imageData: number[][], startPoint: number[], endPoint: number[], scale: number, shiftZero = false) {
+    static async getLineProfile(imageData: number[][] | string, startPoint: number[], endPoint: number[], scale: number, shiftZero = false) {
       try {
         return await window.pywebview.api.get_line_profile(imageData, startPoint, endPoint, scale, shiftZero);
       } catch (error) {
@@ -60,12 +60,12 @@ export class AnalysisService {
 
     /**
      * 應用平面化處理
-     * @param imageData 圖像數據
-     * @param method 平面化方法 ("mean", "polyfit", "plane")
-     * @param degree 多項式階數（當方法為polyfit時使用）
+     * @param imageData 數據集 handle 或圖像數據
+     * @param method 平面化方法 ("mean", "polyfit", "plane", "polynomial")
+     * @param degree 多項式階數（polyfit 為逐行多項式階數，polynomial 為全局曲面階數）
      * @returns 返回處理後的數據
      */
-    static async applyFlatten(imageData: number[][], method: 'mean' | 'polyfit' | 'plane' = 'mean', degree = 1) {
+    static async applyFlatten(imageData: number[][] | string, method: 'mean' | 'polyfit' | 'plane' | 'polynomial' = 'mean', degree = 1) {
       try {
         return await window.pywebview.api.apply_flatten(imageData, method, degree);
       } catch (error) {
@@ -76,12 +76,12 @@ export class AnalysisService {
 
     /**
      * 應用影像傾斜調整
-     * @param imageData 圖像數據
+     * @param imageData 數據集 handle 或圖像數據
      * @param direction 傾斜方向 ("up", "down", "left", "right")
      * @param fineTune 是否為微調模式
      * @returns 返回處理後的數據
      */
-    static async tiltImage(imageData: number[][], direction: 'up' | 'down' | 'left' | 'right', fineTune = false) {
+    static async tiltImage(imageData: number[][] | string, direction: 'up' | 'down' | 'left' | 'right', fineTune = false) {
       try {
         return await window.pywebview.api.tilt_image(imageData, direction, fineTune);
       } catch (error) {
@@ -0,0 +1,132 @@
+// src/services/arrayTransport.ts
+
+/**
+ * 後端以 array_encoding="float32" / "float64" 傳送的二進位陣列
+ */
+export interface EncodedArray {
+  encoding: 'base64';
+  dtype: 'float32' | 'float64' | 'uint16' | 'uint8';
+  shape: number[];
+  data: string;
+  // 量化編碼（uint16/uint8）：物理數值 = offset + 整數值 * scale，整數值等於 nodata 表示無數據
+  offset?: number;
+  scale?: number;
+  nodata?: number;
+  // 由本機 HTTP 數據通道取得時的原始緩衝區（此時 data 為空字串）
+  buffer?: ArrayBuffer;
+}
+
+export type ArrayEncoding = 'list' | 'float32' | 'float64' | 'uint16' | 'uint8';
+
+/**
+ * 判斷是否為二進位編碼的陣列
+ */
+export function isEncodedArray(value: unknown): value is EncodedArray {
+  return !!value && typeof value === 'object' && (value as EncodedArray).encoding === 'base64';
+}
+
+/**
+ * 將 base64 緩衝區解碼為一維 typed array（不逐一解析浮點數）
+ */
+export function decodeTypedArray(value: EncodedArray): Float32Array | Float64Array | Uint16Array | Uint8Array {
+  let bytes: Uint8Array;
+  if (value.buffer) {
+    bytes = new Uint8Array(value.buffer);
+  } else {
+    const binary = atob(value.data);
+    bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+      bytes[i] = binary.charCodeAt(i);
+    }
+  }
+  switch (value.dtype) {
+    case 'float64': return new Float64Array(bytes.buffer);
+    case 'uint16': return new Uint16Array(bytes.buffer);
+    case 'uint8': return bytes;
+    default: return new Float32Array(bytes.buffer);
+  }
+}
+
+/**
+ * 將量化編碼還原為物理數值（無數據為 NaN），非量化編碼直接返回 typed array
+ */
+export function dequantize(value: EncodedArray): Float32Array | Float64Array {
+  const raw = decodeTypedArray(value);
+  if (raw instanceof Float32Array || raw instanceof Float64Array) return raw;
+  const offset = value.offset ?? 0;
+  const scale = value.scale ?? 1;
+  const result = new Float32Array(raw.length);
+  for (let i = 0; i < raw.length; i++) {
+    result[i] = raw[i] === value.nodata ? NaN : offset + raw[i] * scale;
+  }
+  return result;
+}
+
+/**
+ * 將二進位編碼或巢狀列表轉換為二維陣列，每一列是 typed array 的子視圖
+ */
+export function decodeMatrix(value: EncodedArray | number[][]): ArrayLike<number>[] {
+  if (!isEncodedArray(value)) return value;
+  const flat = dequantize(value);
+  const [height, width] = value.shape;
+  const rows: ArrayLike<number>[] = [];
+  for (let y = 0; y < height; y++) {
+    rows.push(flat.subarray(y * width, (y + 1) * width));
+  }
+  return rows;
+}
+
+/**
+ * 將二進位編碼或列表轉換為一維陣列（剖面 distance/height 等）
+ */
+export function decodeVector(value: EncodedArray | number[]): ArrayLike<number> {
+  return isEncodedArray(value) ? dequantize(value) : value;
+}
+
+/**
+ * 本機 HTTP 數據通道的連線資訊（get_data_server_info 的結果）
+ */
+export interface DataServerInfo {
+  enabled: boolean;
+  baseUrl?: string;
+  token?: string;
+  tileSize?: number;
+}
+
+/**
+ * 從本機數據通道取得二進位陣列
+ *
+ * path 例如 `/datasets/${handle}/levels/1`；形狀與量化參數由 X-Array-* 標頭取得，
+ * 結果與 js_api 的 EncodedArray 相同，可直接交給 decodeMatrix。
+ */
+export async function fetchArray(
+  server: DataServerInfo,
+  path: string,
+  dtype: Exclude<ArrayEncoding, 'list'> = 'float32',
+  init?: RequestInit
+): Promise<EncodedArray & { origin?: [number, number] }> {
+  const url = `${server.baseUrl}${path}${path.includes('?') ? '&' : '?'}dtype=${dtype}`;
+  const response = await fetch(url, {
+    ...init,
+    headers: { ...(init?.headers || {}), 'X-Nanodrill-Token': server.token || '' }
+  });
+  if (!response.ok) {
+    const detail = await response.json().catch(() => null);
+    throw new Error(detail?.error || `數據通道請求失敗: ${response.status}`);
+  }
+  const buffer = await response.arrayBuffer();
+  const header = (name: string) => response.headers.get(name);
+  const numberHeader = (name: string) => (header(name) !== null ? Number(header(name)) : undefined);
+  const origin = header('X-Array-Origin')?.split(',').map(Number) as [number, number] | undefined;
+  return {
+    encoding: 'base64',
+    dtype: (header('X-Array-Dtype') || dtype) as EncodedArray['dtype'],
+    shape: (header('X-Array-Shape') || '').split(',').filter(Boolean).map(Number),
+    data: '',
+    offset: numberHeader('X-Array-Offset'),
+    scale: numberHeader('X-Array-Scale'),
+    nodata: numberHeader('X-Array-Nodata'),
+    buffer,
+    origin
+  };
+}
@@ -7,17 +7,70 @@ declare global {
         // 文件操作
         open_folder_dialog: () => Promise<any>;
         get_folder_files: (path: string) => Promise<any>;
+        get_folder_listing: (
+          path?: string | null, 
+          groupByScan?: boolean, 
+          sortOption?: string, 
+          fileType?: string | null, 
+          search?: string | null, 
+          page?: number, 
+          pageSize?: number,
+          offset?: number | null
+        ) => Promise<any>;
         get_txt_file_content: (path: string) => Promise<any>;
-        get_int_file_preview: (path: string, colormap?: string) => Promise<any>;
+        get_int_file_preview: (
+          path: string, 
+          colormap?: string, 
+          channel?: string, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8', 
+          artifacts?: Array<'image' | 'rawData' | 'statistics'> | null
+        ) => Promise<any>;
+        load_scan_channels: (txtPath: string, channels?: string[] | null) => Promise<any>;
+        get_scan_channel: (
+          txtPath: string, 
+          channel: string, 
+          colormap?: string, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8', 
+          artifacts?: Array<'image' | 'rawData' | 'statistics'> | null
+        ) => Promise<any>;
+        start_folder_watch: (path?: string, usePolling?: boolean, pollInterval?: number) => Promise<any>;
+        stop_folder_watch: () => Promise<any>;
+        get_folder_changes: () => Promise<any>;
+        start_thumbnails: (path?: string, size?: number, colormap?: string, channel?: string) => Promise<any>;
+        stop_thumbnails: () => Promise<any>;
+        get_thumbnail_results: () => Promise<any>;
+        start_batch: (
+          path?: string | null, 
+          steps?: Array<{ operation: string; params?: Record<string, any> }> | null, 
+          sourceHandle?: string | null, 
+          numberRange?: [number, number] | null, 
+          outputDir?: string | null, 
+          channel?: string, 
+          colormap?: string, 
+          saveArrays?: boolean, 
+          saveImages?: boolean
+        ) => Promise<any>;
+        stop_batch: () => Promise<any>;
+        get_batch_progress: () => Promise<any>;
         
         // 分析功能
-        analyze_int_file_api: (filePath: string, txtFilePath?: string, colormap?: string) => Promise<any>;
+        analyze_int_file_api: (
+          filePath: string, 
+          txtFilePath?: string, 
+          colormap?: string, 
+          artifacts?: Array<'image' | 'rawData' | 'statistics'> | null, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8', 
+          viewportWidth?: number, 
+          viewportHeight?: number
+        ) => Promise<any>;
+        analyze_dat_file_api: (filePath: string) => Promise<any>;
         get_line_profile: (
-          imageData: number[][], 
+          imageData: number[][] | string, 
           startPoint: number[], 
           endPoint: number[], 
           scale: number, 
-          shiftZero?: boolean
+          shiftZero?: boolean, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8'
         ) => Promise<any>;
         update_profile: (
           profileData: any, 
@@ -29,15 +82,78 @@ declare global {
         
         // 水平調整功能
         apply_flatten: (
-          imageData: number[][], 
+          imageData: number[][] | string, 
           method: string, 
-          degree?: number
+          degree?: number, 
+          returnData?: boolean | null, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8',
+          mask?: boolean[][] | number[][] | null,
+          threshold?: number | null,
+          robust?: boolean,
+          subsample?: number
         ) => Promise<any>;
         tilt_image: (
-          imageData: number[][], 
+          imageData: number[][] | string, 
           direction: string, 
-          fineTune?: boolean
+          fineTune?: boolean, 
+          returnData?: boolean | null, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8'
+        ) => Promise<any>;
+        
+        // 後端數據集（以 handle 指定，不傳送整張影像）
+        process_dataset: (
+          handle: string, 
+          operation: 'flatten' | 'tilt' | 'reset', 
+          params?: Record<string, any>, 
+          returnData?: boolean, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8', 
+          includeStatistics?: boolean | null
+        ) => Promise<any>;
+        get_dataset_statistics: (handle: string) => Promise<any>;
+        get_dataset_preview_image: (handle: string, colormap?: string) => Promise<any>;
+        get_dataset_data: (handle: string, arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8') => Promise<any>;
+        get_dataset_level: (
+          handle: string, 
+          level?: number | null, 
+          viewportWidth?: number, 
+          viewportHeight?: number, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8'
+        ) => Promise<any>;
+        get_dataset_tile: (
+          handle: string, 
+          level: number, 
+          tileX: number, 
+          tileY: number, 
+          tileSize?: number, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8'
+        ) => Promise<any>;
+        release_dataset: (handle: string) => Promise<any>;
+        undo_dataset: (handle: string, returnData?: boolean, arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8') => Promise<any>;
+        redo_dataset: (handle: string, returnData?: boolean, arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8') => Promise<any>;
+        get_dataset_pipeline: (handle: string) => Promise<any>;
+        update_pipeline_step: (
+          handle: string, 
+          index: number, 
+          params: Record<string, any>, 
+          returnData?: boolean, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8'
+        ) => Promise<any>;
+        remove_pipeline_step: (
+          handle: string, 
+          index: number, 
+          returnData?: boolean, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8'
+        ) => Promise<any>;
+        apply_pipeline: (
+          handle: string, 
+          steps?: Array<{ operation: string; params?: Record<string, any> }> | null, 
+          sourceHandle?: string | null, 
+          returnData?: boolean, 
+          arrayEncoding?: 'list' | 'float32' | 'float64' | 'uint16' | 'uint8'
         ) => Promise<any>;
+        start_data_server: (port?: number) => Promise<any>;
+        stop_data_server: () => Promise<any>;
+        get_data_server_info: () => Promise<any>;
       };
     };
   }
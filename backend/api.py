@@ -1,10 +1,21 @@
 import os
-import re
+import json
 import logging
+import threading
+from collections import OrderedDict, deque
 import webview
-import numpy as np
 from datetime import datetime
 from core.analysis_service import AnalysisService
+from core.metadata_cache import get_metadata_cache
+from core.folder_index import get_folder_index
+from core.folder_watcher import FolderWatcher, FolderChangeQueue
+from core.scan_loader import ScanLoader
+from core.scan_prefetcher import ScanPrefetcher
+from core.thumbnail_service import ThumbnailGenerator
+from core.batch_processor import BatchProcessor
+from core.dataset_registry import get_dataset_registry
+from core.data_server import DataServer
+from core.array_transport import encode_array, decode_array, encode_profile, decode_profile
 from core.analysis.int_analysis import IntAnalysis
 from core.analysis.profile_analysis import ProfileAnalysis
 
@@ -17,10 +28,33 @@ logger = logging.getLogger(__name__)
 class NanodrillAPI:
     """SPM 數據分析器的後端 API 類別"""
     
+    # 記憶體中最多保留的多通道掃描數
+    MAX_SCAN_BUNDLES = 4
+    
+    # 尚未以 get_thumbnail_results 取走的縮圖批次上限（前端以事件接收時不會有人取走）
+    MAX_PENDING_THUMBNAIL_BATCHES = 32
+    
+    # 檔案選擇器預覽預設產生的項目（不傳送原始數據）
+    PREVIEW_ARTIFACTS = ("image", "statistics")
+    
     def __init__(self):
         """初始化 API"""
         self.window = None
         self.current_directory = ""
+        self._folder_watcher = None
+        self._folder_changes = FolderChangeQueue()
+        # 已載入的多通道掃描，切換通道時不需重新讀取磁碟
+        self._scan_bundles = OrderedDict()
+        # 背景預載編號相鄰的掃描預覽
+        self._prefetcher = ScanPrefetcher(self._prefetch_int_preview)
+        self._thumbnail_generator = None
+        self._thumbnail_results = deque(maxlen=self.MAX_PENDING_THUMBNAIL_BATCHES)
+        self._thumbnail_results_dropped = 0
+        self._thumbnail_results_lock = threading.Lock()
+        self._batch_processor = None
+        self._batch_progress = None
+        # 本機 HTTP 數據通道（由 app.py 啟動）
+        self._data_server = None
     
     def open_folder_dialog(self):
         """打開資料夾選擇對話框"""
@@ -35,13 +69,12 @@ class NanodrillAPI:
                 self.current_directory = selected_path
                 logger.info(f"選擇的資料夾路徑: {selected_path}")
                 
-                # 獲取資料夾中的檔案
-                files = self.get_folder_files(selected_path)
+                # 開始監看資料夾中新增的掃描
+                self.start_folder_watch(selected_path)
                 
                 return {
                     "success": True,
-                    "directory": selected_path,
-                    "files": files
+                    "directory": selected_path
                 }
             else:
                 logger.info("沒有選擇資料夾")
@@ -64,36 +97,246 @@ class NanodrillAPI:
                 
             if not folder_path or not os.path.exists(folder_path):
                 return []
-                
-            files = []
-            
-            # 獲取所有 .txt、.dat 和 .int 檔案
-            for filename in os.listdir(folder_path):
-                if filename.endswith(('.txt', '.dat', '.int')):
-                    file_path = os.path.join(folder_path, filename)
-                    
-                    # 嘗試從檔名中提取編號
-                    number_match = re.search(r'_(\d+)\.', filename)
-                    number = int(number_match.group(1)) if number_match else 0
-                    
-                    # 獲取檔案修改時間
-                    mod_time = os.path.getmtime(file_path)
-                    
-                    # 添加到檔案列表
-                    files.append({
-                        "name": filename,
-                        "path": file_path,
-                        "number": number,
-                        "type": filename.split('.')[-1],
-                        "modTime": mod_time,
-                        "modTimeStr": datetime.fromtimestamp(mod_time).strftime('%Y/%m/%d %H:%M:%S')
-                    })
-            
-            return files
+            
+            # 使用資料夾索引（單次目錄走訪並快取 stat 結果）
+            index = get_folder_index(folder_path)
+            return [index.describe_file(name) for name in index.list_files()]
         except Exception as e:
             logger.error(f"獲取資料夾檔案時出錯: {str(e)}")
             return []
     
+    def get_folder_listing(self, folder_path=None, group_by_scan=False, sort_option="number_asc",
+                           file_type=None, search=None, page=0, page_size=500, offset=None):
+        """分頁獲取資料夾的檔案列表，可依掃描編號分組
+        
+        Args:
+            folder_path: 資料夾路徑，預設為目前資料夾
+            group_by_scan: 是否將標頭與通道檔案分組為一個掃描
+            sort_option: 排序選項，如 "number_asc"、"time_desc"、"name_asc"
+            file_type: 只列出指定副檔名（如 "txt"），None 表示全部
+            search: 檔名搜尋字串
+            page: 頁碼（從 0 開始）
+            page_size: 每頁項目數
+            offset: 起始項目位置，指定時取代 page * page_size
+        
+        Returns:
+            包含當頁項目與分頁資訊的字典
+        """
+        try:
+            if folder_path is None:
+                folder_path = self.current_directory
+                
+            if not folder_path or not os.path.exists(folder_path):
+                return {"success": False, "error": f"資料夾不存在: {folder_path}"}
+            
+            listing = get_folder_index(folder_path).get_listing(
+                group_by_scan=group_by_scan,
+                sort_option=sort_option,
+                file_type=file_type,
+                search=search,
+                page=page,
+                page_size=page_size,
+                offset=offset
+            )
+            listing["success"] = True
+            return listing
+        except Exception as e:
+            logger.error(f"獲取資料夾列表時出錯: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def start_folder_watch(self, folder_path=None, use_polling=False, poll_interval=2.0):
+        """開始監看資料夾的增量變更
+        
+        變更會推送到前端的 'nanodrill-folder-changes' 事件，也可以用 get_folder_changes 取得。
+        
+        Args:
+            folder_path: 要監看的資料夾，預設為目前資料夾
+            use_polling: 是否強制使用輪詢（網路掛載的資料夾上 inotify 看不到遠端寫入）
+            poll_interval: 輪詢間隔（秒）
+        """
+        try:
+            if folder_path is None:
+                folder_path = self.current_directory
+            if not folder_path or not os.path.isdir(folder_path):
+                return {"success": False, "error": f"資料夾不存在: {folder_path}"}
+            
+            self.stop_folder_watch()
+            self._folder_watcher = FolderWatcher(
+                folder_path,
+                on_changes=self._on_folder_changes,
+                poll_interval=poll_interval,
+                use_inotify=not use_polling
+            )
+            self._folder_watcher.start()
+            return {"success": True, "directory": os.path.abspath(folder_path)}
+        except Exception as e:
+            logger.error(f"開始監看資料夾時出錯: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def stop_folder_watch(self):
+        """停止監看資料夾"""
+        if self._folder_watcher is not None:
+            self._folder_watcher.stop(timeout=2.0)
+            self._folder_watcher = None
+        self._folder_changes.clear()
+        return {"success": True}
+    
+    def get_folder_changes(self):
+        """取得並清空自上次呼叫以來累積的資料夾變更（每個檔名合併為一筆淨變更）
+        
+        Returns:
+            'changes' 為 {"directory", "added", "modified", "removed", "scans", "removedScans"}，
+            沒有變更時為 None；"scans" 為受影響掃描目前的描述（格式同 get_folder_listing 的分組項目），
+            "removedScans" 為已不存在的掃描鍵，前端以此在本地更新列表而不需重新載入
+        """
+        changes = self._folder_changes.drain()
+        if changes is not None:
+            names = [info["name"] for info in changes["added"] + changes["modified"]] + changes["removed"]
+            index = get_folder_index(changes["directory"], refresh=False)
+            changes["scans"], changes["removedScans"] = index.describe_scans_for_files(names)
+        return {"success": True, "changes": changes}
+    
+    def _on_folder_changes(self, changes):
+        """FolderWatcher 的回呼：暫存變更並推送到前端"""
+        self._folder_changes.push(changes)
+        
+        self._dispatch_event('nanodrill-folder-changes', changes)
+    
+    def start_thumbnails(self, folder_path=None, size=128, colormap="viridis", channel="TopoFwd"):
+        """開始為資料夾中所有掃描產生縮圖
+        
+        縮圖在程序池中產生並快取在磁碟上，完成的結果會分批推送到前端的 'nanodrill-thumbnails' 事件，
+        也可以用 get_thumbnail_results 取得。開始新的資料夾時會停止先前的工作。
+        
+        Returns:
+            包含掃描總數 'total' 的字典
+        """
+        try:
+            if folder_path is None:
+                folder_path = self.current_directory
+            if not folder_path or not os.path.isdir(folder_path):
+                return {"success": False, "error": f"資料夾不存在: {folder_path}"}
+            
+            self.stop_thumbnails()
+            self._thumbnail_generator = ThumbnailGenerator(
+                folder_path, size=size, colormap=colormap, channel=channel,
+                on_results=self._on_thumbnail_results
+            )
+            total = self._thumbnail_generator.start()
+            return {"success": True, "directory": os.path.abspath(folder_path), "total": total}
+        except Exception as e:
+            logger.error(f"開始產生縮圖時出錯: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return {"success": False, "error": str(e)}
+    
+    def stop_thumbnails(self):
+        """停止產生縮圖"""
+        if self._thumbnail_generator is not None:
+            self._thumbnail_generator.stop(timeout=5.0)
+            self._thumbnail_generator = None
+        with self._thumbnail_results_lock:
+            self._thumbnail_results.clear()
+            self._thumbnail_results_dropped = 0
+        return {"success": True}
+    
+    def get_thumbnail_results(self):
+        """取得並清空自上次呼叫以來完成的縮圖批次
+        
+        最多保留 MAX_PENDING_THUMBNAIL_BATCHES 個批次，超過時捨棄最舊的批次並在 'dropped' 中回報數量；
+        縮圖已快取在磁碟上，可以重新呼叫 start_thumbnails 立即取回。
+        """
+        with self._thumbnail_results_lock:
+            results = list(self._thumbnail_results)
+            dropped = self._thumbnail_results_dropped
+            self._thumbnail_results.clear()
+            self._thumbnail_results_dropped = 0
+        return {"success": True, "batches": results, "dropped": dropped}
+    
+    def _on_thumbnail_results(self, batch):
+        """ThumbnailGenerator 的回呼：暫存結果並推送到前端"""
+        with self._thumbnail_results_lock:
+            if len(self._thumbnail_results) == self._thumbnail_results.maxlen:
+                self._thumbnail_results_dropped += 1
+            self._thumbnail_results.append(batch)
+        
+        self._dispatch_event('nanodrill-thumbnails', batch)
+    
+    def start_batch(self, folder_path=None, steps=None, source_handle=None, number_range=None, output_dir=None,
+                    channel="TopoFwd", colormap="viridis", save_arrays=True, save_images=True):
+        """對資料夾中的掃描批次套用相同的處理步驟
+        
+        每個掃描在程序池中處理，統計數據寫入輸出資料夾的 statistics.csv，處理後的陣列與影像
+        寫入同一資料夾。進度會推送到前端的 'nanodrill-batch' 事件，也可以用 get_batch_progress 取得。
+        
+        Args:
+            folder_path: 資料夾路徑，None 時使用目前的資料夾
+            steps: 處理步驟列表（格式與 get_dataset_pipeline 的 "steps" 相同）
+            source_handle: 改為使用此數據集目前已套用的步驟
+            number_range: [起始, 結束] 掃描編號（包含兩端），None 表示全部
+            output_dir: 輸出資料夾，None 時為資料夾下的 nanodrill_batch
+        
+        Returns:
+            包含掃描總數 'total' 與輸出資料夾 'outputDir' 的字典
+        """
+        try:
+            if folder_path is None:
+                folder_path = self.current_directory
+            if not folder_path or not os.path.isdir(folder_path):
+                return {"success": False, "error": f"資料夾不存在: {folder_path}"}
+            
+            if source_handle is not None:
+                source = get_dataset_registry().get(source_handle)
+                steps = source.pipeline.steps[:source.pipeline.position]
+            
+            stopped = self.stop_batch()
+            if not stopped["success"]:
+                return stopped
+            self._batch_processor = BatchProcessor(
+                folder_path, steps or [], output_dir=output_dir, channel=channel, number_range=number_range,
+                colormap=colormap, save_arrays=bool(save_arrays), save_images=bool(save_images),
+                on_progress=self._on_batch_progress
+            )
+            total = self._batch_processor.start()
+            return {"success": True, "directory": os.path.abspath(folder_path), "total": total,
+                    "outputDir": self._batch_processor.output_dir}
+        except Exception as e:
+            logger.error(f"開始批次處理時出錯: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return {"success": False, "error": str(e)}
+    
+    def stop_batch(self):
+        """停止批次處理（已完成的掃描仍會寫入 CSV）"""
+        if self._batch_processor is not None:
+            self._batch_processor.stop(timeout=30.0)
+            if self._batch_processor.is_running:
+                # 保留處理器，避免在舊的處理結束前開始新的批次而寫入相同的輸出檔
+                return {"success": False, "error": "上一次批次處理仍在結束中，請稍後再試"}
+            self._batch_processor = None
+        return {"success": True}
+    
+    def get_batch_progress(self):
+        """取得最近一次的批次處理進度"""
+        return {"success": True, "progress": self._batch_progress,
+                "running": self._batch_processor is not None and self._batch_processor.is_running}
+    
+    def _on_batch_progress(self, progress):
+        """BatchProcessor 的回呼：保留最新進度並推送到前端"""
+        self._batch_progress = progress
+        self._dispatch_event('nanodrill-batch', progress)
+    
+    def _dispatch_event(self, name, detail):
+        """在前端視窗觸發 CustomEvent"""
+        if webview.windows:
+            try:
+                webview.windows[0].evaluate_js(
+                    f"window.dispatchEvent(new CustomEvent('{name}', "
+                    f"{{ detail: {json.dumps(detail)} }}))"
+                )
+            except Exception as e:
+                logger.warning(f"推送事件 {name} 到前端失敗: {str(e)}")
+    
     def get_txt_file_content(self, file_path):
         """獲取 txt 檔案的內容及其相關檔案"""
         try:
@@ -101,12 +344,9 @@ class NanodrillAPI:
             if not os.path.exists(file_path):
                 return {"success": False, "error": f"檔案不存在: {file_path}"}
             
-            # 讀取 txt 檔案內容
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            # 解析基本參數
-            parameters = self._parse_txt_parameters(content)
+            # 從元數據快取取得 txt 檔案內容與參數
+            content = get_metadata_cache().get_content(file_path)
+            parameters = self._load_txt_parameters(file_path)
             
             # 檢查是否有相關的 .dat 和 .int 檔案
             basename = os.path.basename(file_path)
@@ -115,16 +355,18 @@ class NanodrillAPI:
             
             related_files = []
             
-            # 從檔案描述中尋找相關檔案
+            # 從檔案描述中尋找相關檔案（使用資料夾索引快取的 stat 結果）
+            index = get_folder_index(directory)
             if "FileDescriptions" in parameters:
                 for desc in parameters["FileDescriptions"]:
                     if "FileName" in desc:
                         rel_filename = desc["FileName"]
                         rel_path = os.path.join(directory, rel_filename)
+                        file_info = index.get_file_info(rel_filename)
                         
-                        if os.path.exists(rel_path):
+                        if file_info is not None:
                             file_type = rel_filename.split('.')[-1]
-                            mod_time = os.path.getmtime(rel_path)
+                            mod_time = file_info["mtime"]
                             
                             related_files.append({
                                 "name": rel_filename,
@@ -147,8 +389,38 @@ class NanodrillAPI:
             logger.error(f"獲取 TXT 檔案內容時出錯: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    def get_int_file_preview(self, txt_file_path, colormap="Oranges"):
-        """為預覽獲取與 txt 檔案相關聯的 TopoFwd.int 檔案圖像，並使用指定的色彩映射"""
+    def get_int_file_preview(self, txt_file_path, colormap="Oranges", channel="TopoFwd", array_encoding="list",
+                             artifacts=None):
+        """為預覽獲取與 txt 檔案相關聯的通道 .int 檔案圖像（預設為 TopoFwd），並使用指定的色彩映射
+        
+        已預載的掃描直接返回；成功後在背景預載編號相鄰的掃描，並取消先前尚未執行的預載。
+        artifacts 預設為靜態預覽圖與統計數據（PREVIEW_ARTIFACTS），要求 "rawData" 時才登錄數據集
+        （只在此處開啟時登錄，預載相鄰掃描時不登錄）；
+        array_encoding 指定 rawData 的編碼（見 core.array_transport.ARRAY_ENCODINGS）。
+        """
+        artifacts = tuple(sorted(AnalysisService.resolve_artifacts(artifacts or self.PREVIEW_ARTIFACTS)))
+        result = self._prefetcher.get(txt_file_path, colormap, channel, array_encoding, artifacts)
+        if result is None:
+            result = self._build_int_preview(txt_file_path, colormap, channel, array_encoding, artifacts)
+        if result.get("success"):
+            self._prefetcher.schedule(txt_file_path, colormap, channel, array_encoding, artifacts)
+        return result
+    
+    def _prefetch_int_preview(self, txt_file_path, colormap="Oranges", channel="TopoFwd", array_encoding="list",
+                              artifacts=PREVIEW_ARTIFACTS):
+        """預載相鄰掃描的預覽結果
+        
+        要求 "rawData" 時結果會登錄數據集，因此只解碼掃描並寫入掃描快取（返回 None 不保存結果），
+        使用者實際開啟時才由 _build_int_preview 從快取載入並登錄。
+        """
+        if "rawData" not in artifacts:
+            return self._build_int_preview(txt_file_path, colormap, channel, array_encoding, artifacts)
+        self._build_int_preview(txt_file_path, colormap, channel, array_encoding, ("statistics",))
+        return None
+    
+    def _build_int_preview(self, txt_file_path, colormap="Oranges", channel="TopoFwd", array_encoding="list",
+                           artifacts=PREVIEW_ARTIFACTS):
+        """讀取並生成單一掃描的預覽結果"""
         try:
             # 檢查 txt 檔案是否存在
             logger.info(f"[預覽] 嘗試預覽檔案: {txt_file_path}")
@@ -165,19 +437,16 @@ class NanodrillAPI:
             
             # 獲取 txt 檔案的內容和參數
             try:
-                with open(txt_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    
                 # 解析參數
-                parameters = self._parse_txt_parameters(content)
+                parameters = self._load_txt_parameters(txt_file_path)
                 
-                # 從檔案描述中尋找 TopoFwd.int 檔案
+                # 從檔案描述中尋找通道的 .int 檔案
                 topo_file = None
                 directory = os.path.dirname(txt_file_path)
                 
                 if "FileDescriptions" in parameters:
                     for desc in parameters["FileDescriptions"]:
-                        if "FileName" in desc and "TopoFwd" in desc["FileName"] and desc["FileName"].lower().endswith(".int"):
+                        if "FileName" in desc and channel in desc["FileName"] and desc["FileName"].lower().endswith(".int"):
                             topo_file_name = desc["FileName"]
                             topo_file_path = os.path.join(directory, topo_file_name)
                             
@@ -191,8 +460,8 @@ class NanodrillAPI:
                                 break
                 
                 if not topo_file:
-                    logger.error(f"找不到相關的 TopoFwd.int 檔案，txt 檔案: {txt_file_path}")
-                    return {"success": False, "error": "找不到相關的 TopoFwd.int 檔案"}
+                    logger.error(f"找不到相關的 {channel}.int 檔案，txt 檔案: {txt_file_path}")
+                    return {"success": False, "error": f"找不到相關的 {channel}.int 檔案"}
                 
                 # 使用 AnalysisService 來生成預覽圖
                 file_info = {
@@ -204,7 +473,10 @@ class NanodrillAPI:
                 logger.info(f"開始生成預覽圖，scale: {file_info['scale']}, unit: {file_info['physUnit']}, colormap: {colormap}")
                 
                 # 調用 AnalysisService 處理 INT 檔案
-                preview_result = AnalysisService.analyze_int_file(topo_file["path"], file_info, colormap)
+                preview_result = AnalysisService.analyze_int_file(topo_file["path"], file_info, colormap,
+                                                                  register="rawData" in artifacts,
+                                                                  artifacts=artifacts,
+                                                                  array_encoding=array_encoding)
                 
                 return preview_result
                 
@@ -220,8 +492,18 @@ class NanodrillAPI:
             logger.error(traceback.format_exc())
             return {"success": False, "error": f"獲取預覽圖時發生錯誤: {str(e)}"}
 
-    def analyze_int_file_api(self, int_file_path, txt_file_path=None, colormap="Oranges"):
-        """分析指定的 INT 檔案，可選提供相關的 TXT 檔案路徑獲取參數"""
+    def analyze_int_file_api(self, int_file_path, txt_file_path=None, colormap="Oranges", artifacts=None,
+                             array_encoding="list", viewport_width=None, viewport_height=None):
+        """分析指定的 INT 檔案，可選提供相關的 TXT 檔案路徑獲取參數
+        
+        結果中的 'handle' 指向後端保留的數據集，可傳給 apply_flatten、tilt_image、get_line_profile 等方法；
+        artifacts 指定要產生的項目（"image"、"rawData"、"statistics"），預設不繪製靜態預覽圖，
+        以 handle 操作時可省略 "rawData"；
+        array_encoding 為 "float32"/"float64" 時 rawData 以 base64 二進位傳送，為 "uint16"/"uint8" 時傳送
+        附 offset/scale 的量化顯示數據（完整精度保留在後端）；
+        指定 viewport_width/viewport_height 時 rawData 只包含符合顯示尺寸的金字塔層級，
+        放大時以 get_dataset_tile 取得高解析度圖塊。
+        """
         try:
             # 檢查 INT 檔案是否存在
             logger.info(f"[分析] 嘗試分析檔案: {int_file_path}")
@@ -240,30 +522,20 @@ class NanodrillAPI:
             parameters = {}
             if txt_file_path and os.path.exists(txt_file_path):
                 try:
-                    with open(txt_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                    parameters = self._parse_txt_parameters(content)
+                    parameters = self._load_txt_parameters(txt_file_path)
                     logger.info(f"從 TXT 檔案 {txt_file_path} 獲取參數")
                 except Exception as e:
                     logger.warning(f"無法解析 TXT 檔案 {txt_file_path}: {str(e)}")
             else:
-                # 尋找可能的 txt 檔案
-                directory = os.path.dirname(int_file_path)
-                int_filename = os.path.basename(int_file_path)
-                
-                # 嘗試從檔名獲取 txt 檔案名
-                base_name = int_filename.split('_')[0]
-                for filename in os.listdir(directory):
-                    if filename.endswith('.txt') and filename.startswith(base_name):
-                        txt_file_path = os.path.join(directory, filename)
-                        try:
-                            with open(txt_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content = f.read()
-                            parameters = self._parse_txt_parameters(content)
-                            logger.info(f"自動找到並從 TXT 檔案 {txt_file_path} 獲取參數")
-                            break
-                        except Exception as e:
-                            logger.warning(f"無法解析 TXT 檔案 {txt_file_path}: {str(e)}")
+                # 從資料夾索引尋找對應的 txt 檔案
+                directory = os.path.dirname(os.path.abspath(int_file_path))
+                txt_file_path = get_folder_index(directory).find_txt_file(int_file_path)
+                if txt_file_path:
+                    try:
+                        parameters = self._load_txt_parameters(txt_file_path)
+                        logger.info(f"自動找到並從 TXT 檔案 {txt_file_path} 獲取參數")
+                    except Exception as e:
+                        logger.warning(f"無法解析 TXT 檔案 {txt_file_path}: {str(e)}")
             
             # 從檔案描述中尋找本 int 檔的比例尺
             scale = None
@@ -297,9 +569,16 @@ class NanodrillAPI:
                 "parameters": parameters
             }
             
+            viewport_size = None
+            if viewport_width and viewport_height:
+                viewport_size = (int(viewport_width), int(viewport_height))
+            
             # 使用 AnalysisService 來處理 .int 檔案分析
             logger.info(f"開始分析 INT 檔案，scale: {scale}, unit: {phys_unit}, colormap: {colormap}")
-            return AnalysisService.analyze_int_file(int_file_path, file_info, colormap)
+            return AnalysisService.analyze_int_file(int_file_path, file_info, colormap,
+                                                    artifacts=artifacts,
+                                                    array_encoding=array_encoding,
+                                                    viewport_size=viewport_size)
             
         except Exception as e:
             logger.error(f"分析 INT 檔案時出錯: {str(e)}")
@@ -307,188 +586,428 @@ class NanodrillAPI:
             logger.error(traceback.format_exc())
             return {"success": False, "error": f"分析 INT 檔案時發生錯誤: {str(e)}"}
             
-    def analyze_int_file(self, file_path, parent_file_info=None, colormap="Oranges"):
+    def analyze_int_file(self, file_path, parent_file_info=None, colormap="Oranges", artifacts=None):
         """分析 .int 檔案，使用指定的色彩映射"""
         try:
             # 呼叫 AnalysisService 來處理 .int 檔案分析
-            return AnalysisService.analyze_int_file(file_path, parent_file_info, colormap)
+            return AnalysisService.analyze_int_file(file_path, parent_file_info, colormap, artifacts=artifacts)
         except Exception as e:
             logger.error(f"分析 INT 檔案時出錯: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    def _parse_txt_parameters(self, content):
-        """解析 txt 檔案中的參數"""
-        parameters = {}
-        
-        # 提取版本資訊
-        version_match = re.search(r'Version\s*:\s*([^\n]+)', content)
-        if version_match:
-            parameters['Version'] = version_match.group(1).strip()
-        
-        # 提取日期和時間
-        date_match = re.search(r'Date\s*:\s*([^\n]+)', content)
-        if date_match:
-            parameters['Date'] = date_match.group(1).strip()
-        
-        time_match = re.search(r'Time\s*:\s*([^\n]+)', content)
-        if time_match:
-            parameters['Time'] = time_match.group(1).strip()
-        
-        # 提取用戶名
-        username_match = re.search(r'UserName\s*:\s*([^\n]+)', content)
-        if username_match:
-            parameters['UserName'] = username_match.group(1).strip()
-        
-        # 提取掃描參數
-        scan_params = [
-            'SetPoint', 'SetPointPhysUnit', 'FeedBackModus', 'Bias', 'BiasPhysUnit',
-            'Ki', 'Kp', 'FeedbackOnCh', 'XScanRange', 'YScanRange', 'XPhysUnit',
-            'YPhysUnit', 'Speed', 'LineRate', 'Angle', 'xPixel', 'yPixel',
-            'yCenter', 'xCenter', 'LockInFreq', 'LockInFreqPhysUnit', 'LockInAmpl',
-            'LockInAmplPhysUnit'
-        ]
-        
-        for param in scan_params:
-            pattern = fr'{param}\s*:\s*([^\n]+)'
-            match = re.search(pattern, content)
-            if match:
-                parameters[param] = match.group(1).strip()
-        
-        # 解析檔案描述區段
-        file_descriptions = []
-        file_desc_pattern = r'FileDescBegin(.*?)FileDescEnd'
-        file_descs = re.findall(file_desc_pattern, content, re.DOTALL)
-        
-        for desc_content in file_descs:
-            desc = {}
-            
-            # 提取文件名
-            filename_match = re.search(r'FileName\s*:\s*([^\n]+)', desc_content)
-            if filename_match:
-                desc['FileName'] = filename_match.group(1).strip()
-            
-            # 提取標題
-            caption_match = re.search(r'Caption\s*:\s*([^\n]+)', desc_content)
-            if caption_match:
-                desc['Caption'] = caption_match.group(1).strip()
-            
-            # 提取比例因子
-            scale_match = re.search(r'Scale\s*:\s*([^\n]+)', desc_content)
-            if scale_match:
-                desc['Scale'] = scale_match.group(1).strip()
-            
-            # 提取物理單位
-            unit_match = re.search(r'PhysUnit\s*:\s*([^\n]+)', desc_content)
-            if unit_match:
-                desc['PhysUnit'] = unit_match.group(1).strip()
-            
-            # 提取偏移量
-            offset_match = re.search(r'Offset\s*:\s*([^\n]+)', desc_content)
-            if offset_match:
-                desc['Offset'] = offset_match.group(1).strip()
-            
-            file_descriptions.append(desc)
+    def load_scan_channels(self, txt_file_path, channels=None):
+        """同時載入一個掃描的全部或指定通道，並保留在記憶體中
         
-        parameters['FileDescriptions'] = file_descriptions
+        Args:
+            txt_file_path: 掃描的 .txt 標頭檔案
+            channels: 通道標題列表（如 ["TopoFwd", "TopoBwd"]），None 表示全部
         
+        Returns:
+            包含共用尺寸與各通道比例、單位、統計數據的字典（不含影像數據）
+        """
+        try:
+            if not os.path.exists(txt_file_path):
+                return {"success": False, "error": f"檔案不存在: {txt_file_path}"}
+            
+            bundle = ScanLoader(txt_file_path).load(channels)
+            self._store_scan_bundle(bundle)
+            
+            return {
+                "success": True,
+                "dimensions": bundle["dimensions"],
+                "channels": [
+                    {
+                        "caption": caption,
+                        "fileName": channel["fileName"],
+                        "scale": channel["scale"],
+                        "physUnit": channel["physUnit"],
+                        "statistics": IntAnalysis.get_topo_stats(channel["data"])
+                    }
+                    for caption, channel in bundle["channels"].items()
+                ],
+                "loadTime": bundle["loadTime"]
+            }
+        except Exception as e:
+            logger.error(f"載入掃描通道時出錯: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return {"success": False, "error": str(e)}
+    
+    def get_scan_channel(self, txt_file_path, channel, colormap="Oranges", array_encoding="list", artifacts=None):
+        """取得已載入掃描的單一通道（格式與 analyze_int_file_api 相同），未載入時才讀取磁碟"""
+        try:
+            key = os.path.abspath(txt_file_path)
+            bundle = self._scan_bundles.get(key)
+            if bundle is None or channel not in bundle["channels"]:
+                loaded = ScanLoader(txt_file_path).load([channel])
+                if bundle is None:
+                    bundle = loaded
+                else:
+                    bundle["channels"].update(loaded["channels"])
+                self._store_scan_bundle(bundle)
+            
+            if channel not in bundle["channels"]:
+                return {"success": False, "error": f"找不到通道: {channel}"}
+            
+            data = bundle["channels"][channel]
+            dimensions = bundle["dimensions"]
+            return AnalysisService.analyze_image_data(
+                data["data"], data["fileName"], dimensions["xRange"], dimensions["yRange"],
+                data["physUnit"] or "nm", colormap, register=True, source=data["path"],
+                artifacts=artifacts, array_encoding=array_encoding
+            )
+        except Exception as e:
+            logger.error(f"取得掃描通道時出錯: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def _store_scan_bundle(self, bundle):
+        """保存多通道數據組，超過上限時移除最久未使用的掃描"""
+        key = bundle["txtPath"]
+        self._scan_bundles[key] = bundle
+        self._scan_bundles.move_to_end(key)
+        while len(self._scan_bundles) > self.MAX_SCAN_BUNDLES:
+            self._scan_bundles.popitem(last=False)
+    
+    def analyze_dat_file_api(self, dat_file_path):
+        """分析 .dat 光譜檔案，單位從對應 TXT 檔案的檔案描述取得"""
+        try:
+            logger.info(f"[分析] 嘗試分析光譜檔案: {dat_file_path}")
+            _, ext = os.path.splitext(dat_file_path)
+            if ext.lower() != '.dat':
+                return {"success": False, "error": f"檔案類型必須是 .dat 而不是 {ext}"}
+            
+            return AnalysisService.analyze_dat_file(dat_file_path)
+        except Exception as e:
+            logger.error(f"分析 DAT 檔案時出錯: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def _load_txt_parameters(self, file_path):
+        """經由元數據快取取得 txt 檔案的參數，檔案未變更時不會重新讀取"""
+        parameters, file_descriptions = get_metadata_cache().get_header(file_path)
+        parameters['FileDescriptions'] = file_descriptions
         return parameters
     
-    def apply_flatten(self, image_data, method="mean", degree=1):
+    def apply_flatten(self, image_data, method="mean", degree=1, return_data=None, array_encoding="list",
+                      mask=None, threshold=None, robust=False, subsample=1):
         """應用平面化處理
         
         Args:
-            image_data: 2D數組形式的圖像數據
-            method: 平面化方法 ("mean", "polyfit" 或 "plane")
-            degree: 使用 polyfit 方法時的多項式階數
+            image_data: 數據集 handle，或 2D數組形式（巢狀列表或二進位編碼）的圖像數據
+            method: 平面化方法 ("mean", "polyfit", "plane" 或 "polynomial")
+            degree: polyfit 的逐行多項式階數，或 polynomial 的曲面階數
+            return_data: 是否返回處理後的完整數據；None 時傳入 handle 不返回、傳入數組則返回
+            array_encoding: processed_data 的編碼（見 core.array_transport.ARRAY_ENCODINGS）
+            mask: 背景遮罩（與數據同尺寸，True 為背景像素），只以遮罩內的像素擬合
+            threshold: 高度閾值，高於閾值的像素（島嶼、顆粒等）不參與擬合
+            robust: 是否迭代剔除殘差過大的像素
+            subsample: 擬合時的取樣間隔，大型掃描可降低擬合成本
         
         Returns:
             包含處理後數據的字典
         """
         try:
-            # 將前端發送的數據轉換為numpy數組
-            image_data_array = np.array(image_data)
-            
-            # 根據方法選擇不同的平面化處理
-            if method == "mean":
-                result = IntAnalysis.linewise_flatten_mean(image_data_array)
-            elif method == "polyfit":
-                result = IntAnalysis.linewise_flatten_polyfit(image_data_array, deg=degree)
-            elif method == "plane":
-                result = IntAnalysis.plane_flatten(image_data_array)
-            else:
-                return {"success": False, "error": f"未知的平面化方法: {method}"}
-            
-            # 將處理結果轉換回列表格式，以便前端使用
-            result_list = result.tolist()
-            
-            # 計算基本統計數據
-            stats = {
-                "min": float(np.min(result)),
-                "max": float(np.max(result)),
-                "mean": float(np.mean(result)),
-                "median": float(np.median(result)),
-                "std": float(np.std(result)),
-                "rms": float(np.sqrt(np.mean(np.square(result - np.mean(result)))))
-            }
-            
-            return {
-                "success": True,
-                "processed_data": result_list,
-                "statistics": stats
-            }
+            params = {"method": method, "degree": degree}
+            # 只記錄有指定的擬合選項，處理管線中的步驟保持簡潔
+            options = {"mask": mask, "threshold": threshold, "robust": robust or None,
+                       "subsample": subsample if subsample and int(subsample) > 1 else None}
+            params.update({key: value for key, value in options.items() if value is not None})
+            return self._process_image(image_data, "flatten", params, return_data, array_encoding)
         except Exception as e:
             logger.error(f"平面化處理失敗: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
             return {"success": False, "error": str(e)}
         
-    def tilt_image(self, image_data, direction, fine_tune=False):
+    def tilt_image(self, image_data, direction, fine_tune=False, return_data=None, array_encoding="list"):
         """應用影像傾斜調整
         
         Args:
-            image_data: 2D數組形式的圖像數據
+            image_data: 數據集 handle，或 2D數組形式（巢狀列表或二進位編碼）的圖像數據
             direction: 傾斜方向 ("up", "down", "left", "right")
             fine_tune: 是否為微調模式
+            return_data: 是否返回處理後的完整數據；None 時傳入 handle 不返回、傳入數組則返回
+            array_encoding: processed_data 的編碼（見 core.array_transport.ARRAY_ENCODINGS）
         
         Returns:
-            包含處理後數據的字典
+            包含處理後數據的字典；傳入 handle 時只返回更新後的平面係數，
+            統計數據可另以 get_dataset_statistics 取得
         """
         try:
-            # 將前端發送的數據轉換為numpy數組
-            image_data_array = np.array(image_data)
-            
-            # 應用傾斜調整
-            result = IntAnalysis.tilt_image(image_data_array, direction, fine_tune=fine_tune)
-            
-            # 將處理結果轉換回列表格式
-            result_list = result.tolist()
-            
-            # 計算基本統計數據
-            stats = {
-                "min": float(np.min(result)),
-                "max": float(np.max(result)),
-                "mean": float(np.mean(result)),
-                "median": float(np.median(result)),
-                "std": float(np.std(result)),
-                "rms": float(np.sqrt(np.mean(np.square(result - np.mean(result)))))
+            return self._process_image(image_data, "tilt", {"direction": direction, "fine_tune": fine_tune},
+                                       return_data, array_encoding)
+        except Exception as e:
+            logger.error(f"傾斜調整失敗: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return {"success": False, "error": str(e)}
+    
+    def process_dataset(self, handle, operation, params=None, return_data=False, array_encoding="list",
+                        include_statistics=None):
+        """對已登錄的數據集執行處理操作，結果保留在後端
+        
+        Args:
+            handle: 載入檔案時返回的數據集 handle
+            operation: "flatten"、"tilt" 或 "reset"（還原為原始數據，可復原）
+            params: 操作參數，如 {"method": "polyfit", "degree": 2} 或 {"direction": "up", "fine_tune": true}
+            return_data: 是否返回處理後的完整數據
+            array_encoding: processed_data 的編碼（見 core.array_transport.ARRAY_ENCODINGS）
+            include_statistics: 是否返回統計數據；None 時除了 "tilt" 以外都返回
+        
+        Returns:
+            包含 handle、平面修正係數 'background' 與統計數據的字典
+        """
+        try:
+            return self._process_image(handle, operation, params or {}, return_data, array_encoding,
+                                       include_statistics)
+        except Exception as e:
+            logger.error(f"處理數據集失敗: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return {"success": False, "error": str(e)}
+    
+    def undo_dataset(self, handle, return_data=False, array_encoding="list"):
+        """復原數據集處理管線的上一步（中間結果有快取時不需重新計算）"""
+        return self._pipeline_action(handle, lambda dataset: dataset.undo(), return_data, array_encoding)
+    
+    def redo_dataset(self, handle, return_data=False, array_encoding="list"):
+        """重做數據集處理管線中被復原的步驟"""
+        return self._pipeline_action(handle, lambda dataset: dataset.redo(), return_data, array_encoding)
+    
+    def get_dataset_pipeline(self, handle):
+        """返回數據集的處理步驟、目前位置與可否復原/重做"""
+        try:
+            dataset = get_dataset_registry().get(handle)
+            return {"success": True, "handle": handle, "pipeline": dataset.pipeline.describe()}
+        except Exception as e:
+            logger.error(f"取得處理管線失敗: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def update_pipeline_step(self, handle, index, params, return_data=False, array_encoding="list"):
+        """修改處理管線中第 index 步的參數，只從該步開始重新計算"""
+        return self._pipeline_action(handle, lambda dataset: dataset.update_step(int(index), params or {}),
+                                     return_data, array_encoding)
+    
+    def remove_pipeline_step(self, handle, index, return_data=False, array_encoding="list"):
+        """移除處理管線中的第 index 步"""
+        return self._pipeline_action(handle, lambda dataset: dataset.remove_step(int(index)),
+                                     return_data, array_encoding)
+    
+    def apply_pipeline(self, handle, steps=None, source_handle=None, return_data=False, array_encoding="list"):
+        """將一組處理步驟套用到數據集（取代其目前的管線）
+        
+        Args:
+            handle: 要處理的數據集 handle
+            steps: 處理步驟列表（get_dataset_pipeline 返回的 "steps"）
+            source_handle: 改為套用另一個數據集目前已套用的步驟；遮罩只在尺寸相同時沿用
+        """
+        def replay(dataset):
+            if source_handle is not None:
+                source = get_dataset_registry().get(source_handle)
+                same_shape = source.shape == dataset.shape
+                replay_steps = [
+                    {"operation": step["operation"],
+                     "params": {key: value for key, value in step["params"].items()
+                                if key != "mask" or same_shape}}
+                    for step in source.pipeline.steps[:source.pipeline.position]
+                ]
+            else:
+                replay_steps = steps or []
+            dataset.replay(replay_steps)
+        return self._pipeline_action(handle, replay, return_data, array_encoding)
+    
+    def _pipeline_action(self, handle, action, return_data=False, array_encoding="list"):
+        """對數據集執行管線操作並返回處理後的回應"""
+        try:
+            dataset = get_dataset_registry().get(handle)
+            action(dataset)
+            return self._dataset_response(dataset, bool(return_data), array_encoding)
+        except Exception as e:
+            logger.error(f"處理管線操作失敗: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def get_dataset_data(self, handle, array_encoding="list"):
+        """取得數據集目前的完整數據（需要重新繪製整張影像時使用）"""
+        try:
+            dataset = get_dataset_registry().get(handle)
+            return dict(self._dataset_response(dataset, True, array_encoding), dataset=dataset.describe())
+        except Exception as e:
+            logger.error(f"取得數據集失敗: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def get_dataset_level(self, handle, level=None, viewport_width=None, viewport_height=None,
+                          array_encoding="list"):
+        """取得數據集金字塔的一個層級
+        
+        Args:
+            handle: 數據集 handle
+            level: 層級（0 為原始解析度，每層縮小一半）；None 時依顯示區域選擇
+            viewport_width, viewport_height: 顯示區域像素數，level 為 None 時使用
+            array_encoding: 數據的編碼（見 core.array_transport.ARRAY_ENCODINGS）
+        
+        Returns:
+            包含 'data'、'level'（該層的尺寸與縮小倍數）與 'levels'（所有層級）的字典
+        """
+        try:
+            pyramid = get_dataset_registry().get(handle).pyramid
+            if level is None:
+                if not (viewport_width and viewport_height):
+                    return {"success": False, "error": "需要指定 level 或顯示區域尺寸"}
+                level = pyramid.level_for_viewport(int(viewport_width), int(viewport_height))
+            levels = pyramid.describe_levels()
+            return {
+                "success": True,
+                "handle": handle,
+                "level": levels[int(level)],
+                "levels": levels,
+                "data": encode_array(pyramid.get_level(int(level)), array_encoding)
             }
-            
+        except Exception as e:
+            logger.error(f"取得金字塔層級失敗: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def get_dataset_tile(self, handle, level, tile_x, tile_y, tile_size=256, array_encoding="list"):
+        """取得數據集金字塔指定層級的一個圖塊（放大檢視時使用）
+        
+        Returns:
+            包含 'data' 與圖塊在該層級中的位置 'x'、'y'、尺寸 'width'、'height' 的字典
+        """
+        try:
+            pyramid = get_dataset_registry().get(handle).pyramid
+            tile, (x, y) = pyramid.get_tile(int(level), int(tile_x), int(tile_y), int(tile_size))
+            height, width = tile.shape
             return {
                 "success": True,
-                "processed_data": result_list,
-                "statistics": stats
+                "handle": handle,
+                "level": int(level),
+                "factor": 2 ** int(level),
+                "x": x,
+                "y": y,
+                "width": width,
+                "height": height,
+                "data": encode_array(tile, array_encoding)
             }
         except Exception as e:
-            logger.error(f"傾斜調整失敗: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.error(f"取得圖塊失敗: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def get_dataset_preview_image(self, handle, colormap="Oranges"):
+        """為數據集目前的數據繪製靜態預覽圖（PNG 的 base64 字串）"""
+        try:
+            dataset = get_dataset_registry().get(handle)
+            data = dataset.pyramid.get_level(
+                dataset.pyramid.level_for_viewport(AnalysisService.PREVIEW_MAX_PIXELS,
+                                                   AnalysisService.PREVIEW_MAX_PIXELS))
+            image = AnalysisService.render_preview(
+                data, dataset.info.get("title", ""), dataset.info.get("xRange", data.shape[1]),
+                dataset.info.get("yRange", data.shape[0]), dataset.info.get("physUnit", "nm"), colormap
+            )
+            return {"success": True, "handle": handle, "image": image}
+        except Exception as e:
+            logger.error(f"生成數據集預覽圖失敗: {str(e)}")
             return {"success": False, "error": str(e)}
+    
+    def get_dataset_statistics(self, handle):
+        """取得數據集目前的統計數據（數據未改變時重用先前的計算結果）"""
+        try:
+            dataset = get_dataset_registry().get(handle)
+            return {"success": True, "handle": handle, "statistics": dataset.statistics}
+        except Exception as e:
+            logger.error(f"取得統計數據失敗: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def release_dataset(self, handle):
+        """釋放不再使用的數據集（如關閉分頁時）"""
+        return {"success": True, "released": get_dataset_registry().release(handle)}
+    
+    def start_data_server(self, port=0):
+        """啟動本機 HTTP 數據通道（只綁定 127.0.0.1）
+        
+        大型陣列、金字塔圖塊與 PNG 改由 HTTP 以二進位回應取得，js_api 只傳遞控制訊息。
+        
+        Returns:
+            包含 'baseUrl' 與 'token' 的字典
+        """
+        try:
+            if self._data_server is None:
+                self._data_server = DataServer(port=int(port))
+            self._data_server.start()
+            return dict(self._data_server.describe(), success=True, enabled=True)
+        except Exception as e:
+            logger.error(f"啟動數據通道失敗: {str(e)}")
+            self._data_server = None
+            return {"success": False, "error": str(e)}
+    
+    def stop_data_server(self):
+        """停止本機 HTTP 數據通道"""
+        if self._data_server is not None:
+            self._data_server.stop()
+            self._data_server = None
+        return {"success": True}
+    
+    def get_data_server_info(self):
+        """返回數據通道的連線資訊；未啟動時 enabled 為 False，前端改用 js_api 傳遞數據"""
+        if self._data_server is None or not self._data_server.is_running:
+            return {"success": True, "enabled": False}
+        return dict(self._data_server.describe(), success=True, enabled=True)
+    
+    def _process_image(self, image_data, operation, params, return_data, array_encoding="list",
+                       include_statistics=None):
+        """對 handle 或數組執行操作；handle 的結果保留在數據集中
+        
+        以 handle 傾斜時只更新平面係數，預設不重新計算統計數據（include_statistics 為 None 時）。
+        """
+        if isinstance(image_data, str):
+            dataset = AnalysisService.process_dataset(get_dataset_registry().get(image_data), operation, params)
+            if include_statistics is None:
+                include_statistics = operation != "tilt"
+            return self._dataset_response(dataset, bool(return_data), array_encoding, include_statistics)
+        
+        # 將前端發送的數據轉換為numpy數組
+        result = AnalysisService.apply_operation(decode_array(image_data), operation, params)
+        return self._processed_response(result, None, return_data is None or bool(return_data), array_encoding)
+    
+    @staticmethod
+    def _processed_response(result, handle, return_data, array_encoding="list"):
+        response = {
+            "success": True,
+            "statistics": IntAnalysis.get_topo_stats(result)
+        }
+        if handle is not None:
+            response["handle"] = handle
+        if return_data:
+            # 將處理結果編碼為前端指定的格式
+            response["processed_data"] = encode_array(result, array_encoding)
+        return response
+    
+    @staticmethod
+    def _dataset_response(dataset, return_data, array_encoding="list", include_statistics=True):
+        """數據集處理後的回應：handle、平面修正係數、處理管線，以及選擇性的統計數據與完整數據"""
+        response = {
+            "success": True,
+            "handle": dataset.handle,
+            "background": dataset.background.to_dict(),
+            "pipeline": dataset.pipeline.describe()
+        }
+        if include_statistics:
+            response["statistics"] = dataset.statistics
+        if return_data:
+            response["processed_data"] = encode_array(dataset.data, array_encoding)
+        return response
 
-    def get_line_profile(self, image_data, start_point, end_point, physical_scale=1.0, shift_zero=False):
-        """獲取線性剖面數據和圖像"""
+    def get_line_profile(self, image_data, start_point, end_point, physical_scale=1.0, shift_zero=False,
+                         array_encoding="list"):
+        """獲取線性剖面數據和圖像
+        
+        image_data 可以是數據集 handle（只讀取剖面所需的視窗）或 2D數組形式的圖像數據；
+        array_encoding 指定 profile_data 中 distance/height 的編碼。
+        """
         try:
-            # 將前端發送的數據轉換為numpy數組
-            image_data_array = np.array(image_data)
+            if isinstance(image_data, str):
+                # 切片時只修正剖面線經過的區域，不計算整張修正後的陣列
+                image_data_array = get_dataset_registry().get(image_data).state
+            else:
+                # 將前端發送的數據轉換為numpy數組
+                image_data_array = decode_array(image_data)
             
             # 獲取剖面數據
             profile_data = IntAnalysis.get_line_profile(
@@ -509,7 +1028,7 @@ class NanodrillAPI:
             
             return {
                 "success": True,
-                "profile_data": profile_data,
+                "profile_data": encode_profile(profile_data, array_encoding),
                 "profile_image": profile_image,
                 "roughness": roughness
             }
@@ -524,9 +1043,9 @@ class NanodrillAPI:
         try:
             from core.analysis.profile_analysis import ProfileAnalysis
             
-            # 生成剖面圖像
+            # 生成剖面圖像（distance/height 可能是二進位編碼）
             profile_image = ProfileAnalysis.generate_profile_image(
-                profile_data,
+                decode_profile(profile_data),
                 shift_zero=shift_zero,
                 auto_scale=auto_scale,
                 show_peaks=show_peaks,
@@ -1,6 +1,7 @@
 import os
 import signal
 import sys
+import multiprocessing
 import webview
 from api import NanodrillAPI
 import sys
@@ -15,6 +16,10 @@ def on_closed():
     print("視窗已關閉，正在清理資源...")
     sys.exit(0)
 
+def data_server_enabled():
+    """是否啟動本機 HTTP 數據通道（設定 NANODRILL_DATA_SERVER=0 停用）"""
+    return os.environ.get('NANODRILL_DATA_SERVER', '1').lower() not in ('0', 'false', 'no', 'off')
+
 def start_app():
     """啟動應用程式"""
     try:
@@ -26,6 +31,10 @@ def start_app():
         # 初始化API
         api = NanodrillAPI()
         
+        # 大型陣列改由本機 HTTP 通道傳送，js_api 只保留控制訊息
+        if data_server_enabled():
+            api.start_data_server(int(os.environ.get('NANODRILL_DATA_PORT', '0')))
+        
         window = webview.create_window(
             title='SPM 數據分析器', 
             url=gui_url,
@@ -52,4 +61,6 @@ def start_app():
 
 
 if __name__ == '__main__':
+    # 縮圖與批次處理使用程序池，打包後的執行檔需要此呼叫
+    multiprocessing.freeze_support()
     start_app()
\ No newline at end of file
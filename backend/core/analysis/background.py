@@ -0,0 +1,300 @@
+# backend/core/analysis/background.py
+import logging
+from functools import lru_cache
+import numpy as np
+from .fit_mask import resolve_fit_mask, subsample_step, sigma_clip, mask_converged, has_fit_options
+
+logger = logging.getLogger(__name__)
+
+
+def normalized_axes(shape):
+    """返回列與欄的正規化座標 v, u（範圍 [-1, 1]，以影像中心為 0）"""
+    y_size, x_size = shape
+    center_y = (y_size - 1) / 2 or 1.0
+    center_x = (x_size - 1) / 2 or 1.0
+    v = (np.arange(y_size) - (y_size - 1) / 2) / center_y
+    u = (np.arange(x_size) - (x_size - 1) / 2) / center_x
+    return v, u
+
+
+class PlaneBackground:
+    """
+    參數化的平面修正 correction = offset + gx * u + gy * v
+
+    u、v 為欄、列的正規化座標。傾斜與平面校正只更新這三個係數，
+    修正後的影像為 基底影像 + correction，需要時才以廣播一次計算，不需建立 meshgrid。
+    """
+
+    def __init__(self, gx=0.0, gy=0.0, offset=0.0):
+        self.gx = float(gx)
+        self.gy = float(gy)
+        self.offset = float(offset)
+
+    @property
+    def is_zero(self):
+        return self.gx == 0.0 and self.gy == 0.0 and self.offset == 0.0
+
+    def tilt(self, direction, step):
+        """依方向累加傾斜量（與 IntAnalysis.tilt_image 的方向定義相同）"""
+        if direction == 'up':
+            self.gy += step
+        elif direction == 'down':
+            self.gy -= step
+        elif direction == 'left':
+            self.gx += step
+        elif direction == 'right':
+            self.gx -= step
+        else:
+            raise ValueError(f"未知的傾斜方向: {direction}")
+
+    def evaluate(self, shape):
+        """返回修正量的 2D 陣列"""
+        v, u = normalized_axes(shape)
+        return self.offset + self.gy * v[:, np.newaxis] + self.gx * u[np.newaxis, :]
+
+    def apply(self, image_data, out=None):
+        """返回 image_data + 修正量
+
+        只建立一列與一欄的修正向量並以廣播相加，out 可與 image_data 相同以原地運算。
+        浮點輸入保留原本的型別。
+        """
+        image_data = np.asarray(image_data)
+        if out is None and np.issubdtype(image_data.dtype, np.floating):
+            out = np.empty_like(image_data)
+        v, u = normalized_axes(image_data.shape)
+        result = np.add(image_data, (self.offset + self.gx * u)[np.newaxis, :], out=out, casting='same_kind')
+        result += (self.gy * v)[:, np.newaxis]
+        return result
+
+    def apply_region(self, window, shape, rows, cols):
+        """返回 window + 修正量，window 為形狀 shape 的影像中 [rows, cols] 的區域
+
+        結果與 apply(影像)[rows, cols] 相同，但只計算區域內的修正量。
+        """
+        window = np.asarray(window)
+        dtype = window.dtype if np.issubdtype(window.dtype, np.floating) else np.float64
+        v, u = normalized_axes(shape)
+        result = np.add(window, (self.offset + self.gx * u[cols])[np.newaxis, :], dtype=dtype)
+        result += (self.gy * v[rows])[:, np.newaxis]
+        return result
+
+    @staticmethod
+    def fit(image_data):
+        """以最小平方法擬合平面，返回對應的 PlaneBackground（擬合平面本身）
+
+        規則網格上置中的 u、v 彼此正交且與常數項正交，正規方程式退化為三個獨立的比值，
+        只需要欄總和與列總和，不需解線性方程組。
+        """
+        image_data = np.asarray(image_data)
+        v, u = normalized_axes(image_data.shape)
+        column_sums = image_data.sum(axis=0, dtype=np.float64)
+        row_sums = image_data.sum(axis=1, dtype=np.float64)
+        y_size, x_size = image_data.shape
+
+        offset = column_sums.sum() / image_data.size
+        uu = np.dot(u, u) * y_size
+        vv = np.dot(v, v) * x_size
+        gx = np.dot(column_sums, u) / uu if uu else 0.0
+        gy = np.dot(row_sums, v) / vv if vv else 0.0
+        return PlaneBackground(gx, gy, offset)
+
+    def __neg__(self):
+        return PlaneBackground(-self.gx, -self.gy, -self.offset)
+
+    def to_dict(self):
+        return {"gx": self.gx, "gy": self.gy, "offset": self.offset}
+
+
+# 多項式曲面修正時每次處理的列數，限制暫存陣列的大小
+_EVALUATE_CHUNK_ROWS = 256
+
+
+@lru_cache(maxsize=32)
+def _power_basis(size, order):
+    """返回正規化座標的冪次矩陣 (size, order+1)，第 k 欄為 x**k"""
+    x = normalized_axes((size, 1))[0]
+    basis = np.polynomial.polynomial.polyvander(x, order)
+    basis.setflags(write=False)
+    return basis
+
+
+def surface_terms(order):
+    """返回 order 階二維多項式的項 (i, j)，對應 u**i * v**j，i + j <= order"""
+    return tuple((i, j) for total in range(order + 1) for j in range(total + 1) for i in (total - j,))
+
+
+@lru_cache(maxsize=32)
+def _normal_matrix_pinv(shape, order):
+    """
+    返回影像尺寸與階數對應的正規方程式矩陣的偽逆
+
+    規則網格上基底可分離，正規矩陣的元素為 Σu**(i+i') * Σv**(j+j')，
+    只依影像尺寸與階數而定，同尺寸的影像共用同一個分解結果。
+    """
+    y_size, x_size = shape
+    u_moments = _power_basis(x_size, 2 * order).sum(axis=0)
+    v_moments = _power_basis(y_size, 2 * order).sum(axis=0)
+    terms = surface_terms(order)
+    normal = np.array([[u_moments[i + k] * v_moments[j + l] for k, l in terms] for i, j in terms])
+    pinv = np.linalg.pinv(normal)
+    pinv.setflags(write=False)
+    return pinv
+
+
+def _masked_surface_coefficients(values, fit_mask, u, v, order):
+    """
+    以遮罩內的像素求曲面係數（像素數少於係數數時改用所有有效像素）
+
+    正規矩陣元素為 Σ w * u**(i+i') * v**(j+j')，與右側的 Σ w * z * u**i * v**j 一樣
+    由兩次小型矩陣乘法累積，不建立 N×k 的設計矩陣。
+    """
+    polyvander = np.polynomial.polynomial.polyvander
+    fit_mask = fit_mask & np.isfinite(values)
+    if np.count_nonzero(fit_mask) < len(surface_terms(order)):
+        # 與逐行擬合相同：遮罩內像素不足時改用所有有效像素
+        logger.warning(f"遮罩內只有 {int(np.count_nonzero(fit_mask))} 個像素，改以所有有效像素擬合曲面")
+        fit_mask = np.isfinite(values)
+    u_powers = polyvander(u, 2 * order)
+    v_powers = polyvander(v, 2 * order)
+    weight_moments = v_powers.T @ (fit_mask.astype(np.float64) @ u_powers)
+    value_moments = v_powers[:, :order + 1].T @ (np.where(fit_mask, values, 0) @ u_powers[:, :order + 1])
+
+    terms = surface_terms(order)
+    normal = np.array([[weight_moments[j + l, i + k] for k, l in terms] for i, j in terms])
+    rhs = np.array([value_moments[j, i] for i, j in terms])
+    return np.linalg.pinv(normal) @ rhs
+
+
+class PolynomialBackground:
+    """
+    二維多項式曲面 background = Σ c_ij * u**i * v**j（i + j <= order）
+
+    u、v 為欄、列的正規化座標。擬合只需要影像與冪次基底的一次矩陣乘積（累積動差），
+    不建立 N×k 的設計矩陣；扣除時逐段處理列，暫存陣列只有數列的大小。
+    """
+
+    def __init__(self, order, coefficients):
+        self.order = int(order)
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+
+    @staticmethod
+    def fit(image_data, order=2, **fit_options):
+        """以最小平方法擬合 order 階曲面
+
+        Args:
+            image_data: 2D numpy數組
+            order: 多項式階數（1 為平面）
+            **fit_options: 遮罩與穩健擬合選項（見 fit_masked），未指定時使用所有像素
+
+        Returns:
+            PolynomialBackground（擬合曲面本身）
+        """
+        order = int(order)
+        if order < 0:
+            raise ValueError(f"多項式階數不可為負: {order}")
+        image_data = np.asarray(image_data)
+        if not np.issubdtype(image_data.dtype, np.floating):
+            image_data = image_data.astype(np.float64)
+        if has_fit_options(fit_options):
+            return PolynomialBackground.fit_masked(image_data, order, **fit_options)
+        y_size, x_size = image_data.shape
+        u_basis = _power_basis(x_size, order)
+        v_basis = _power_basis(y_size, order)
+
+        # 動差 M[j, i] = Σ z * u**i * v**j：先對每列累積 (rows, order+1)，再對列累積
+        row_moments = image_data @ u_basis.astype(image_data.dtype)
+        moments = v_basis.T @ row_moments.astype(np.float64)
+        rhs = np.array([moments[j, i] for i, j in surface_terms(order)])
+        coefficients = _normal_matrix_pinv((y_size, x_size), order) @ rhs
+        return PolynomialBackground(order, coefficients)
+
+    @staticmethod
+    def fit_masked(image_data, order=2, mask=None, threshold=None, robust=False, clip_sigma=3.0,
+                   max_iterations=5, subsample=1):
+        """排除特徵後擬合 order 階曲面
+
+        Args:
+            image_data: 2D numpy數組
+            order: 多項式階數
+            mask: 布林遮罩，True 為背景像素
+            threshold: 高度閾值，高於閾值的像素不參與擬合
+            robust: 是否迭代剔除殘差超過 clip_sigma 倍穩健標準差的像素，遮罩不再改變或達到
+                    max_iterations 時停止
+            subsample: 列與欄方向的取樣間隔，只用於擬合，大型掃描可限制擬合成本
+
+        Returns:
+            PolynomialBackground
+        """
+        image_data = np.asarray(image_data)
+        step = subsample_step(image_data.shape, subsample)
+        v, u = normalized_axes(image_data.shape)
+        v, u = v[::step], u[::step]
+        values = image_data[::step, ::step]
+        base_mask = resolve_fit_mask(image_data, mask, threshold)
+        if base_mask is not None:
+            base_mask = base_mask[::step, ::step]
+        fit_mask = base_mask if base_mask is not None else np.isfinite(values)
+
+        for iteration in range(max(1, int(max_iterations))):
+            background = PolynomialBackground(order, _masked_surface_coefficients(values, fit_mask, u, v, order))
+            if not robust:
+                break
+            residual = values - background._evaluate_axes(u, v)
+            clipped = sigma_clip(residual, base_mask, clip_sigma)
+            converged = mask_converged(fit_mask, clipped)
+            fit_mask = clipped
+            if converged:
+                break
+        logger.debug(f"曲面擬合完成: 階數 {order}，迭代 {iteration + 1} 次，"
+                     f"使用 {int(fit_mask.sum())}/{fit_mask.size} 個像素")
+        return background
+
+    def coefficient_matrix(self):
+        """返回係數矩陣 C[j, i]，對應 u**i * v**j"""
+        matrix = np.zeros((self.order + 1, self.order + 1))
+        for (i, j), value in zip(surface_terms(self.order), self.coefficients):
+            matrix[j, i] = value
+        return matrix
+
+    def evaluate(self, shape):
+        """返回曲面的 2D 陣列"""
+        y_size, x_size = shape
+        return (_power_basis(y_size, self.order) @ self.coefficient_matrix()) @ _power_basis(x_size, self.order).T
+
+    def _evaluate_axes(self, u, v):
+        """在指定的正規化座標上計算曲面"""
+        polyvander = np.polynomial.polynomial.polyvander
+        return (polyvander(v, self.order) @ self.coefficient_matrix()) @ polyvander(u, self.order).T
+
+    def to_plane(self):
+        """將一階曲面轉換為 PlaneBackground"""
+        if self.order != 1:
+            raise ValueError(f"只有一階曲面可以轉換為平面（目前為 {self.order} 階）")
+        offset, gx, gy = self.coefficients
+        return PlaneBackground(gx, gy, offset)
+
+    def subtract(self, image_data, out=None):
+        """返回 image_data - 曲面
+
+        out 可與 image_data 相同以原地運算；曲面逐段計算，不建立整張影像大小的暫存陣列。
+        """
+        image_data = np.asarray(image_data)
+        if out is None:
+            dtype = image_data.dtype if np.issubdtype(image_data.dtype, np.floating) else np.float64
+            out = np.empty(image_data.shape, dtype=dtype)
+        y_size, x_size = image_data.shape
+        # 每列的多項式係數 (rows, order+1)，再逐段乘上 u 的冪次
+        row_coefficients = _power_basis(y_size, self.order) @ self.coefficient_matrix()
+        u_basis_t = _power_basis(x_size, self.order).T
+        for start in range(0, y_size, _EVALUATE_CHUNK_ROWS):
+            stop = min(start + _EVALUATE_CHUNK_ROWS, y_size)
+            np.subtract(image_data[start:stop], row_coefficients[start:stop] @ u_basis_t,
+                        out=out[start:stop], casting='same_kind')
+        return out
+
+    def to_dict(self):
+        return {
+            "order": self.order,
+            "terms": [list(term) for term in surface_terms(self.order)],
+            "coefficients": self.coefficients.tolist()
+        }
@@ -0,0 +1,106 @@
+# backend/core/analysis/fit_mask.py
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# MAD 換算為常態分布標準差的係數
+_MAD_TO_SIGMA = 1.4826
+
+# 穩健擬合時遮罩改變的像素比例低於此值即視為收斂
+CONVERGENCE_FRACTION = 1e-3
+
+
+def resolve_fit_mask(image_data, mask=None, threshold=None):
+    """
+    返回參與背景擬合的像素遮罩（True 表示使用）
+
+    Args:
+        image_data: 2D numpy數組
+        mask: 布林遮罩，True 為背景像素；None 表示全部使用
+        threshold: 高度閾值，高於閾值的像素（島嶼、顆粒等）不參與擬合
+
+    Returns:
+        布林遮罩，沒有任何限制時返回 None
+    """
+    fit_mask = None
+    if mask is not None:
+        try:
+            fit_mask = np.asarray(mask, dtype=bool)
+        except (TypeError, ValueError):
+            raise ValueError("遮罩必須是與數據同尺寸的布林陣列")
+        if fit_mask.shape != image_data.shape:
+            raise ValueError(f"遮罩尺寸 {fit_mask.shape} 與數據 {image_data.shape} 不符")
+    if threshold is not None:
+        try:
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            raise ValueError(f"閾值必須是數值: {threshold!r}")
+        if np.isnan(threshold):
+            raise ValueError("閾值不可為 NaN")
+        below = np.asarray(image_data) <= threshold
+        fit_mask = below if fit_mask is None else fit_mask & below
+    if fit_mask is not None:
+        # NaN 像素一律排除
+        fit_mask = fit_mask & np.isfinite(image_data)
+    return fit_mask
+
+
+def has_fit_options(fit_options):
+    """是否指定了遮罩、閾值、穩健擬合或取樣（未指定時使用不含遮罩的快速路徑）"""
+    return (fit_options.get("mask") is not None or fit_options.get("threshold") is not None
+            or bool(fit_options.get("robust")) or int(fit_options.get("subsample") or 1) > 1)
+
+
+def subsample_step(shape, subsample=1):
+    """返回擬合使用的取樣間隔（1 表示使用全部像素）"""
+    step = int(subsample or 1)
+    if step < 1:
+        raise ValueError(f"取樣間隔必須為正整數: {subsample}")
+    return min(step, max(shape))
+
+
+def _row_medians(values, valid):
+    """每列有效像素的中位數（一次排序所有列，沒有有效像素的列為 NaN）"""
+    ordered = np.sort(np.where(valid, values, np.inf), axis=1)
+    counts = valid.sum(axis=1)
+    low = np.maximum((counts - 1) // 2, 0)[:, np.newaxis]
+    high = np.minimum(counts // 2, values.shape[1] - 1)[:, np.newaxis]
+    medians = 0.5 * (np.take_along_axis(ordered, low, axis=1) + np.take_along_axis(ordered, high, axis=1))[:, 0]
+    medians[counts == 0] = np.nan
+    return medians
+
+
+def sigma_clip(residual, base_mask, clip_sigma=3.0, per_row=False):
+    """
+    依殘差的穩健標準差（MAD）剔除離群像素
+
+    Args:
+        residual: 擬合殘差
+        base_mask: 使用者指定的遮罩（None 表示全部），剔除只會縮小此範圍
+        clip_sigma: 殘差超過 clip_sigma 倍標準差的像素被排除
+        per_row: 是否以每列殘差的中位數為中心（逐行擬合時，特徵所在的列整體偏移，
+                 以全域中心會把該列的背景一併剔除）
+
+    Returns:
+        新的布林遮罩
+    """
+    valid = np.isfinite(residual)
+    if base_mask is not None:
+        valid &= base_mask
+    if not valid.any():
+        return valid
+    if per_row:
+        center = _row_medians(residual, valid)[:, np.newaxis]
+    else:
+        center = np.median(residual[valid])
+    deviation = np.abs(residual - center)
+    sigma = _MAD_TO_SIGMA * np.median(deviation[valid])
+    if sigma == 0:
+        return valid
+    return valid & (deviation <= clip_sigma * sigma)
+
+
+def mask_converged(previous, current):
+    """迭代剔除是否已收斂（只有雜訊邊緣的少數像素仍在改變）"""
+    return np.count_nonzero(previous != current) <= CONVERGENCE_FRACTION * current.size
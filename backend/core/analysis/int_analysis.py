@@ -1,17 +1,11 @@
 # backend/core/analysis/int_analysis.py
 import numpy as np
 import logging
-from scipy import ndimage, fftpack
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
-import io
 import base64
-import plotly.graph_objects as go
-from plotly.io import to_image
-import plotly.io as pio
-
-# 設置預設輸出格式為網頁
-pio.templates.default = "plotly_white"
+from .background import PlaneBackground, PolynomialBackground
+from .row_flatten import flatten_rows_mean, flatten_rows_polynomial
+from .fit_mask import has_fit_options
+from .plotting import get_plotly
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +39,8 @@ class IntAnalysis:
             適用於Plotly的色彩映射（色彩陣列或字符串名稱）
         """
         try:
+            import matplotlib.cm as cm
+            
             # 處理反轉映射
             base_colormap = colormap_name
             is_reversed = False
@@ -109,88 +105,116 @@ class IntAnalysis:
             return colormap_name if colormap_name else 'Viridis'
     
     @staticmethod
-    def linewise_flatten_mean(image_data):
+    def linewise_flatten_mean(image_data, **fit_options):
         """
         按行減去均值進行平面化
         
+        指定遮罩或閾值時只以背景像素計算每列的均值，島嶼、凹坑與顆粒不影響結果；
+        robust 為 True 時迭代剔除殘差過大的像素（sigma clipping）。
+        
         Args:
             image_data: 2D numpy數組，形貌數據
+            **fit_options: 排除特徵的擬合選項（mask、threshold、robust、clip_sigma、max_iterations、
+                subsample），未指定時擬合所有像素
             
         Returns:
             2D numpy數組，平面化後的數據
         """
         try:
-            result = image_data.copy()
-            for i in range(len(result)):
-                result[i] -= np.mean(result[i])
-            return result
+            return flatten_rows_mean(image_data, **fit_options)
+        except ValueError:
+            # 遮罩尺寸、閾值等參數錯誤交由呼叫端回報，不可靜默返回未處理的數據
+            raise
         except Exception as e:
             logger.error(f"線性平面化(均值)失敗: {str(e)}")
             return image_data
     
     @staticmethod
-    def linewise_flatten_polyfit(image_data, deg=1):
+    def linewise_flatten_polyfit(image_data, deg=1, **fit_options):
         """
         按行使用多項式擬合進行平面化
         
+        所有列以共用的 Vandermonde 偽逆矩陣一次求解（見 row_flatten），不逐列呼叫 np.polyfit。
+        
         Args:
             image_data: 2D numpy數組，形貌數據
             deg: 多項式階數
+            **fit_options: 排除特徵的擬合選項（mask、threshold、robust、clip_sigma、max_iterations、
+                subsample），未指定時擬合所有像素
             
         Returns:
             2D numpy數組，平面化後的數據
         """
         try:
-            result = image_data.copy()
-            y_size, x_size = result.shape
-            x = np.arange(x_size)
-            
-            for i in range(y_size):
-                fit = np.polyfit(x, result[i], deg)
-                poly = np.poly1d(fit)
-                result[i] -= poly(x)
-            
-            return result
+            return flatten_rows_polynomial(image_data, deg, **fit_options)
+        except ValueError:
+            # 遮罩尺寸、閾值等參數錯誤交由呼叫端回報，不可靜默返回未處理的數據
+            raise
         except Exception as e:
             logger.error(f"線性平面化(多項式)失敗: {str(e)}")
             return image_data
     
     @staticmethod
-    def plane_flatten(image_data):
+    def plane_flatten(image_data, **fit_options):
         """
         全局平面擬合並去除平面
         
+        平面係數由列總和與欄總和直接求得（見 PlaneBackground.fit），扣除時以廣播寫入新陣列，
+        不建立座標網格與 N×3 的設計矩陣。
+        
         Args:
             image_data: 2D numpy數組，形貌數據
+            **fit_options: 排除特徵的擬合選項（mask、threshold、robust、clip_sigma、max_iterations、
+                subsample），未指定時擬合所有像素
             
         Returns:
             2D numpy數組，平面化後的數據
         """
         try:
-            result = image_data.copy()
-            y_size, x_size = result.shape
-            
-            # 創建坐標網格
-            x, y = np.meshgrid(np.arange(x_size), np.arange(y_size))
-            x = x.flatten()
-            y = y.flatten()
-            z = result.flatten()
-            
-            # 擬合平面 z = ax + by + c
-            A = np.column_stack((x, y, np.ones_like(x)))
-            coeffs, _, _, _ = np.linalg.lstsq(A, z, rcond=None)
-            
-            # 根據擬合結果創建平面
-            plane = coeffs[0] * x.reshape(y_size, x_size) + coeffs[1] * y.reshape(y_size, x_size) + coeffs[2]
-            
-            # 從原始數據中減去平面
-            result -= plane
-            
-            return result
+            image_data = np.asarray(image_data)
+            if not np.issubdtype(image_data.dtype, np.floating):
+                image_data = image_data.astype(np.float64)
+            if has_fit_options(fit_options):
+                plane = PolynomialBackground.fit(image_data, 1, **fit_options).to_plane()
+            else:
+                plane = PlaneBackground.fit(image_data)
+            return (-plane).apply(image_data)
+        except ValueError:
+            # 遮罩尺寸、閾值等參數錯誤交由呼叫端回報，不可靜默返回未處理的數據
+            raise
         except Exception as e:
             logger.error(f"平面擬合失敗: {str(e)}")
             return image_data
     
+    @staticmethod
+    def polynomial_flatten(image_data, order=2, **fit_options):
+        """
+        全局二維多項式曲面擬合並去除曲面
+        
+        Args:
+            image_data: 2D numpy數組，形貌數據
+            order: 曲面階數（1 為平面）
+            **fit_options: 排除特徵的擬合選項（mask、threshold、robust、clip_sigma、max_iterations、
+                subsample），未指定時擬合所有像素
+            
+        Returns:
+            2D numpy數組，平面化後的數據
+        """
+        try:
+            return PolynomialBackground.fit(image_data, order, **fit_options).subtract(image_data)
+        except ValueError:
+            # 遮罩尺寸、閾值等參數錯誤交由呼叫端回報，不可靜默返回未處理的數據
+            raise
+        except Exception as e:
+            logger.error(f"曲面擬合失敗: {str(e)}")
+            return image_data
+    
+    @staticmethod
+    def tilt_step(image_data, fine_tune=False):
+        """每次傾斜調整的高度變化量：數據範圍的 1/10（微調為 1/50）"""
+        zmin, zmax = np.min(image_data), np.max(image_data)
+        return (zmax - zmin) / (50 if fine_tune else 10)
+    
     @staticmethod
     def tilt_image(image_data, direction, step_size=10, fine_tune=False):
         """
@@ -206,35 +230,10 @@ class IntAnalysis:
             2D numpy數組，調整後的數據
         """
         try:
-            result = image_data.copy()
-            y_size, x_size = result.shape
-            
-            # 計算調整變化量
-            zmin, zmax = np.min(result), np.max(result)
-            dh = (zmax - zmin) / (50 if fine_tune else 10)
-            
-            # 創建坐標網格
-            y, x = np.meshgrid(np.arange(x_size), np.arange(y_size))
-            
-            # 計算中心點
-            center_x = (x_size - 1) / 2
-            center_y = (y_size - 1) / 2
-            
-            # 創建調整矩陣
-            if direction in ('up', 'down'):
-                dhMatrix = dh * (x - center_y) / center_y
-                if direction == 'up':
-                    result += dhMatrix
-                else:  # direction == 'down'
-                    result -= dhMatrix
-            elif direction in ('left', 'right'):
-                dhMatrix = dh * (y - center_x) / center_x
-                if direction == 'left':
-                    result += dhMatrix
-                else:  # direction == 'right'
-                    result -= dhMatrix
-            
-            return result
+            # 以中心為軸的線性斜面，用廣播加到影像上，不需建立 meshgrid
+            background = PlaneBackground()
+            background.tilt(direction, IntAnalysis.tilt_step(image_data, fine_tune))
+            return background.apply(image_data)
         except Exception as e:
             logger.error(f"傾斜調整失敗: {str(e)}")
             return image_data
@@ -245,7 +244,7 @@ class IntAnalysis:
         獲取兩點間的線性剖面
         
         Args:
-            image_data: 2D numpy數組，形貌數據
+            image_data: 2D numpy數組或 LazyIntArray，形貌數據
             start_point: 起始點座標 (y, x)
             end_point: 終止點座標 (y, x)
             physical_scale: 物理單位尺度 (nm/pixel)
@@ -258,6 +257,8 @@ class IntAnalysis:
                 - 'stats': 統計數據
         """
         try:
+            from scipy import ndimage
+            
             # 確保點座標在圖像範圍內
             y_size, x_size = image_data.shape
             start_y, start_x = max(0, min(start_point[0], y_size-1)), max(0, min(start_point[1], x_size-1))
@@ -271,8 +272,15 @@ class IntAnalysis:
             y_indices = np.linspace(start_y, end_y, num_points)
             x_indices = np.linspace(start_x, end_x, num_points)
             
+            # 只讀取剖面線經過的矩形區域（記憶體映射時不需載入整張影像）
+            row_start = int(np.floor(min(start_y, end_y)))
+            row_stop = int(np.ceil(max(start_y, end_y))) + 1
+            col_start = int(np.floor(min(start_x, end_x)))
+            col_stop = int(np.ceil(max(start_x, end_x))) + 1
+            window = np.asarray(image_data[row_start:row_stop, col_start:col_stop])
+
             # 用雙線性插值獲取對應高度值
-            zi = ndimage.map_coordinates(image_data, [y_indices, x_indices], order=1)
+            zi = ndimage.map_coordinates(window, [y_indices - row_start, x_indices - col_start], order=1)
             
             # 物理距離
             physical_length = length * physical_scale
@@ -326,6 +334,7 @@ class IntAnalysis:
                 z = z - np.min(z)
             
             # 使用Plotly創建圖像
+            go, pio = get_plotly()
             fig = go.Figure()
             fig.add_trace(go.Scatter(
                 x=x,
@@ -372,7 +381,7 @@ class IntAnalysis:
                 )
             
             # 將圖像轉換為PNG並進行base64編碼
-            img_bytes = to_image(fig, format='png', width=800, height=400)
+            img_bytes = pio.to_image(fig, format='png', width=800, height=400)
             img_base64 = base64.b64encode(img_bytes).decode('utf-8')
             
             return img_base64
@@ -412,6 +421,7 @@ class IntAnalysis:
             processed_colormap = IntAnalysis.get_plotly_colorscale(colormap)
             
             # 創建heatmap圖
+            go, _ = get_plotly()
             fig = go.Figure(data=go.Heatmap(
                 z=image_data,
                 x=x,
@@ -466,7 +476,8 @@ class IntAnalysis:
             )
             
             # 轉換為PNG並進行base64編碼
-            img_bytes = to_image(fig, format='png', width=700, height=600, scale=1.5)
+            _, pio = get_plotly()
+            img_bytes = pio.to_image(fig, format='png', width=700, height=600, scale=1.5)
             img_base64 = base64.b64encode(img_bytes).decode('utf-8')
             
             return img_base64
@@ -0,0 +1,35 @@
+# backend/core/analysis/plotting.py
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_init_lock = threading.Lock()
+_plotly_ready = False
+
+
+def get_pyplot():
+    """
+    載入並返回 matplotlib.pyplot（非互動的 Agg 後端）
+
+    繪圖函式在呼叫時才載入 matplotlib，載入數據、處理與統計的程式碼
+    （命令列、批次工作程序）不需要安裝 matplotlib。
+    """
+    import matplotlib
+    with _init_lock:
+        if matplotlib.get_backend().lower() != 'agg':
+            matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def get_plotly():
+    """載入 plotly，首次使用時設定預設樣板，返回 (plotly.graph_objects, plotly.io)"""
+    global _plotly_ready
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    with _init_lock:
+        if not _plotly_ready:
+            pio.templates.default = "plotly_white"
+            _plotly_ready = True
+    return go, pio
@@ -1,9 +1,9 @@
 # backend/core/analysis/profile_analysis.py
 import numpy as np
 import logging
-import matplotlib.pyplot as plt
 import io
 import base64
+from .plotting import get_pyplot
 
 logger = logging.getLogger(__name__)
 
@@ -171,6 +171,7 @@ class ProfileAnalysis:
                 z = z - np.min(z)
             
             # 創建圖像
+            plt = get_pyplot()
             fig, ax = plt.subplots(figsize=(8, 4), dpi=100)
             ax.plot(x, z, '-', linewidth=1.5)
             
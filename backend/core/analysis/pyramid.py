@@ -0,0 +1,85 @@
+# backend/core/analysis/pyramid.py
+import logging
+import threading
+import numpy as np
+from .thumbnail import area_downsample
+
+logger = logging.getLogger(__name__)
+
+# 預設圖塊邊長（像素）
+TILE_SIZE = 256
+
+
+class ImagePyramid:
+    """
+    影像的多解析度金字塔（mipmap）
+
+    第 0 層為原始解析度，每往上一層以 2x2 區域平均縮小一半，直到長邊不超過 min_size。
+    各層在第一次使用時才計算並保留，前端依顯示尺寸取得適當的層級，放大時再取得高解析度的圖塊。
+    """
+
+    def __init__(self, image_data, min_size=64):
+        """
+        Args:
+            image_data: 2D numpy數組（可為記憶體映射陣列），第 0 層
+            min_size: 最高層的長邊下限
+        """
+        self.min_size = min_size
+        self._levels = [image_data]
+        self._lock = threading.Lock()
+
+        height, width = image_data.shape
+        self.shapes = [(height, width)]
+        while max(height, width) > min_size:
+            height, width = -(-height // 2), -(-width // 2)
+            self.shapes.append((height, width))
+
+    @property
+    def level_count(self):
+        return len(self.shapes)
+
+    def get_level(self, level):
+        """返回指定層級的陣列，尚未計算時由下一層縮小產生"""
+        if not 0 <= level < self.level_count:
+            raise ValueError(f"層級超出範圍: {level}（共 {self.level_count} 層）")
+        with self._lock:
+            while len(self._levels) <= level:
+                self._levels.append(area_downsample(self._levels[-1], 2))
+            return self._levels[level]
+
+    def level_for_viewport(self, viewport_width, viewport_height):
+        """返回解析度不低於顯示區域的最小層級（不需要在前端放大的最粗層級）"""
+        best = 0
+        for level, (height, width) in enumerate(self.shapes):
+            if width >= viewport_width and height >= viewport_height:
+                best = level
+            else:
+                break
+        return best
+
+    def describe_levels(self, tile_size=TILE_SIZE):
+        """返回各層級的尺寸、縮小倍數與圖塊數"""
+        return [
+            {
+                "level": level,
+                "width": width,
+                "height": height,
+                "factor": 2 ** level,
+                "tilesX": -(-width // tile_size),
+                "tilesY": -(-height // tile_size)
+            }
+            for level, (height, width) in enumerate(self.shapes)
+        ]
+
+    def get_tile(self, level, tile_x, tile_y, tile_size=TILE_SIZE):
+        """返回指定層級的圖塊
+
+        Returns:
+            (tile, (x, y)) 圖塊陣列與其左上角在該層級中的像素座標；邊緣圖塊可能小於 tile_size
+        """
+        height, width = self.shapes[level]
+        x, y = tile_x * tile_size, tile_y * tile_size
+        if not (0 <= x < width and 0 <= y < height):
+            raise ValueError(f"圖塊超出範圍: level={level}, x={tile_x}, y={tile_y}")
+        data = self.get_level(level)
+        return np.asarray(data[y:y + tile_size, x:x + tile_size]), (x, y)
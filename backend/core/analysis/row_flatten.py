@@ -0,0 +1,158 @@
+# backend/core/analysis/row_flatten.py
+import logging
+from functools import lru_cache
+import numpy as np
+from .fit_mask import resolve_fit_mask, subsample_step, sigma_clip, mask_converged, has_fit_options
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=32)
+def _row_fit_matrices(width, degree, dtype):
+    """
+    返回寬度與階數對應的 Vandermonde 矩陣 V (width, degree+1) 與其偽逆矩陣 (degree+1, width)
+
+    x 取 [-1, 1] 的正規化座標，高階數時仍保持良好的條件數。
+    矩陣只依寬度與階數而定，所有列與之後的呼叫共用同一組結果。
+    """
+    x = np.linspace(-1.0, 1.0, width) if width > 1 else np.zeros(1)
+    vander = np.polynomial.polynomial.polyvander(x, degree)
+    pinv = np.linalg.pinv(vander)
+    vander = vander.astype(dtype)
+    pinv = pinv.astype(dtype)
+    vander.setflags(write=False)
+    pinv.setflags(write=False)
+    return vander, pinv
+
+
+def _as_float(image_data):
+    image_data = np.asarray(image_data)
+    if not np.issubdtype(image_data.dtype, np.floating):
+        image_data = image_data.astype(np.float64)
+    return image_data
+
+
+def fit_rows_polynomial(image_data, degree=1):
+    """
+    一次求出每一列的最小平方多項式係數
+
+    Args:
+        image_data: 2D numpy數組
+        degree: 多項式階數
+
+    Returns:
+        (rows, degree+1) 係數陣列，對應正規化座標 x ∈ [-1, 1] 的升冪係數
+    """
+    image_data = _as_float(image_data)
+    _, pinv = _row_fit_matrices(image_data.shape[1], int(degree), image_data.dtype.str)
+    # (rows, width) @ (width, degree+1)：所有列的最小平方解合併為一次矩陣乘法
+    return image_data @ pinv.T
+
+
+def _masked_row_coefficients(values, fit_mask, x, degree):
+    """
+    以遮罩內的像素求每一列的最小平方多項式係數
+
+    每一列的正規矩陣由遮罩與 x 冪次的動差組成 (rows, k, k)，以批次偽逆一次求解；
+    遮罩內像素不足的列改用該列所有有效像素擬合。
+    """
+    k = degree + 1
+    powers = np.polynomial.polynomial.polyvander(x, 2 * degree)
+    fit_mask = fit_mask & np.isfinite(values)
+    few = fit_mask.sum(axis=1) < k
+    if few.any():
+        fit_mask = fit_mask.copy()
+        fit_mask[few] = np.isfinite(values[few])
+
+    moments = fit_mask.astype(np.float64) @ powers
+    normal = moments[:, np.add.outer(np.arange(k), np.arange(k))]
+    rhs = np.where(fit_mask, values, 0) @ powers[:, :k]
+    return np.einsum('rij,rj->ri', np.linalg.pinv(normal), rhs)
+
+
+def fit_rows_masked(image_data, degree=1, mask=None, threshold=None, robust=False, clip_sigma=3.0,
+                    max_iterations=5, subsample=1):
+    """
+    排除特徵後求每一列的多項式係數
+
+    Args:
+        image_data: 2D numpy數組
+        degree: 多項式階數
+        mask: 布林遮罩，True 為背景像素
+        threshold: 高度閾值，高於閾值的像素不參與擬合
+        robust: 是否迭代剔除殘差超過 clip_sigma 倍穩健標準差的像素，遮罩不再改變或達到
+                max_iterations 時停止
+        subsample: 欄方向的取樣間隔，只用於擬合（每一列仍各自求解）
+
+    Returns:
+        (rows, degree+1) 係數陣列，對應正規化座標 x ∈ [-1, 1] 的升冪係數
+    """
+    image_data = _as_float(image_data)
+    step = subsample_step(image_data.shape, subsample)
+    x = (np.linspace(-1.0, 1.0, image_data.shape[1]) if image_data.shape[1] > 1 else np.zeros(1))[::step]
+    values = image_data[:, ::step]
+    base_mask = resolve_fit_mask(image_data, mask, threshold)
+    if base_mask is not None:
+        base_mask = base_mask[:, ::step]
+    fit_mask = base_mask if base_mask is not None else np.isfinite(values)
+
+    for iteration in range(max(1, int(max_iterations))):
+        coefficients = _masked_row_coefficients(values, fit_mask, x, int(degree))
+        if not robust:
+            break
+        residual = values - coefficients @ np.polynomial.polynomial.polyvander(x, int(degree)).T
+        clipped = sigma_clip(residual, base_mask, clip_sigma, per_row=True)
+        converged = mask_converged(fit_mask, clipped)
+        fit_mask = clipped
+        if converged:
+            break
+    logger.debug(f"逐行擬合完成: 階數 {degree}，迭代 {iteration + 1} 次，"
+                 f"使用 {int(fit_mask.sum())}/{fit_mask.size} 個像素")
+    return coefficients
+
+
+def flatten_rows_polynomial(image_data, degree=1, out=None, **fit_options):
+    """
+    按行減去最小平方多項式（向量化版本）
+
+    與逐列呼叫 np.polyfit 的結果相同，但所有列共用快取的 Vandermonde 偽逆矩陣，
+    只需要兩次矩陣乘法。保留浮點輸入的型別（float32 不會升為 float64）。
+    指定 mask、threshold、robust 或 subsample 時改用 fit_rows_masked 求係數。
+
+    Args:
+        image_data: 2D numpy數組，形貌數據
+        degree: 多項式階數（任意非負整數）
+        out: 輸出陣列，可與 image_data 相同以原地運算；None 時建立新陣列
+        **fit_options: 傳給 fit_rows_masked 的遮罩與穩健擬合選項
+
+    Returns:
+        2D numpy數組，平面化後的數據
+    """
+    if int(degree) < 0:
+        raise ValueError(f"多項式階數不可為負: {degree}")
+    image_data = _as_float(image_data)
+    vander, pinv = _row_fit_matrices(image_data.shape[1], int(degree), image_data.dtype.str)
+    if has_fit_options(fit_options):
+        coefficients = fit_rows_masked(image_data, degree, **fit_options).astype(image_data.dtype)
+    else:
+        coefficients = image_data @ pinv.T
+    return np.subtract(image_data, coefficients @ vander.T, out=out)
+
+
+def flatten_rows_mean(image_data, out=None, **fit_options):
+    """
+    按行減去均值（向量化版本）
+
+    Args:
+        image_data: 2D numpy數組，形貌數據
+        out: 輸出陣列，可與 image_data 相同以原地運算；None 時建立新陣列
+        **fit_options: 遮罩與穩健擬合選項（見 fit_rows_masked），均值只計算遮罩內的像素
+
+    Returns:
+        2D numpy數組，平面化後的數據
+    """
+    if has_fit_options(fit_options):
+        return flatten_rows_polynomial(image_data, 0, out=out, **fit_options)
+    image_data = _as_float(image_data)
+    return np.subtract(image_data, image_data.mean(axis=1, keepdims=True), out=out)
+
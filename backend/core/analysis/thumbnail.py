@@ -0,0 +1,124 @@
+# backend/core/analysis/thumbnail.py
+import zlib
+import struct
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def area_downsample(image_data, factor):
+    """
+    以區域平均將影像縮小 factor 倍
+
+    無法整除的邊緣列/欄會以剩餘像素的平均值處理，因此輸出尺寸為 ceil(原尺寸 / factor)。
+
+    Args:
+        image_data: 2D numpy數組
+        factor: 整數縮小倍數
+
+    Returns:
+        2D numpy數組，縮小後的影像
+    """
+    if factor <= 1:
+        return np.asarray(image_data)
+
+    image_data = np.asarray(image_data)
+    y_size, x_size = image_data.shape
+    out_y = -(-y_size // factor)
+    out_x = -(-x_size // factor)
+
+    # 邊緣補上 NaN 後以 nanmean 計算，不足一整格的區域只平均實際存在的像素
+    pad_y = out_y * factor - y_size
+    pad_x = out_x * factor - x_size
+    if pad_y or pad_x:
+        padded = np.full((out_y * factor, out_x * factor), np.nan,
+                         dtype=np.result_type(image_data.dtype, np.float32))
+        padded[:y_size, :x_size] = image_data
+        blocks = padded.reshape(out_y, factor, out_x, factor)
+        return np.nanmean(blocks, axis=(1, 3))
+
+    return image_data.reshape(out_y, factor, out_x, factor).mean(axis=(1, 3))
+
+
+def normalize_to_uint8(image_data, vmin=None, vmax=None):
+    """將數據線性映射到 0-255"""
+    image_data = np.asarray(image_data, dtype=np.float64)
+    finite = np.isfinite(image_data)
+    if vmin is None:
+        vmin = float(np.min(image_data[finite])) if finite.any() else 0.0
+    if vmax is None:
+        vmax = float(np.max(image_data[finite])) if finite.any() else 1.0
+    span = vmax - vmin if vmax > vmin else 1.0
+    scaled = np.clip((image_data - vmin) / span, 0.0, 1.0) * 255.0
+    scaled[~finite] = 0.0
+    return np.rint(scaled).astype(np.uint8)
+
+
+def encode_png(pixels, level=6):
+    """
+    將 uint8 灰階 (H, W) 或 RGB (H, W, 3) 陣列編碼為 PNG 位元組
+
+    只使用 zlib，不需要 matplotlib 或 PIL。level 為 zlib 壓縮等級（1 最快、9 最小）。
+    """
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    if pixels.ndim == 2:
+        color_type = 0
+        height, width = pixels.shape
+        row_bytes = width
+    elif pixels.ndim == 3 and pixels.shape[2] == 3:
+        color_type = 2
+        height, width = pixels.shape[:2]
+        row_bytes = width * 3
+    else:
+        raise ValueError(f"不支援的影像形狀: {pixels.shape}")
+
+    # 每列前加上濾波類型 0
+    raw = np.zeros((height, row_bytes + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(height, row_bytes)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(raw.tobytes(), level)) + chunk(b'IEND', b''))
+
+
+def make_thumbnail(image_data, size=128):
+    """
+    生成縮圖的 uint8 陣列
+
+    以區域平均縮小到長邊不超過 size，並將數值範圍映射到 0-255。
+
+    Args:
+        image_data: 2D numpy數組，形貌數據
+        size: 縮圖長邊的最大像素數
+
+    Returns:
+        2D uint8 numpy數組
+    """
+    factor = max(1, int(np.ceil(max(image_data.shape) / size)))
+    return normalize_to_uint8(area_downsample(image_data, factor))
+
+
+def colormap_lut(colormap_name="viridis", n_colors=256):
+    """
+    返回色彩映射的 (n_colors, 3) uint8 查找表
+
+    只在呼叫時載入 matplotlib，無法使用時回退為灰階，讓縮圖工作程序不需要 matplotlib。
+    """
+    try:
+        from matplotlib import colormaps
+        cmap = colormaps[colormap_name]
+        rgba = cmap(np.linspace(0.0, 1.0, n_colors))
+        return np.rint(rgba[:, :3] * 255).astype(np.uint8)
+    except Exception as e:
+        logger.warning(f"無法載入色彩映射 {colormap_name}，使用灰階: {str(e)}")
+        ramp = np.linspace(0, 255, n_colors).round().astype(np.uint8)
+        return np.stack([ramp, ramp, ramp], axis=1)
+
+
+def apply_lut(pixels, lut):
+    """以查找表將 uint8 灰階陣列轉換為 (H, W, 3) RGB 陣列"""
+    return np.asarray(lut, dtype=np.uint8)[pixels]
@@ -1,24 +1,45 @@
 import os
-import re
 import logging
+import threading
 import numpy as np
-import matplotlib
 import base64
 import io
-matplotlib.use('Agg')  # 設置 matplotlib 為非互動模式
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 from .parsers.int_parser import IntParser
-from .parsers.txt_parser import TxtParser
+from .parsers.dat_parser import DatParser
+from .metadata_cache import get_metadata_cache
+from .folder_index import get_folder_index
+from .scan_cache import get_scan_cache
+from .dataset_registry import get_dataset_registry
+from .array_transport import encode_array
+from .processing_pipeline import apply_operation
+from .analysis.pyramid import ImagePyramid
+from .analysis.plotting import get_pyplot
 
 logger = logging.getLogger(__name__)
 
 class AnalysisService:
     """提供各種數據分析的服務類"""
     
+    # 序列化 matplotlib 繪圖
+    _render_lock = threading.Lock()
+    
+    # 預覽圖（800x600 像素）單邊最多使用的數據點數
+    PREVIEW_MAX_PIXELS = 1024
+    
+    # 分析請求可要求的項目：靜態預覽圖、原始數據、統計數據
+    ANALYSIS_ARTIFACTS = ("image", "rawData", "statistics")
+    DEFAULT_ARTIFACTS = ("rawData", "statistics")
+    
     @staticmethod
-    def analyze_int_file(file_path, file_info=None, colormap="Oranges"):
-        """分析 .int 檔案並回傳圖像數據和原始數據"""
+    def analyze_int_file(file_path, file_info=None, colormap="Oranges", register=True, artifacts=None,
+                         array_encoding="list", viewport_size=None):
+        """分析 .int 檔案並回傳圖像數據和原始數據
+        
+        register 為 True 時將數據登錄到數據集登錄表，結果中的 'handle' 可供後續處理與剖面操作使用；
+        artifacts 指定要產生的項目（"image"、"rawData"、"statistics"），靜態預覽圖只在要求時繪製；
+        array_encoding 指定 rawData 的編碼（見 core.array_transport）；
+        viewport_size 為 (寬, 高) 時只回傳符合顯示尺寸的金字塔層級。
+        """
         try:
             if not os.path.exists(file_path):
                 logger.error(f"檔案不存在: {file_path}")
@@ -79,9 +100,8 @@ class AnalysisService:
                 txt_path = AnalysisService._find_corresponding_txt_file(file_path)
                 if txt_path:
                     logger.info(f"找到對應的 TXT 檔案: {txt_path}")
-                    txt_parser = TxtParser(txt_path)
                     try:
-                        metadata = txt_parser.parse()
+                        metadata, file_descriptions = get_metadata_cache().get_header(txt_path)
                         
                         # 從 metadata 中獲取 x_pixels 和 y_pixels
                         if x_pixels is None and "xPixel" in metadata:
@@ -115,7 +135,7 @@ class AnalysisService:
                         
                         # 查找對應的檔案描述以獲取 scale 和 phys_unit
                         int_filename = os.path.basename(file_path)
-                        for desc in metadata.get('fileDescriptions', []):
+                        for desc in file_descriptions:
                             if desc.get('FileName') == int_filename:
                                 if scale is None and 'Scale' in desc:
                                     try:
@@ -153,23 +173,123 @@ class AnalysisService:
                 y_scan_range = 100.0
                 logger.warning(f"無法獲取 Y 掃描範圍，使用預設值 100 {phys_unit}")
             
-            # 使用 IntParser 解析檔案
+            # 載入數據（優先使用已處理掃描的磁碟快取）
             logger.info(f"開始解析 INT 檔案: {file_path}")
-            parser = IntParser(file_path, scale, x_pixels, y_pixels)
-            image_data = parser.parse()
-            logger.info(f"INT 檔案解析完成，資料形狀: {image_data.shape}")
-            
-            # 檔案名稱 (只取基本名稱)
-            base_filename = os.path.basename(file_path)
+            scan, statistics = AnalysisService.load_scan(file_path, scale, x_pixels, y_pixels)
+            logger.info(f"INT 檔案載入完成，資料形狀: {scan.shape}")
+
+            # 生成預覽圖、統計數據與原始數據
+            return AnalysisService.analyze_image_data(
+                scan, os.path.basename(file_path), x_scan_range, y_scan_range, phys_unit, colormap,
+                statistics=statistics, register=register, artifacts=artifacts, source=file_path,
+                array_encoding=array_encoding, viewport_size=viewport_size
+            )
             
-            # 生成預覽圖像 (仍保留以相容性)
-            logger.info(f"開始生成預覽圖")
+        except Exception as e:
+            logger.error(f"分析 INT 檔案時出錯: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return {"success": False, "error": str(e)}
+    
+    @staticmethod
+    def analyze_image_data(image_data, title, x_scan_range, y_scan_range, phys_unit="nm", colormap="Oranges",
+                           statistics=None, register=False, artifacts=None, source=None,
+                           array_encoding="list", viewport_size=None):
+        """為已載入的形貌數據產生要求的分析結果
+        
+        Args:
+            image_data: 2D numpy數組或 LazyIntArray，形貌數據
+            title: 預覽圖標題
+            x_scan_range: X 掃描範圍
+            y_scan_range: Y 掃描範圍
+            phys_unit: 物理單位
+            colormap: 色彩映射名稱（只用於靜態預覽圖）
+            statistics: 預先計算的統計數據，None 時重新計算
+            register: 是否登錄到數據集登錄表並在結果中返回 'handle'
+            artifacts: 要產生的項目，ANALYSIS_ARTIFACTS 的子集；None 時為 DEFAULT_ARTIFACTS。
+                靜態預覽圖 "image" 需要 matplotlib 繪圖，只在明確要求時產生
+            source: 數據來源檔案路徑
+            array_encoding: rawData 的編碼，"list"（巢狀列表）、"float32"/"float64"（base64 二進位）
+                或 "uint16"/"uint8"（量化的顯示數據）
+            viewport_size: 顯示區域 (寬, 高)；指定時 rawData 為解析度不低於顯示區域的最粗金字塔層級，
+                並在結果中加入 'rawDataLevel' 與 'levels'
+        """
+        artifacts = AnalysisService.resolve_artifacts(artifacts)
+        y_pixels, x_pixels = image_data.shape
+        
+        result = {
+            "success": True,
+            "dimensions": {
+                "width": x_pixels,
+                "height": y_pixels,
+                "xRange": x_scan_range,
+                "yRange": y_scan_range
+            },
+            "physUnit": phys_unit
+        }
+        
+        if "image" in artifacts:
+            # 預覽圖只需要圖面解析度，以間隔取樣讀取即可
+            preview_step = max(1, int(np.ceil(max(image_data.shape) / AnalysisService.PREVIEW_MAX_PIXELS)))
+            result["image"] = AnalysisService.render_preview(
+                image_data[::preview_step, ::preview_step], title, x_scan_range, y_scan_range, phys_unit, colormap
+            )
+        
+        if not (register or "rawData" in artifacts or "statistics" in artifacts):
+            return result
+        
+        # 需要完整數據時才載入整張影像
+        image_data = np.asarray(image_data)
+        
+        if "statistics" in artifacts:
+            # 計算一些基本統計數據
+            result["statistics"] = statistics or AnalysisService.compute_statistics(image_data)
+        
+        pyramid = None
+        if register:
+            # 陣列保留在後端，前端以 handle 指定數據進行處理
+            registry = get_dataset_registry()
+            result["handle"] = registry.register(
+                image_data, source=source, title=title, xRange=x_scan_range, yRange=y_scan_range,
+                physUnit=phys_unit
+            )
+            pyramid = registry.get(result["handle"]).pyramid
+        
+        if "rawData" in artifacts:
+            raw_level = 0
+            if viewport_size:
+                # 只傳送符合顯示尺寸的金字塔層級，放大時再以圖塊取得高解析度數據
+                pyramid = pyramid or ImagePyramid(image_data)
+                raw_level = pyramid.level_for_viewport(*viewport_size)
+                result["rawDataLevel"] = pyramid.describe_levels()[raw_level]
+                result["levels"] = pyramid.describe_levels()
+            raw_data = pyramid.get_level(raw_level) if raw_level else image_data
+            # 將原始資料編碼為可 JSON 序列化的形式
+            result["rawData"] = encode_array(raw_data, array_encoding)
+        
+        return result
+    
+    @staticmethod
+    def resolve_artifacts(artifacts):
+        """檢查並返回要產生的分析項目集合"""
+        if artifacts is None:
+            return set(AnalysisService.DEFAULT_ARTIFACTS)
+        if isinstance(artifacts, str):
+            artifacts = [artifacts]
+        unknown = set(artifacts) - set(AnalysisService.ANALYSIS_ARTIFACTS)
+        if unknown:
+            raise ValueError(f"未知的分析項目: {', '.join(sorted(unknown))}")
+        return set(artifacts)
+    
+    @staticmethod
+    def render_preview(image_data, title, x_scan_range, y_scan_range, phys_unit="nm", colormap="Oranges"):
+        """以 matplotlib 繪製含座標軸與色條的靜態預覽圖，返回 PNG 的 base64 字串"""
+        logger.info(f"開始生成預覽圖")
+        # pyplot 不是執行緒安全的，背景預載與前端請求可能同時生成預覽圖
+        plt = get_pyplot()
+        with AnalysisService._render_lock:
             fig, ax = plt.subplots(figsize=(8, 6), dpi=100)
             
-            # 創建X和Y坐標網格，用掃描範圍而不是像素數
-            x = np.linspace(0, x_scan_range, x_pixels)
-            y = np.linspace(0, y_scan_range, y_pixels)
-            
             # 畫出圖像，並設置正確的X和Y軸範圍
             # 將colormap轉換為matplotlib支援的格式
             try:
@@ -188,7 +308,7 @@ class AnalysisService:
             ax.set_ylabel(f'Y ({phys_unit})')
             
             # 設置標題 (只使用檔案名)
-            ax.set_title(base_filename)
+            ax.set_title(title)
             
             # 設置colorbar
             cbar = plt.colorbar(im, ax=ax)
@@ -205,36 +325,119 @@ class AnalysisService:
             img_base64 = base64.b64encode(img_data).decode('utf-8')
             buf.close()
             plt.close(fig)
+        
+        return img_base64
+    
+    @staticmethod
+    def process_dataset(dataset, operation, params=None):
+        """對登錄的數據集執行處理操作
+        
+        操作記錄在數據集的處理管線中（可復原、重做）；傾斜與平面校正只更新平面係數，
+        其他操作以 apply_operation 產生新的基底陣列。
+        
+        Returns:
+            處理後的 Dataset
+        """
+        dataset.apply(operation, params or {})
+        return dataset
+    
+    @staticmethod
+    def apply_operation(image_data, operation, params=None):
+        """對形貌數據執行處理操作，返回新的陣列（不修改輸入）
+        
+        操作與參數見 core.processing_pipeline.apply_operation。
+        """
+        return apply_operation(image_data, operation, params)
+    
+    @staticmethod
+    def compute_statistics(image_data):
+        """計算形貌數據的基本統計數據"""
+        return {
+            "min": float(np.min(image_data)),
+            "max": float(np.max(image_data)),
+            "mean": float(np.mean(image_data)),
+            "median": float(np.median(image_data)),
+            "std": float(np.std(image_data)),
+            "rms": float(np.sqrt(np.mean(np.square(image_data))))
+        }
+    
+    @staticmethod
+    def load_scan(file_path, scale, x_pixels, y_pixels):
+        """載入 .int 掃描數據與統計數據
+        
+        快取命中時直接以記憶體映射載入 float32 陣列與預先計算的統計數據，
+        未命中時解碼檔案並寫入快取。兩種情況都返回相同的唯讀 float32 數據，
+        因此同一掃描第二次開啟時的處理結果與第一次相同。
+        
+        Returns:
+            (image_data, statistics)
+        """
+        cache = None
+        try:
+            cache = get_scan_cache()
+            entry = cache.get(file_path, scale, x_pixels, y_pixels)
+            if entry is not None:
+                return entry["data"], entry["statistics"]
+        except Exception as e:
+            logger.warning(f"讀取掃描快取失敗: {str(e)}")
+        
+        parser = IntParser(file_path, scale, x_pixels, y_pixels)
+        image_data = parser.parse().astype(np.float32)
+        image_data.setflags(write=False)
+        statistics = AnalysisService.compute_statistics(image_data)
+        
+        if cache is not None:
+            try:
+                entry = cache.put(file_path, scale, x_pixels, y_pixels, image_data, statistics)
+                return entry["data"], entry["statistics"]
+            except Exception as e:
+                logger.warning(f"寫入掃描快取失敗: {str(e)}")
+        
+        return image_data, statistics
+    
+    @staticmethod
+    def analyze_dat_file(file_path, parameters=None):
+        """分析 .dat 光譜檔案並回傳數據與物理單位
+        
+        Args:
+            file_path: .dat 檔案路徑
+            parameters: 對應 .txt 標頭的參數（含 FileDescriptions），None 時自動尋找
+        """
+        try:
+            if not os.path.exists(file_path):
+                logger.error(f"檔案不存在: {file_path}")
+                return {"success": False, "error": f"檔案不存在: {file_path}"}
             
-            # 計算一些基本統計數據
-            stats = {
-                "min": float(np.min(image_data)),
-                "max": float(np.max(image_data)),
-                "mean": float(np.mean(image_data)),
-                "median": float(np.median(image_data)),
-                "std": float(np.std(image_data)),
-                "rms": float(np.sqrt(np.mean(np.square(image_data))))
-            }
+            # 從對應的 txt 檔案取得檔案描述
+            if parameters is None:
+                parameters = {}
+                txt_path = AnalysisService._find_corresponding_txt_file(file_path)
+                if txt_path:
+                    logger.info(f"找到對應的 TXT 檔案: {txt_path}")
+                    try:
+                        parameters, file_descriptions = get_metadata_cache().get_header(txt_path)
+                        parameters['FileDescriptions'] = file_descriptions
+                    except Exception as e:
+                        logger.warning(f"解析 TXT 檔案失敗: {str(e)}")
+            
+            dat_filename = os.path.basename(file_path)
+            file_description = next((desc for desc in parameters.get('FileDescriptions', [])
+                                     if desc.get('FileName') == dat_filename), None)
             
-            # 將原始資料轉換為列表，以便JSON序列化
-            raw_data = image_data.tolist()
+            parser = DatParser(file_path, file_description, parameters)
+            result = parser.parse()
             
-            return {
-                "success": True,
-                "image": img_base64,  # 保留靜態圖像以相容性
-                "rawData": raw_data,  # 添加原始數據
-                "statistics": stats,
-                "dimensions": {
-                    "width": x_pixels,
-                    "height": y_pixels,
-                    "xRange": x_scan_range,
-                    "yRange": y_scan_range
-                },
-                "physUnit": phys_unit
-            }
+            # 將 numpy 陣列轉換為列表，以便JSON序列化
+            for key in ("axis", "positions", "curves"):
+                if result.get(key) is not None:
+                    result[key] = result[key].tolist()
+            if "columns" in result:
+                result["columns"] = {name: values.tolist() for name, values in result["columns"].items()}
             
+            result["success"] = True
+            return result
         except Exception as e:
-            logger.error(f"分析 INT 檔案時出錯: {str(e)}")
+            logger.error(f"分析 DAT 檔案時出錯: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
             return {"success": False, "error": str(e)}
@@ -242,18 +445,5 @@ class AnalysisService:
     @staticmethod
     def _find_corresponding_txt_file(int_file_path):
         """找到與 .int 檔案對應的 .txt 檔案"""
-        directory = os.path.dirname(int_file_path)
-        basename = os.path.basename(int_file_path)
-        
-        # 嘗試找出編號部分
-        match = re.search(r'(.+?)_(\d+)([^_]*?)\.(int|dat)$', basename, re.IGNORECASE)
-        if match:
-            prefix = match.group(1)
-            number = match.group(2)
-            
-            # 在同一目錄中尋找可能的 txt 檔案
-            for filename in os.listdir(directory):
-                if filename.endswith('.txt') and filename.startswith(f"{prefix}_{number}"):
-                    return os.path.join(directory, filename)
-        
-        return None
\ No newline at end of file
+        directory = os.path.dirname(os.path.abspath(int_file_path))
+        return get_folder_index(directory).find_txt_file(int_file_path)
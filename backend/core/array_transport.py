@@ -0,0 +1,149 @@
+import base64
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 支援的陣列編碼：
+#   "list"    - 巢狀 JSON 列表（預設，與舊版前端相容）
+#   "float32" - little-endian float32 緩衝區的 base64
+#   "float64" - little-endian float64 緩衝區的 base64
+#   "uint16"  - 量化為 16 位元整數的顯示用數據，附 offset/scale 還原物理高度
+#   "uint8"   - 量化為 8 位元整數，只用於色彩顯示
+ARRAY_ENCODINGS = ("list", "float32", "float64", "uint16", "uint8")
+
+_BINARY_DTYPES = {
+    "float32": np.dtype('<f4'),
+    "float64": np.dtype('<f8'),
+    "uint16": np.dtype('<u2'),
+    "uint8": np.dtype('u1'),
+}
+
+# 量化編碼中最大的整數值保留給 NaN（無數據）
+_QUANTIZED_ENCODINGS = ("uint16", "uint8")
+
+
+def encode_array(array, encoding="list"):
+    """
+    將陣列編碼為可 JSON 序列化的形式
+
+    二進位編碼返回 {"encoding": "base64", "dtype", "shape", "data"}，
+    前端以 atob 取得位元組後直接建立 Float32Array/Float64Array 視圖即可，不需逐一解析浮點數。
+    量化編碼另外包含 "offset"、"scale" 與 "nodata"，物理數值為 offset + 整數值 * scale，
+    整數值等於 nodata 表示 NaN；完整精度的數據仍保留在後端供量測使用。
+
+    Args:
+        array: numpy 數組（或可轉換為數組的物件）
+        encoding: ARRAY_ENCODINGS 之一，None 視為 "list"
+
+    Returns:
+        list 或 dict
+    """
+    encoding = encoding or "list"
+    if encoding == "list":
+        return np.asarray(array).tolist()
+
+    buffer, meta = pack_array(array, encoding)
+    return dict(meta, encoding="base64", data=base64.b64encode(buffer).decode('ascii'))
+
+
+def pack_array(array, encoding="float32"):
+    """
+    將陣列轉換為原始位元組緩衝區與描述資訊（不做 base64）
+
+    供 encode_array 與本機 HTTP 數據通道共用；描述資訊包含 "dtype"、"shape"，
+    量化編碼另外包含 "offset"、"scale" 與 "nodata"。
+
+    Returns:
+        (buffer, meta) 位元組緩衝區（memoryview）與描述字典
+    """
+    dtype = _BINARY_DTYPES.get(encoding)
+    if dtype is None:
+        raise ValueError(f"未知的陣列編碼: {encoding}（可用: {', '.join(ARRAY_ENCODINGS)}）")
+
+    if encoding in _QUANTIZED_ENCODINGS:
+        return _quantize(np.asarray(array), encoding)
+
+    array = np.ascontiguousarray(array, dtype=dtype)
+    return array.data.cast('B'), {"dtype": encoding, "shape": list(array.shape)}
+
+
+def _quantize(array, encoding):
+    """將數據線性映射到 0..(最大值 - 1)，最大值保留給 NaN"""
+    dtype = _BINARY_DTYPES[encoding]
+    nodata = np.iinfo(dtype).max
+    levels = nodata - 1
+
+    finite = np.isfinite(array)
+    has_nan = not finite.all()
+    values = array[finite] if has_nan else array
+    vmin = float(np.min(values)) if values.size else 0.0
+    vmax = float(np.max(values)) if values.size else 0.0
+    scale = (vmax - vmin) / levels if vmax > vmin else 1.0
+
+    quantized = np.rint((array - vmin) / scale)
+    if has_nan:
+        quantized[~finite] = nodata
+    quantized = np.ascontiguousarray(quantized, dtype=dtype)
+    return quantized.data.cast('B'), {
+        "dtype": encoding,
+        "shape": list(quantized.shape),
+        "offset": vmin,
+        "scale": scale,
+        "nodata": int(nodata)
+    }
+
+
+def is_encoded_array(value):
+    """是否為 encode_array 產生的二進位編碼字典"""
+    return isinstance(value, dict) and value.get("encoding") == "base64" and "data" in value
+
+
+def decode_array(value, dtype=None):
+    """
+    將前端傳來的陣列（巢狀列表或二進位編碼字典）轉換為 numpy 數組
+
+    Args:
+        value: 巢狀列表或 encode_array 產生的字典
+        dtype: 輸出型別，None 時保留原始型別
+
+    Returns:
+        numpy 數組
+    """
+    if is_encoded_array(value):
+        source_dtype = _BINARY_DTYPES.get(value.get("dtype"))
+        if source_dtype is None:
+            raise ValueError(f"未知的陣列型別: {value.get('dtype')}")
+        array = np.frombuffer(base64.b64decode(value["data"]), dtype=source_dtype)
+        array = array.reshape(value.get("shape") or array.shape)
+        if value.get("dtype") in _QUANTIZED_ENCODINGS:
+            # 還原物理數值（精度受量化限制）
+            restored = value.get("offset", 0.0) + array * value.get("scale", 1.0)
+            if "nodata" in value:
+                restored[array == value["nodata"]] = np.nan
+            return restored.astype(dtype or np.float64)
+        # frombuffer 返回唯讀視圖，轉為可寫入的本機位元組序陣列
+        return array.astype(dtype or source_dtype.newbyteorder('='))
+    return np.array(value, dtype=dtype)
+
+
+def encode_profile(profile_data, encoding="list"):
+    """將剖面數據中的 distance/height 陣列依指定方式編碼"""
+    if not encoding or encoding == "list":
+        return profile_data
+    encoded = dict(profile_data)
+    for key in ("distance", "height"):
+        if key in encoded:
+            encoded[key] = encode_array(encoded[key], encoding)
+    return encoded
+
+
+def decode_profile(profile_data):
+    """將前端傳回的剖面數據還原為列表形式的 distance/height"""
+    if not isinstance(profile_data, dict):
+        return profile_data
+    decoded = dict(profile_data)
+    for key in ("distance", "height"):
+        if is_encoded_array(decoded.get(key)):
+            decoded[key] = decode_array(decoded[key]).tolist()
+    return decoded
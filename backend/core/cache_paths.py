@@ -0,0 +1,38 @@
+import os
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 可透過環境變數覆寫快取目錄位置
+CACHE_DIR_ENV = 'NANODRILL_CACHE_DIR'
+
+
+def get_user_cache_dir(*subdirs):
+    """返回（並建立）使用者快取目錄下的子目錄
+
+    優先使用環境變數 NANODRILL_CACHE_DIR，否則依作業系統慣例選擇位置：
+        - Windows: %LOCALAPPDATA%\\Nanodrill\\Cache
+        - macOS: ~/Library/Caches/Nanodrill
+        - 其他: $XDG_CACHE_HOME/nanodrill 或 ~/.cache/nanodrill
+    """
+    base = os.environ.get(CACHE_DIR_ENV)
+    if not base:
+        if os.name == 'nt':
+            base = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 'Nanodrill', 'Cache')
+        elif sys.platform == 'darwin':
+            base = os.path.join(os.path.expanduser('~'), 'Library', 'Caches', 'Nanodrill')
+        else:
+            base = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+                                'nanodrill')
+
+    path = os.path.join(base, *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_file_identity(file_path):
+    """返回 (絕對路徑, 檔案大小, 修改時間 ns)，作為快取鍵以自動失效過期項目"""
+    abs_path = os.path.abspath(file_path)
+    stat = os.stat(abs_path)
+    return abs_path, stat.st_size, stat.st_mtime_ns
@@ -0,0 +1,307 @@
+import hmac
+import json
+import re
+import secrets
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from .array_transport import pack_array
+from .dataset_registry import get_dataset_registry, DatasetNotFoundError
+from .analysis.pyramid import TILE_SIZE
+from .analysis.thumbnail import normalize_to_uint8, colormap_lut, apply_lut, encode_png
+
+logger = logging.getLogger(__name__)
+
+# 只接受本機連線
+DEFAULT_HOST = "127.0.0.1"
+
+# 數據集 PNG 的預設長邊上限（像素）
+IMAGE_MAX_PIXELS = 1024
+
+# 前端需要讀取的自訂回應標頭
+ARRAY_HEADERS = ("X-Array-Dtype", "X-Array-Shape", "X-Array-Offset", "X-Array-Scale", "X-Array-Nodata",
+                 "X-Array-Origin", "X-Dataset-Version", "Content-Range", "Accept-Ranges", "ETag")
+
+_ROUTES = [
+    (re.compile(r"^/datasets/(?P<handle>[0-9a-f]+)/data$"), "data"),
+    (re.compile(r"^/datasets/(?P<handle>[0-9a-f]+)/levels/(?P<level>\d+)$"), "level"),
+    (re.compile(r"^/datasets/(?P<handle>[0-9a-f]+)/tiles/(?P<level>\d+)/(?P<tile_x>\d+)/(?P<tile_y>\d+)$"), "tile"),
+    (re.compile(r"^/datasets/(?P<handle>[0-9a-f]+)/image\.png$"), "image"),
+]
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class DataServer:
+    """
+    本機 HTTP 數據通道
+
+    pywebview 的 js_api 以 JSON 字串傳遞所有結果，大型陣列會造成介面停頓。
+    此伺服器只綁定 127.0.0.1，以二進位回應提供已登錄數據集的陣列、金字塔層級、圖塊與 PNG，
+    js_api 只保留控制訊息（handle、參數與統計數據）。
+
+    路徑（皆需附上 token 查詢參數或 X-Nanodrill-Token 標頭）：
+        /datasets/<handle>/data?dtype=float32
+        /datasets/<handle>/levels/<level>?dtype=float32
+        /datasets/<handle>/tiles/<level>/<tile_x>/<tile_y>?size=256&dtype=float32
+        /datasets/<handle>/image.png?colormap=viridis&max=1024
+
+    陣列回應的主體為 little-endian 緩衝區，形狀與量化參數放在 X-Array-* 標頭中。
+    回應帶有依數據版本產生的 ETag（If-None-Match 返回 304），並支援單一範圍的 Range 請求。
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=0, registry=None, token=None, max_cached_bodies=8):
+        """
+        Args:
+            host: 綁定位址，預設只接受本機連線
+            port: 連接埠，0 表示由系統分配
+            registry: DatasetRegistry，None 時使用共用的登錄表
+            token: 存取權杖，None 時隨機產生
+            max_cached_bodies: 保留最近產生的回應主體數（分段 Range 請求不需重新編碼）
+        """
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.token = token or secrets.token_urlsafe(24)
+        self.max_cached_bodies = max_cached_bodies
+        self._bodies = OrderedDict()
+        self._bodies_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._server is not None
+
+    @property
+    def base_url(self):
+        if self._server is None:
+            return None
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在背景執行緒中啟動伺服器，返回基底 URL"""
+        if self._server is not None:
+            return self.base_url
+
+        server = ThreadingHTTPServer((self.host, self.port), _DataRequestHandler)
+        server.daemon_threads = True
+        server.data_server = self
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, name="DataServer", daemon=True)
+        self._thread.start()
+        logger.info(f"本機數據通道已啟動: {self.base_url}")
+        return self.base_url
+
+    def stop(self):
+        """停止伺服器"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5.0)
+        self._server = None
+        self._thread = None
+        with self._bodies_lock:
+            self._bodies.clear()
+        logger.info("本機數據通道已停止")
+
+    def describe(self):
+        """返回前端使用的連線資訊"""
+        return {"baseUrl": self.base_url, "token": self.token, "tileSize": TILE_SIZE}
+
+    def check_token(self, token):
+        return bool(token) and hmac.compare_digest(str(token), self.token)
+
+    def _get_registry(self):
+        return self.registry if self.registry is not None else get_dataset_registry()
+
+    def build_response(self, route, params, query):
+        """
+        產生回應主體
+
+        Returns:
+            (etag, body, headers)；body 為 bytes，headers 為要附加的標頭字典
+        """
+        dataset = self._get_registry().get(params["handle"])
+        # 數據版本與請求參數決定回應內容
+        key = json.dumps([route, params, sorted((k, v) for k, v in query.items() if k != "token")])
+        etag = f'"{dataset.handle}-{dataset.version}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"'
+
+        with self._bodies_lock:
+            cached = self._bodies.get(etag)
+            if cached is not None:
+                self._bodies.move_to_end(etag)
+                return (etag,) + cached
+
+        headers = {"X-Dataset-Version": str(dataset.version)}
+        if route == "image":
+            size = int(query.get("max", IMAGE_MAX_PIXELS))
+            pyramid = dataset.pyramid
+            data = pyramid.get_level(pyramid.level_for_viewport(size, size))
+            pixels = normalize_to_uint8(data)
+            # PNG 第一列為影像頂端，與 matplotlib origin='lower' 的預覽方向一致
+            lut = colormap_lut(query.get("colormap", "viridis"))
+            body = encode_png(apply_lut(pixels[::-1], lut))
+            headers["Content-Type"] = "image/png"
+        else:
+            if route == "data":
+                array = dataset.data
+            elif route == "level":
+                array = dataset.pyramid.get_level(int(params["level"]))
+            else:
+                array, (x, y) = dataset.pyramid.get_tile(
+                    int(params["level"]), int(params["tile_x"]), int(params["tile_y"]),
+                    int(query.get("size", TILE_SIZE))
+                )
+                headers["X-Array-Origin"] = f"{x},{y}"
+            buffer, meta = pack_array(array, query.get("dtype", "float32"))
+            body = bytes(buffer)
+            headers["Content-Type"] = "application/octet-stream"
+            headers["X-Array-Dtype"] = meta["dtype"]
+            headers["X-Array-Shape"] = ",".join(str(n) for n in meta["shape"])
+            for name in ("offset", "scale", "nodata"):
+                if name in meta:
+                    headers[f"X-Array-{name.capitalize()}"] = repr(meta[name])
+
+        with self._bodies_lock:
+            self._bodies[etag] = (body, headers)
+            while len(self._bodies) > self.max_cached_bodies:
+                self._bodies.popitem(last=False)
+        return etag, body, headers
+
+
+def parse_range(header, length):
+    """解析單一範圍的 Range 標頭
+
+    Returns:
+        (start, end) 含頭尾的位元組範圍；標頭無法使用時返回 None（回應完整內容）
+
+    Raises:
+        ValueError: 範圍超出內容長度（應回應 416）
+    """
+    match = _RANGE_PATTERN.match(header.strip()) if header else None
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # bytes=-N：最後 N 個位元組
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("空的範圍")
+        return max(length - suffix, 0), length - 1
+    start = int(first)
+    end = min(int(last), length - 1) if last else length - 1
+    if start >= length or start > end:
+        raise ValueError(f"範圍超出內容長度: {header}")
+    return start, end
+
+
+class _DataRequestHandler(BaseHTTPRequestHandler):
+    """DataServer 的請求處理器"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self._send_cors_headers()
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Range, If-None-Match, X-Nanodrill-Token")
+        self.send_header("Access-Control-Max-Age", "600")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body):
+        data_server = self.server.data_server
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if not data_server.check_token(self.headers.get("X-Nanodrill-Token") or query.get("token")):
+            return self._send_error(403, "權杖無效")
+
+        for pattern, route in _ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                break
+        else:
+            return self._send_error(404, f"未知的路徑: {url.path}")
+
+        try:
+            etag, body, headers = data_server.build_response(route, match.groupdict(), query)
+        except DatasetNotFoundError as e:
+            return self._send_error(404, str(e))
+        except ValueError as e:
+            return self._send_error(400, str(e))
+        except Exception as e:
+            logger.error(f"數據通道回應失敗: {self.path.split('?')[0]}: {str(e)}")
+            return self._send_error(500, str(e))
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self._send_common_headers(etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        status, content_range = 200, None
+        if_range = self.headers.get("If-Range")
+        if if_range is None or if_range == etag:
+            try:
+                byte_range = parse_range(self.headers.get("Range"), len(body))
+            except ValueError:
+                self.send_response(416)
+                self._send_common_headers(etag)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                status, content_range = 206, f"bytes {start}-{end}/{len(body)}"
+                body = body[start:end + 1]
+
+        self.send_response(status)
+        self._send_common_headers(etag)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_common_headers(self, etag):
+        self._send_cors_headers()
+        self.send_header("ETag", etag)
+        # 同一路徑的內容會隨數據更新而改變，每次使用前以 ETag 重新驗證
+        self.send_header("Cache-Control", "private, no-cache")
+        self.send_header("Accept-Ranges", "bytes")
+
+    def _send_cors_headers(self):
+        # 前端（開發伺服器或 pywebview）與數據通道的來源不同；存取由權杖控制
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", ", ".join(ARRAY_HEADERS))
+
+    def _send_error(self, status, message):
+        body = json.dumps({"success": False, "error": message}).encode("utf-8")
+        self.send_response(status)
+        self._send_cors_headers()
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"數據通道: {format % args}")
@@ -0,0 +1,176 @@
+import os
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from .analysis.pyramid import ImagePyramid
+from .processing_pipeline import ProcessingPipeline
+from .analysis.int_analysis import IntAnalysis
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetNotFoundError(KeyError):
+    """handle 不存在（未登錄或已被釋放）"""
+
+    def __str__(self):
+        return f"找不到數據集: {self.args[0]}（可能已被釋放，請重新載入檔案）"
+
+
+class Dataset:
+    """
+    登錄在後端的影像數據
+
+    處理操作記錄在 ProcessingPipeline 中，目前的數據是管線目前位置的狀態：
+    基底陣列 base 加上參數化的平面修正 background。傾斜與平面校正只更新 background 的係數，
+    修正後的陣列在第一次使用時才計算並重用；其他處理（逐行平面化等）產生新的基底陣列。
+    """
+
+    def __init__(self, handle, data, source=None, info=None):
+        self.handle = handle
+        self.original = data
+        self.source = source
+        # title、xRange、yRange、physUnit 等描述資訊
+        self.info = dict(info or {})
+        self.pipeline = ProcessingPipeline(data)
+        self._state = self.pipeline.current()
+        self._pyramid = None
+        # 數據每次改變時遞增，作為 HTTP 數據通道的 ETag
+        self.version = 0
+
+    @property
+    def base(self):
+        return self._state.base
+
+    @property
+    def background(self):
+        return self._state.background
+
+    @property
+    def state(self):
+        """目前的管線狀態，可直接切片，只讀取並修正切出的區域"""
+        return self._state
+
+    @property
+    def data(self):
+        """目前的數據（基底加上平面修正）"""
+        return self._state.data
+
+    def _set_state(self, state):
+        self._state = state
+        self.version += 1
+        self._pyramid = None
+
+    def apply(self, operation, params=None):
+        """在處理管線加入一個步驟並更新目前的數據"""
+        self._set_state(self.pipeline.push(operation, params))
+
+    def undo(self):
+        self._set_state(self.pipeline.undo())
+
+    def redo(self):
+        self._set_state(self.pipeline.redo())
+
+    def update_step(self, index, params):
+        """修改管線中某一步的參數，從該步開始重新計算"""
+        self._set_state(self.pipeline.update_step(index, params))
+
+    def remove_step(self, index):
+        self._set_state(self.pipeline.remove_step(index))
+
+    def replay(self, steps):
+        """以另一組處理步驟取代目前的管線"""
+        self._set_state(self.pipeline.replay(steps))
+
+    @property
+    def statistics(self):
+        """目前數據的統計數據，同一個管線狀態只計算一次（復原後可直接重用）"""
+        if self._state.statistics is None:
+            self._state.statistics = IntAnalysis.get_topo_stats(self.data)
+        return self._state.statistics
+
+    @property
+    def pyramid(self):
+        """目前數據的多解析度金字塔，數據更新後重新建立"""
+        if self._pyramid is None:
+            self._pyramid = ImagePyramid(self.data)
+        return self._pyramid
+
+    @property
+    def shape(self):
+        return self.base.shape
+
+    def describe(self):
+        """返回前端使用的數據描述（不含陣列）"""
+        height, width = self.base.shape
+        return dict(self.info, handle=self.handle, source=self.source, width=width, height=height,
+                    version=self.version, background=self.background.to_dict(),
+                    pipeline=self.pipeline.describe())
+
+
+class DatasetRegistry:
+    """
+    後端的數據集登錄表
+
+    載入掃描後陣列保留在 Python 端，前端只持有 handle；平面化、傾斜與剖面等操作
+    以 handle 指定數據，每次呼叫只傳遞參數與結果，不再來回傳送整張影像的 JSON 列表。
+    超過上限時移除最久未使用的數據集。
+    """
+
+    def __init__(self, max_datasets=16):
+        self.max_datasets = max_datasets
+        self._datasets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, data, source=None, **info):
+        """登錄陣列並返回 handle
+
+        data 可以是唯讀的記憶體映射陣列，處理操作一律產生新陣列，不會修改原始數據。
+        """
+        handle = uuid.uuid4().hex
+        dataset = Dataset(handle, data, os.path.abspath(source) if source else None, info)
+        with self._lock:
+            self._datasets[handle] = dataset
+            while len(self._datasets) > self.max_datasets:
+                old_handle, _ = self._datasets.popitem(last=False)
+                logger.debug(f"數據集已移出登錄表: {old_handle}")
+        return handle
+
+    def get(self, handle):
+        """返回 Dataset，handle 不存在時拋出 DatasetNotFoundError"""
+        with self._lock:
+            dataset = self._datasets.get(handle)
+            if dataset is None:
+                raise DatasetNotFoundError(handle)
+            self._datasets.move_to_end(handle)
+            return dataset
+
+    def release(self, handle):
+        """釋放數據集，返回是否存在"""
+        with self._lock:
+            return self._datasets.pop(handle, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._datasets.clear()
+
+    def __contains__(self, handle):
+        with self._lock:
+            return handle in self._datasets
+
+    def __len__(self):
+        with self._lock:
+            return len(self._datasets)
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_dataset_registry():
+    """返回共用的數據集登錄表"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = DatasetRegistry()
+        return _default_registry
@@ -0,0 +1,389 @@
+import os
+import re
+import logging
+import threading
+from datetime import datetime
+from .metadata_cache import get_metadata_cache
+
+logger = logging.getLogger(__name__)
+
+# 掃描相關檔案的副檔名
+SCAN_EXTENSIONS = ('.txt', '.int', '.dat')
+
+# 列表排序選項（與前端 FileSelector 的選項相同）
+SORT_OPTIONS = ('number_asc', 'number_desc', 'time_asc', 'time_desc', 'name_asc', 'name_desc')
+
+# 統一的檔名規則：<前綴>_<掃描編號><通道名稱>.<副檔名>
+# 例如 "20250425_Janus Stacking SiO2_13K_457TopoFwd.int" -> 前綴 "..._13K"、編號 457、通道 "TopoFwd"
+# 前綴取到最後一個 "_數字"，因此通道名稱可以含底線（如 "It_to_PCFwd"）
+SCAN_FILE_PATTERN = re.compile(r'^(?P<prefix>.+)_(?P<number>\d+)(?P<channel>.*)\.(?P<ext>txt|int|dat)$',
+                               re.IGNORECASE)
+
+
+def parse_scan_filename(filename):
+    """解析檔名，返回 (前綴, 掃描編號, 通道名稱, 副檔名)，不符合規則時返回 None"""
+    match = SCAN_FILE_PATTERN.match(filename)
+    if not match:
+        return None
+    return match.group('prefix'), int(match.group('number')), match.group('channel'), match.group('ext').lower()
+
+
+class ScanRecord:
+    """單一掃描：.txt 標頭與其所有通道檔案"""
+
+    def __init__(self, prefix, number):
+        self.prefix = prefix
+        self.number = number
+        self.txt_path = None
+        # 通道檔名 -> 完整路徑
+        self.channel_paths = {}
+        self.header_loaded = False
+
+    @property
+    def key(self):
+        return self.prefix, self.number
+
+
+class FolderIndex:
+    """
+    資料夾掃描索引
+
+    對資料夾只做一次目錄走訪，建立掃描編號、.txt 標頭與 .int/.dat 通道檔案之間的對應，
+    之後的查詢都是 O(1) 的字典查找，不再需要每次 os.listdir。
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.dir_mtime_ns = None
+        # 檔名 -> {"name", "path", "size", "mtime"}
+        self.files = {}
+        # (前綴, 編號) -> ScanRecord
+        self.scans = {}
+        # 編號 -> [(前綴, 編號), ...]
+        self.numbers = {}
+        # 檔名 -> (前綴, 編號)
+        self._file_scans = {}
+        # 每次內容變更遞增，用於使排序結果快取失效
+        self.version = 0
+        self._sorted_cache = {}
+        self._lock = threading.RLock()
+
+    def build(self):
+        """走訪資料夾並建立索引"""
+        with self._lock:
+            self.files.clear()
+            self.scans.clear()
+            self.numbers.clear()
+            self._file_scans.clear()
+            self._touch()
+
+            self.dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(SCAN_EXTENSIONS) and entry.is_file():
+                        stat = entry.stat()
+                        self._add_file(entry.name, entry.path, stat.st_size, stat.st_mtime)
+
+            logger.info(f"資料夾索引建立完成: {self.directory}，"
+                        f"{len(self.files)} 個檔案，{len(self.scans)} 個掃描")
+        return self
+
+    def _touch(self):
+        self.version += 1
+        self._sorted_cache.clear()
+
+    def _add_file(self, name, path, size, mtime):
+        self.files[name] = {"name": name, "path": path, "size": size, "mtime": mtime}
+
+        parsed = parse_scan_filename(name)
+        if parsed is None:
+            return
+        prefix, number, _, ext = parsed
+
+        record = self._get_or_create_scan(prefix, number)
+        if ext == 'txt':
+            record.txt_path = path
+            record.header_loaded = False
+        else:
+            record.channel_paths[name] = path
+        self._file_scans[name] = record.key
+
+    def _remove_file(self, name):
+        if self.files.pop(name, None) is None:
+            return
+
+        key = self._file_scans.pop(name, None)
+        record = self.scans.get(key)
+        if record is None:
+            return
+        if record.txt_path and os.path.basename(record.txt_path) == name:
+            record.txt_path = None
+            record.header_loaded = False
+        record.channel_paths.pop(name, None)
+
+        if record.txt_path is None and not record.channel_paths:
+            del self.scans[key]
+            keys = self.numbers.get(record.number, [])
+            if key in keys:
+                keys.remove(key)
+            if not keys:
+                self.numbers.pop(record.number, None)
+
+    def _get_or_create_scan(self, prefix, number):
+        key = (prefix, number)
+        record = self.scans.get(key)
+        if record is None:
+            record = ScanRecord(prefix, number)
+            self.scans[key] = record
+            self.numbers.setdefault(number, []).append(key)
+        return record
+
+    def _load_header_channels(self, record):
+        """從 .txt 標頭的 FileDescriptions 補齊通道列表（每個掃描只讀一次，且經由元數據快取）"""
+        if record.header_loaded or record.txt_path is None:
+            return
+        try:
+            _, file_descriptions = get_metadata_cache().get_header(record.txt_path)
+            for desc in file_descriptions:
+                name = desc.get('FileName')
+                if name and name in self.files and name not in record.channel_paths:
+                    record.channel_paths[name] = self.files[name]["path"]
+                    self._file_scans[name] = record.key
+        except Exception as e:
+            logger.warning(f"讀取標頭通道列表失敗: {record.txt_path}: {str(e)}")
+        record.header_loaded = True
+
+    def get_scan_for_file(self, file_path):
+        """返回檔案所屬的 ScanRecord，找不到時返回 None"""
+        with self._lock:
+            key = self._file_scans.get(os.path.basename(file_path))
+            return self.scans.get(key)
+
+    def find_txt_file(self, file_path):
+        """返回與 .int/.dat 檔案對應的 .txt 標頭路徑"""
+        record = self.get_scan_for_file(file_path)
+        return record.txt_path if record else None
+
+    def get_scans_by_number(self, number):
+        """返回指定掃描編號的所有 ScanRecord（不同前綴可能共用編號）"""
+        with self._lock:
+            return [self.scans[key] for key in self.numbers.get(number, [])]
+
+    def get_neighbor_scans(self, file_path, radius=2):
+        """返回同一前綴中編號相鄰的前後 radius 個掃描（有 .txt 標頭者），依距離排序
+
+        例如開啟 _457 時返回 [_458, _456, _459, _455]，下一個掃描優先。
+        """
+        with self._lock:
+            record = self.get_scan_for_file(file_path)
+            if record is None:
+                return []
+            keys = [key for key in self.list_scans('number_asc')
+                    if key[0] == record.prefix and self.scans[key].txt_path]
+            try:
+                position = keys.index(record.key)
+            except ValueError:
+                return []
+
+            neighbors = []
+            for distance in range(1, radius + 1):
+                for offset in (distance, -distance):
+                    i = position + offset
+                    if 0 <= i < len(keys):
+                        neighbors.append(self.scans[keys[i]])
+            return neighbors
+
+    def get_channels(self, record):
+        """返回掃描的通道檔名 -> 路徑對應，包含標頭 FileDescriptions 中列出的檔案"""
+        with self._lock:
+            self._load_header_channels(record)
+            return dict(record.channel_paths)
+
+    def describe_file(self, name):
+        """返回前端檔案列表使用的檔案描述字典"""
+        with self._lock:
+            info = self.files.get(name)
+            if info is None:
+                return None
+            parsed = parse_scan_filename(name)
+            return {
+                "name": name,
+                "path": info["path"],
+                "number": parsed[1] if parsed else 0,
+                "type": name.split('.')[-1],
+                "modTime": info["mtime"],
+                "modTimeStr": datetime.fromtimestamp(info["mtime"]).strftime('%Y/%m/%d %H:%M:%S')
+            }
+
+    def apply_changes(self, added=(), modified=(), removed=()):
+        """套用增量變更（檔名列表），不重新走訪整個資料夾"""
+        with self._lock:
+            self._touch()
+            for name in removed:
+                self._remove_file(name)
+            for name in list(added) + list(modified):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    self._remove_file(name)
+                    continue
+                self._remove_file(name)
+                self._add_file(name, path, stat.st_size, stat.st_mtime)
+            try:
+                self.dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+            except OSError:
+                pass
+
+    def describe_scan(self, key):
+        """返回掃描分組的描述字典：標頭檔案與所有通道檔案"""
+        with self._lock:
+            record = self.scans.get(key)
+            if record is None:
+                return None
+            header = self.describe_file(os.path.basename(record.txt_path)) if record.txt_path else None
+            channels = [self.describe_file(name) for name in sorted(record.channel_paths)]
+            channels = [info for info in channels if info]
+            mod_times = [info["modTime"] for info in channels] + ([header["modTime"]] if header else [])
+            return {
+                "key": f"{record.prefix}_{record.number}",
+                "prefix": record.prefix,
+                "number": record.number,
+                "header": header,
+                "channels": channels,
+                "modTime": max(mod_times) if mod_times else 0
+            }
+
+    def describe_scans_for_files(self, names):
+        """返回檔名所屬掃描的目前描述，以及已不存在的掃描鍵
+
+        Returns:
+            (掃描描述列表, 已移除的掃描鍵列表)，鍵的格式與 describe_scan 的 "key" 相同
+        """
+        keys = set()
+        for name in names:
+            parsed = parse_scan_filename(name)
+            if parsed is not None:
+                keys.add((parsed[0], parsed[1]))
+        with self._lock:
+            scans = [self.describe_scan(key) for key in sorted(keys) if key in self.scans]
+            removed = [f"{prefix}_{number}" for prefix, number in sorted(keys) if (prefix, number) not in self.scans]
+        return scans, removed
+
+    def list_files(self, sort_option='number_asc', file_type=None, search=None):
+        """返回排序後的檔名列表，結果在索引變更前會被重用"""
+        with self._lock:
+            cache_key = ('files', sort_option, file_type, search)
+            names = self._sorted_cache.get(cache_key)
+            if names is None:
+                names = [name for name in self.files
+                         if (file_type is None or name.lower().endswith('.' + file_type.lower()))
+                         and (not search or search.lower() in name.lower())]
+                field, descending = self._sort_spec(sort_option)
+                if field == 'number':
+                    names.sort(key=lambda name: (self._file_number(name), name), reverse=descending)
+                elif field == 'time':
+                    names.sort(key=lambda name: self.files[name]["mtime"], reverse=descending)
+                else:
+                    names.sort(reverse=descending)
+                self._sorted_cache[cache_key] = names
+            return names
+
+    def list_scans(self, sort_option='number_asc', search=None):
+        """返回排序後的掃描鍵 (前綴, 編號) 列表"""
+        with self._lock:
+            cache_key = ('scans', sort_option, search)
+            keys = self._sorted_cache.get(cache_key)
+            if keys is None:
+                keys = [key for key in self.scans
+                        if not search or search.lower() in f"{key[0]}_{key[1]}".lower()]
+                field, descending = self._sort_spec(sort_option)
+                if field == 'number':
+                    keys.sort(key=lambda key: (key[1], key[0]), reverse=descending)
+                elif field == 'time':
+                    keys.sort(key=self._scan_mtime, reverse=descending)
+                else:
+                    keys.sort(reverse=descending)
+                self._sorted_cache[cache_key] = keys
+            return keys
+
+    def get_listing(self, group_by_scan=False, sort_option='number_asc', file_type=None, search=None,
+                    page=0, page_size=500, offset=None):
+        """返回分頁後的檔案或掃描分組列表
+
+        只有當頁的項目會被格式化（日期字串等），大型資料夾也能維持互動速度。
+        offset 指定時從該位置開始取 page_size 個項目（取代 page * page_size），
+        前端在本地套用資料夾變更後以已載入的項目數接續載入。
+        """
+        with self._lock:
+            if group_by_scan:
+                keys = self.list_scans(sort_option, search)
+                describe = self.describe_scan
+            else:
+                keys = self.list_files(sort_option, file_type, search)
+                describe = self.describe_file
+
+            total = len(keys)
+            page_size = max(1, int(page_size))
+            total_pages = max(1, (total + page_size - 1) // page_size)
+            start = max(0, int(offset)) if offset is not None else max(0, int(page)) * page_size
+            items = [describe(key) for key in keys[start:start + page_size]]
+            return {
+                "items": [item for item in items if item],
+                "page": int(page),
+                "pageSize": page_size,
+                "total": total,
+                "totalPages": total_pages,
+                "version": self.version
+            }
+
+    @staticmethod
+    def _sort_spec(sort_option):
+        if sort_option not in SORT_OPTIONS:
+            raise ValueError(f"未知的排序選項: {sort_option}")
+        field, direction = sort_option.rsplit('_', 1)
+        return field, direction == 'desc'
+
+    def _file_number(self, name):
+        key = self._file_scans.get(name)
+        return key[1] if key else 0
+
+    def _scan_mtime(self, key):
+        record = self.scans[key]
+        names = list(record.channel_paths)
+        if record.txt_path:
+            names.append(os.path.basename(record.txt_path))
+        return max((self.files[name]["mtime"] for name in names if name in self.files), default=0)
+
+    def get_file_info(self, name):
+        """返回檔案的快取 stat 資訊"""
+        with self._lock:
+            return self.files.get(name)
+
+    def is_stale(self):
+        """資料夾的修改時間改變（新增或刪除檔案）時索引需要重建"""
+        try:
+            return os.stat(self.directory).st_mtime_ns != self.dir_mtime_ns
+        except OSError:
+            return True
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_folder_index(directory, refresh=True):
+    """返回資料夾的共用索引，首次使用或資料夾內容變更時才重新走訪
+
+    refresh 為 False 時不檢查資料夾修改時間（由 FolderWatcher 以增量方式維護索引時使用）。
+    """
+    directory = os.path.abspath(directory)
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None:
+            index = FolderIndex(directory)
+            _indexes[directory] = index
+    with index._lock:
+        if index.dir_mtime_ns is None or (refresh and index.is_stale()):
+            index.build()
+    return index
@@ -0,0 +1,289 @@
+import os
+import sys
+import time
+import select
+import struct
+import logging
+import threading
+import ctypes
+import ctypes.util
+from .folder_index import SCAN_EXTENSIONS, get_folder_index
+
+logger = logging.getLogger(__name__)
+
+# inotify 事件遮罩（見 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+    IN_DELETE_SELF | IN_MOVE_SELF
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_inotify():
+    """載入 libc 的 inotify 函式，不支援時返回 None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FolderWatcher:
+    """
+    監看資料夾的增量變更
+
+    在 Linux 上優先使用 inotify；不支援或設定為輪詢時（例如網路掛載的資料夾，
+    遠端寫入不會觸發 inotify），改為定期以 os.scandir 比對快照。
+    每批變更會套用到 FolderIndex，並以
+    {"directory", "added", "modified", "removed"} 形式傳給回呼函式，
+    其中 added/modified 為檔案描述字典，removed 為檔名列表。
+    """
+
+    def __init__(self, directory, on_changes=None, poll_interval=2.0, use_inotify=True, settle_time=0.2):
+        """
+        Args:
+            directory: 要監看的資料夾
+            on_changes: 收到變更時呼叫的函式，參數為變更字典
+            poll_interval: 輪詢模式的間隔（秒）
+            use_inotify: 是否嘗試使用 inotify
+            settle_time: 收到 inotify 事件後等待合併後續事件的時間（秒）
+        """
+        self.directory = os.path.abspath(directory)
+        self.on_changes = on_changes
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.settle_time = settle_time
+        self.mode = None
+        self._snapshot = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """在背景執行緒開始監看"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        get_folder_index(self.directory)
+        self._snapshot = self._take_snapshot()
+        self._thread = threading.Thread(target=self._run, name=f"FolderWatcher-{self.directory}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止監看"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        libc = _load_inotify() if self.use_inotify else None
+        if libc is not None:
+            try:
+                self._run_inotify(libc)
+                return
+            except OSError as e:
+                logger.warning(f"inotify 無法使用，改用輪詢: {str(e)}")
+        self._run_polling()
+
+    def _run_polling(self):
+        self.mode = 'polling'
+        logger.info(f"以輪詢模式監看資料夾: {self.directory}")
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self._process(None)
+            except Exception as e:
+                logger.error(f"輪詢資料夾變更時出錯: {str(e)}")
+
+    def _run_inotify(self, libc):
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失敗")
+        try:
+            wd = libc.inotify_add_watch(fd, os.fsencode(self.directory), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_add_watch 失敗")
+
+            self.mode = 'inotify'
+            logger.info(f"以 inotify 監看資料夾: {self.directory}")
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([fd], [], [], 0.5)
+                if not readable:
+                    continue
+
+                # 等待短暫時間合併同一批寫入產生的多個事件
+                time.sleep(self.settle_time)
+                names, rescan = self._read_events(fd)
+                if rescan is None:
+                    logger.warning(f"監看的資料夾已被移除或移動: {self.directory}")
+                    break
+                try:
+                    self._process(None if rescan else names)
+                except Exception as e:
+                    logger.error(f"處理資料夾變更時出錯: {str(e)}")
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read_events(fd):
+        """讀取所有待處理的 inotify 事件，返回 (檔名集合, 是否需要完整比對)"""
+        names = set()
+        rescan = False
+        while True:
+            try:
+                buffer = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset:offset + length].rstrip(b'\0')
+                offset += length
+
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    return names, None
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                elif name:
+                    names.add(os.fsdecode(name))
+        return names, rescan
+
+    def _take_snapshot(self):
+        """以單次 os.scandir 取得 {檔名: (大小, 修改時間)}"""
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(SCAN_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _process(self, names):
+        """比對變更並通知；names 為 None 時比對整個資料夾"""
+        if names is None:
+            current = self._take_snapshot()
+            candidates = set(current) | set(self._snapshot)
+        else:
+            current = {}
+            candidates = {name for name in names if name.lower().endswith(SCAN_EXTENSIONS)}
+            for name in candidates:
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                    current[name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    pass
+
+        added, modified, removed = [], [], []
+        for name in candidates:
+            old = self._snapshot.get(name)
+            new = current.get(name)
+            if new is None:
+                if old is not None:
+                    removed.append(name)
+                    del self._snapshot[name]
+            elif old is None:
+                added.append(name)
+                self._snapshot[name] = new
+            elif old != new:
+                modified.append(name)
+                self._snapshot[name] = new
+
+        if not (added or modified or removed):
+            return None
+
+        # 直接套用增量，不因資料夾修改時間改變而重新走訪
+        index = get_folder_index(self.directory, refresh=False)
+        index.apply_changes(added, modified, removed)
+        changes = {
+            "directory": self.directory,
+            "added": [info for info in map(index.describe_file, sorted(added)) if info],
+            "modified": [info for info in map(index.describe_file, sorted(modified)) if info],
+            "removed": sorted(removed)
+        }
+        logger.info(f"資料夾變更: 新增 {len(added)}，修改 {len(modified)}，刪除 {len(removed)}")
+
+        if self.on_changes is not None:
+            try:
+                self.on_changes(changes)
+            except Exception as e:
+                logger.error(f"資料夾變更回呼失敗: {str(e)}")
+        return changes
+
+
+class FolderChangeQueue:
+    """
+    合併尚未取走的資料夾變更
+
+    每個檔名只保留一筆淨變更（例如新增後刪除的檔案直接消失、修改多次只保留最後一次），
+    因此無論監看多久未取走，暫存的大小都不超過資料夾中的檔案數。
+    """
+
+    def __init__(self):
+        self._directory = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def push(self, changes):
+        """加入一批 {"directory", "added", "modified", "removed"} 變更"""
+        with self._lock:
+            if changes["directory"] != self._directory:
+                self._directory = changes["directory"]
+                self._entries = {}
+            for info in changes["added"]:
+                self._merge(info["name"], "added", info)
+            for info in changes["modified"]:
+                self._merge(info["name"], "modified", info)
+            for name in changes["removed"]:
+                self._merge(name, "removed", None)
+
+    def _merge(self, name, kind, info):
+        previous = self._entries.get(name, (None, None))[0]
+        if previous == "added":
+            if kind == "removed":
+                # 新增後又刪除：前端從未看過此檔案
+                del self._entries[name]
+                return
+            kind = "added"
+        elif previous == "removed" and kind == "added":
+            kind = "modified"
+        self._entries[name] = (kind, info)
+
+    def drain(self):
+        """取出並清空合併後的變更，沒有變更時返回 None"""
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            if not entries:
+                return None
+            changes = {"directory": self._directory, "added": [], "modified": [], "removed": []}
+            for name in sorted(entries):
+                kind, info = entries[name]
+                changes[kind].append(name if kind == "removed" else info)
+            return changes
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
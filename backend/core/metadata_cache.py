@@ -0,0 +1,154 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from .cache_paths import get_user_cache_dir, get_file_identity
+from .parsers.txt_header import parse_txt_header
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """
+    .txt 標頭元數據快取
+
+    以 (絕對路徑, 檔案大小, 修改時間) 為鍵，檔案變更後舊項目自動失效。
+    記憶體中為 LRU，另可選擇以 SQLite 檔案持久化，重新開啟時不需再讀取標頭。
+    """
+
+    def __init__(self, max_entries=4096, db_path=None):
+        """
+        Args:
+            max_entries: 記憶體 LRU 最多保留的項目數
+            db_path: SQLite 快取檔路徑（可位於資料夾或使用者快取目錄），None 表示只使用記憶體
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute('PRAGMA journal_mode=WAL')
+                self._db.execute('PRAGMA synchronous=NORMAL')
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS headers ('
+                    'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, data TEXT)'
+                )
+                self._db.commit()
+            except Exception as e:
+                logger.warning(f"無法開啟元數據快取檔 {db_path}，僅使用記憶體快取: {str(e)}")
+                self._db = None
+
+    def get_header(self, file_path):
+        """返回 (parameters, file_descriptions)，參數值為原始字串
+
+        返回的是副本，呼叫端可以自由修改。
+        """
+        entry = self._get_entry(file_path)
+        return dict(entry['parameters']), [dict(desc) for desc in entry['fileDescriptions']]
+
+    def get_content(self, file_path):
+        """返回 .txt 檔案的完整文字內容"""
+        return self._get_entry(file_path)['content']
+
+    def invalidate(self, file_path):
+        """移除指定檔案的快取項目"""
+        abs_path = os.path.abspath(file_path)
+        with self._lock:
+            self._entries.pop(abs_path, None)
+            if self._db is not None:
+                self._db.execute('DELETE FROM headers WHERE path = ?', (abs_path,))
+                self._db.commit()
+
+    def clear(self):
+        """清空記憶體與磁碟快取"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM headers')
+                self._db.commit()
+
+    def _get_entry(self, file_path):
+        abs_path, size, mtime_ns = get_file_identity(file_path)
+
+        with self._lock:
+            cached = self._entries.get(abs_path)
+            if cached is not None and cached[0] == size and cached[1] == mtime_ns:
+                self._entries.move_to_end(abs_path)
+                return cached[2]
+
+            entry = self._load_from_db(abs_path, size, mtime_ns)
+
+        if entry is None:
+            entry = self._parse(abs_path)
+            with self._lock:
+                self._store_to_db(abs_path, size, mtime_ns, entry)
+
+        with self._lock:
+            self._entries[abs_path] = (size, mtime_ns, entry)
+            self._entries.move_to_end(abs_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    @staticmethod
+    def _parse(abs_path):
+        """讀取並解析標頭"""
+        with open(abs_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+        parameters, file_descriptions = parse_txt_header(content)
+        return {
+            'content': content,
+            'parameters': parameters,
+            'fileDescriptions': file_descriptions
+        }
+
+    def _load_from_db(self, abs_path, size, mtime_ns):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                'SELECT data FROM headers WHERE path = ? AND size = ? AND mtime_ns = ?',
+                (abs_path, size, mtime_ns)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            logger.warning(f"讀取元數據快取失敗: {str(e)}")
+            return None
+
+    def _store_to_db(self, abs_path, size, mtime_ns, entry):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                'INSERT OR REPLACE INTO headers (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)',
+                (abs_path, size, mtime_ns, json.dumps(entry))
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"寫入元數據快取失敗: {str(e)}")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_metadata_cache():
+    """返回共用的元數據快取，持久化於使用者快取目錄"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                db_path = os.path.join(get_user_cache_dir(), 'metadata.sqlite')
+            except Exception as e:
+                logger.warning(f"無法建立使用者快取目錄: {str(e)}")
+                db_path = None
+            _default_cache = MetadataCache(db_path=db_path)
+        return _default_cache
@@ -0,0 +1,206 @@
+import io
+import os
+import re
+import time
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 標題格式 "X(U)-It_to_PC(100/100)"：掃描軸、通道名稱與網格點數
+CAPTION_PATTERN = re.compile(r'^X\((?P<axis>[^)]*)\)-(?P<channel>.+?)(?:\((?P<grid>[^)]*)\))?$')
+
+# 欄位名稱中的單位，如 "Bias [V]" 或 "Current (A)"
+COLUMN_UNIT_PATTERN = re.compile(r'^(?P<name>.*?)\s*[\[(](?P<unit>[^\])]*)[\])]\s*$')
+
+# Anfatec 掃描軸代號對應的物理單位
+AXIS_UNITS = {'U': 'V', 'Z': 'nm', 'T': 's'}
+
+
+class DatParser:
+    """
+    解析 SPM .dat 光譜數據檔案的類別
+
+    數值區塊以固定大小的位元組區塊讀取，每個區塊交給 numpy 的 C 解析器一次轉換，
+    不逐行在 Python 中處理。支援兩種格式：
+        - 矩陣格式（FileDescriptions 中有 HeaderRows/HeaderCols）：前 HeaderRows 列為掃描軸，
+          每列前 HeaderCols 欄為曲線的位置資訊，其餘為該曲線的數值
+        - 一般欄位格式：開頭的非數值行為標頭，最後一行標頭為欄位名稱
+    """
+
+    def __init__(self, file_path, file_description=None, parameters=None, chunk_bytes=4 * 1024 * 1024,
+                 dtype=np.float64):
+        """
+        Args:
+            file_path: .dat 檔案路徑
+            file_description: .txt 標頭中對應此檔案的 FileDesc 字典
+            parameters: .txt 標頭的參數字典，含所有 FileDescriptions（用於查找通道單位）
+            chunk_bytes: 每次讀取的位元組數
+            dtype: 輸出數值型別
+        """
+        self.file_path = file_path
+        self.file_description = file_description or {}
+        self.parameters = parameters or {}
+        self.chunk_bytes = chunk_bytes
+        self.dtype = np.dtype(dtype)
+        self.header_rows = self._get_int(self.file_description, 'HeaderRows', 0)
+        self.header_cols = self._get_int(self.file_description, 'HeaderCols', 0)
+        self.column_names = []
+        self.header_data = None
+        self.data = None
+        self.load_time = None
+
+    @staticmethod
+    def _get_int(desc, key, default):
+        try:
+            return int(desc.get(key, default))
+        except (ValueError, TypeError):
+            return default
+
+    def iter_chunks(self):
+        """逐塊產生數值資料的 2D 陣列（每列為檔案中的一行），適用於非常長的量測
+
+        第一次產生數據前會先讀取標頭，之後 column_names 與 header_data 即可使用。
+        """
+        try:
+            with open(self.file_path, 'rb') as f:
+                pending = self._read_header(f)
+                n_cols = None
+
+                while True:
+                    block = f.read(self.chunk_bytes)
+                    if not block:
+                        break
+                    block = pending + block
+                    cut = block.rfind(b'\n')
+                    if cut < 0:
+                        pending = block
+                        continue
+                    pending = block[cut + 1:]
+                    chunk = self._convert(block[:cut + 1], n_cols)
+                    if chunk is not None:
+                        n_cols = chunk.shape[1]
+                        yield chunk
+
+                chunk = self._convert(pending, n_cols)
+                if chunk is not None:
+                    yield chunk
+        except Exception as e:
+            logger.error(f"解析 DAT 檔案時出錯: {str(e)}")
+            raise
+
+    def _convert(self, block, n_cols):
+        """以 numpy 的 C 解析器一次轉換整個區塊"""
+        if not block.strip():
+            return None
+        chunk = np.loadtxt(io.BytesIO(block), dtype=self.dtype, ndmin=2)
+        if n_cols is not None and chunk.shape[1] != n_cols:
+            raise ValueError(f"DAT 檔案欄位數不一致: {chunk.shape[1]} != {n_cols}")
+        return chunk
+
+    def _read_header(self, f):
+        """讀取標頭列，返回已讀取但屬於數據區的位元組"""
+        header_lines = []
+        if self.header_rows > 0:
+            # 矩陣格式：固定列數的數值標頭
+            for _ in range(self.header_rows):
+                header_lines.append(f.readline())
+            self.header_data = [np.loadtxt(io.BytesIO(line), dtype=self.dtype, ndmin=1)
+                                for line in header_lines if line.strip()]
+            return b''
+
+        # 一般格式：略過開頭無法轉換為數值的行
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip() and self._is_numeric(line):
+                self._set_column_names(header_lines)
+                return line
+            header_lines.append(line)
+        self._set_column_names(header_lines)
+        return b''
+
+    @staticmethod
+    def _is_numeric(line):
+        try:
+            [float(token) for token in line.split()]
+            return True
+        except ValueError:
+            return False
+
+    def _set_column_names(self, header_lines):
+        lines = [line.decode('utf-8', errors='ignore').strip() for line in header_lines if line.strip()]
+        if lines:
+            separator = '\t' if '\t' in lines[-1] else None
+            self.column_names = [name.strip() for name in lines[-1].split(separator) if name.strip()]
+
+    def parse(self):
+        """解析整個 .dat 檔案
+
+        Returns:
+            dict: 矩陣格式時包含
+                - 'axis': 掃描軸數值（來自第一列標頭）
+                - 'axisUnit': 掃描軸單位
+                - 'positions': 每條曲線的前 HeaderCols 欄
+                - 'curves': 2D 陣列，每列為一條曲線
+                - 'unit': 曲線數值的物理單位
+              一般格式時包含
+                - 'columns': {欄位名稱: 1D 陣列}
+                - 'units': {欄位名稱: 單位}
+        """
+        start_time = time.perf_counter()
+        chunks = list(self.iter_chunks())
+        data = np.concatenate(chunks) if chunks else np.empty((0, 0), dtype=self.dtype)
+        self.data = data
+
+        caption = self.file_description.get('Caption', '')
+        caption_match = CAPTION_PATTERN.match(caption)
+        channel = caption_match.group('channel') if caption_match else caption
+
+        result = {
+            "fileName": os.path.basename(self.file_path),
+            "caption": caption,
+            "channel": channel
+        }
+
+        if self.header_rows > 0:
+            axis = self.header_data[0][self.header_cols:] if self.header_data else None
+            axis_symbol = caption_match.group('axis') if caption_match else ''
+            result.update({
+                "axis": axis,
+                "axisName": axis_symbol,
+                "axisUnit": AXIS_UNITS.get(axis_symbol, ''),
+                "positions": data[:, :self.header_cols],
+                "curves": data[:, self.header_cols:],
+                "unit": self._find_channel_unit(channel)
+            })
+        else:
+            names = self._resolve_column_names(data.shape[1] if data.ndim == 2 else 0)
+            columns = {}
+            units = {}
+            for i, name in enumerate(names):
+                match = COLUMN_UNIT_PATTERN.match(name)
+                key = match.group('name') if match else name
+                columns[key] = data[:, i]
+                units[key] = match.group('unit') if match else self._find_channel_unit(key)
+            result.update({"columns": columns, "units": units})
+
+        self.load_time = time.perf_counter() - start_time
+        logger.info(f"DAT 檔案載入完成: {result['fileName']}，{data.shape[0]} 列，"
+                    f"耗時 {self.load_time * 1000:.1f} ms")
+        return result
+
+    def _resolve_column_names(self, n_cols):
+        names = list(self.column_names[:n_cols])
+        names += [f"Column{i + 1}" for i in range(len(names), n_cols)]
+        return names
+
+    def _find_channel_unit(self, channel):
+        """從標頭的 FileDescriptions 找出通道的物理單位（如 It_to_PC -> It_to_PCFwd 的 A）"""
+        if not channel:
+            return ''
+        for desc in self.parameters.get('FileDescriptions', []):
+            if desc.get('Caption', '').startswith(channel) and 'PhysUnit' in desc:
+                return desc['PhysUnit']
+        return ''
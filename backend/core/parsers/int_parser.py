@@ -1,50 +1,131 @@
 import numpy as np
-import struct
 import os
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# .int 檔案的像素格式：小端序 32 位元有號整數
+INT_DTYPE = np.dtype('<i4')
+
 class IntParser:
     """解析 SPM .int 二進位數據檔案的類別"""
-    
-    def __init__(self, file_path, scale, x_pixel, y_pixel):
+
+    def __init__(self, file_path, scale, x_pixel, y_pixel, dtype=np.float64):
         self.file_path = file_path
         self.scale = scale
         self.x_pixel = x_pixel
         self.y_pixel = y_pixel
+        self.dtype = np.dtype(dtype)
         self.data = None
-    
+        self.load_time = None
+
     def parse(self):
-        """解析 .int 檔案並返回形貌數據"""
+        """解析 .int 檔案並返回形貌數據
+
+        直接將檔案內容視為小端序 int32 陣列（不經過 Python 物件），
+        在同一次運算中完成翻轉與比例換算，只配置一次輸出陣列。
+        """
         try:
+            start_time = time.perf_counter()
+
             with open(self.file_path, 'rb') as f:
                 int_file = f.read()
-            
-            image_data = []
-            
+
             # 檢查檔案長度是否符合預期
-            expected_length = self.x_pixel * self.y_pixel * 4  # 每個像素 4 位元組
+            expected_length = self.x_pixel * self.y_pixel * INT_DTYPE.itemsize  # 每個像素 4 位元組
             if len(int_file) != expected_length:
                 logger.warning(f"檔案長度 ({len(int_file)}) 與預期不符 ({expected_length})")
-            
-            # 解析數據
-            for i in range(int(len(int_file) / 4)):
-                image_data_numvalue = struct.unpack('<i', int_file[4*i:4*i+4])[0]
-                image_data.append(image_data_numvalue)
-            
-            # 將數據轉換為 numpy 數組並重塑
-            image_data = np.array(image_data)
-            image_data = image_data.reshape(self.y_pixel, self.x_pixel)
-            
-            # 應用比例因子
-            image_data = image_data * self.scale
-            
-            # 將數據上下顛倒
-            image_data = np.flipud(image_data)
-            
+
+            # 零拷貝：直接以 int32 視圖解讀位元組並重塑
+            raw = np.frombuffer(int_file, dtype=INT_DTYPE, count=len(int_file) // INT_DTYPE.itemsize)
+            raw = raw.reshape(self.y_pixel, self.x_pixel)
+
+            # 上下顛倒（視圖）並套用比例因子，直接輸出為目標型別
+            image_data = np.multiply(raw[::-1], self.scale, dtype=self.dtype)
+
+            self.load_time = time.perf_counter() - start_time
+            logger.info(f"INT 檔案載入完成: {os.path.basename(self.file_path)}，"
+                        f"耗時 {self.load_time * 1000:.1f} ms")
+
             self.data = image_data
             return self.data
         except Exception as e:
             logger.error(f"解析 INT 檔案時出錯: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def open_memmap(self):
+        """以記憶體映射方式開啟 .int 檔案，返回延遲讀取的 LazyIntArray
+
+        不會將整個檔案讀入記憶體，只有實際存取的列或區域才會被解碼。
+        """
+        try:
+            return LazyIntArray(self.file_path, self.scale, self.x_pixel, self.y_pixel, self.dtype)
+        except Exception as e:
+            logger.error(f"以記憶體映射開啟 INT 檔案時出錯: {str(e)}")
+            raise
+
+
+class LazyIntArray:
+    """
+    記憶體映射的 .int 形貌數據
+
+    行為類似唯讀的 2D numpy 陣列：支援切片、列範圍與矩形區域讀取，
+    比例因子與上下翻轉在存取時才套用，座標與 IntParser.parse() 的結果一致。
+    """
+
+    def __init__(self, file_path, scale, x_pixel, y_pixel, dtype=np.float64):
+        self.file_path = file_path
+        self.scale = scale
+        self.dtype = np.dtype(dtype)
+
+        expected_length = x_pixel * y_pixel * INT_DTYPE.itemsize
+        file_length = os.path.getsize(file_path)
+        if file_length != expected_length:
+            logger.warning(f"檔案長度 ({file_length}) 與預期不符 ({expected_length})")
+
+        raw = np.memmap(file_path, dtype=INT_DTYPE, mode='r', shape=(y_pixel, x_pixel))
+        # 翻轉只是視圖，不會讀取任何資料
+        self._raw = raw
+        self._view = raw[::-1]
+
+    @property
+    def shape(self):
+        return self._view.shape
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def size(self):
+        return self._view.size
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        """讀取指定區域並套用比例因子，返回一般的 numpy 陣列"""
+        return np.multiply(self._view[key], self.scale, dtype=self.dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        data = self[:, :]
+        return data if dtype is None else data.astype(dtype, copy=False)
+
+    def read_rows(self, start, stop):
+        """讀取 [start, stop) 範圍內的列"""
+        return self[start:stop]
+
+    def read_window(self, row_start, row_stop, col_start, col_stop):
+        """讀取矩形區域 [row_start, row_stop) × [col_start, col_stop)"""
+        return self[row_start:row_stop, col_start:col_stop]
+
+    def iter_row_blocks(self, block_rows=256):
+        """依序產生 (起始列, 數據區塊)，用於分塊處理大型掃描"""
+        for start in range(0, self.shape[0], block_rows):
+            yield start, self[start:start + block_rows]
+
+    def close(self):
+        """釋放記憶體映射"""
+        self._view = None
+        self._raw = None
@@ -0,0 +1,93 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 檔案描述區段的起訖標記
+FILE_DESC_BEGIN = 'FileDescBegin'
+FILE_DESC_END = 'FileDescEnd'
+
+# 單一正規表示式一次掃描整個標頭：區段標記或 `key : value` 行（';' 開頭為註解）
+_TOKEN_PATTERN = re.compile(
+    r'^[ \t]*(?:(' + FILE_DESC_BEGIN + '|' + FILE_DESC_END + r')|([^;:\r\n][^:\r\n]*):([^\n]*))',
+    re.MULTILINE
+)
+
+
+def coerce_value(raw_value):
+    """將參數字串轉換為 int、float 或保留字串
+
+    行尾 ';' 之後的註解（例如 "1.500 ; lines/sec"）不參與轉換。
+    """
+    value = raw_value.split(';', 1)[0].strip()
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return raw_value
+
+
+def iter_header_tokens(content, typed=False):
+    """單次走訪 .txt 標頭內容，逐一產生每個 `key : value` 配對
+
+    Args:
+        content: 標頭檔案的完整文字內容
+        typed: 為 True 時將值轉換為 int 或 float（無法轉換時保留字串）
+
+    Yields:
+        (block, key, value)
+            - block: 所屬 FileDesc 區段索引，不在區段內時為 None
+            - key: 參數名稱
+            - value: 去除空白後的原始字串，或轉換型別後的值
+    """
+    block = None
+    block_count = 0
+    for marker, key, raw_value in _TOKEN_PATTERN.findall(content):
+        if marker:
+            if marker == FILE_DESC_BEGIN:
+                block = block_count
+                block_count += 1
+            else:
+                block = None
+            continue
+
+        raw_value = raw_value.strip()
+        yield block, key.strip(), coerce_value(raw_value) if typed else raw_value
+
+
+def parse_txt_header(content, typed=False):
+    """解析 .txt 標頭為參數字典與檔案描述列表
+
+    Args:
+        content: 標頭檔案的完整文字內容
+        typed: 為 True 時返回轉換型別後的值，否則返回原始字串（前端顯示使用）
+
+    Returns:
+        (parameters, file_descriptions)
+            - parameters: 區段外所有參數，重複的鍵以第一次出現為準
+            - file_descriptions: 每個 FileDesc 區段的參數字典列表
+    """
+    parameters = {}
+    file_descriptions = []
+    for block, key, value in iter_header_tokens(content, typed=typed):
+        if block is None:
+            target = parameters
+        else:
+            while len(file_descriptions) <= block:
+                file_descriptions.append({})
+            target = file_descriptions[block]
+
+        if key not in target:
+            target[key] = value
+
+    return parameters, file_descriptions
+
+
+def read_txt_header(file_path, typed=False):
+    """讀取並解析 .txt 標頭檔案"""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    return parse_txt_header(content, typed=typed)
@@ -0,0 +1,314 @@
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from .array_transport import decode_array
+from .analysis.background import PlaneBackground, PolynomialBackground
+from .analysis.fit_mask import has_fit_options
+from .analysis.int_analysis import IntAnalysis
+
+logger = logging.getLogger(__name__)
+
+# 平面化時排除特徵的擬合選項（見 core.analysis.fit_mask）
+FIT_OPTIONS = ("mask", "threshold", "robust", "clip_sigma", "max_iterations", "subsample")
+
+# 管線可記錄的操作："reset" 回到管線的原始數據（可復原）
+PIPELINE_OPERATIONS = ("flatten", "tilt", "reset")
+
+
+def fit_options(params):
+    """從操作參數取出排除特徵的擬合選項（mask 可為巢狀列表、encode_array 的編碼或 numpy 陣列）"""
+    options = {key: params[key] for key in FIT_OPTIONS if params.get(key) is not None}
+    if "mask" in options:
+        options["mask"] = decode_array(options["mask"]).astype(bool)
+    return options
+
+
+def apply_operation(image_data, operation, params=None):
+    """對形貌數據執行處理操作，返回新的陣列（不修改輸入）
+
+    Args:
+        image_data: 2D numpy數組
+        operation: 操作名稱
+            - "flatten": params 為 {"method": "mean" | "polyfit" | "plane" | "polynomial", "degree": 1}
+              （"polynomial" 為全局二維曲面，degree 為曲面階數），
+              另可包含 FIT_OPTIONS 中的遮罩與穩健擬合選項
+            - "tilt": params 為 {"direction": "up" | "down" | "left" | "right", "fine_tune": False}
+        params: 操作參數字典
+    """
+    params = params or {}
+    image_data = np.asarray(image_data)
+    if not np.issubdtype(image_data.dtype, np.floating):
+        image_data = image_data.astype(np.float64)
+
+    if operation == "flatten":
+        method = params.get("method", "mean")
+        options = fit_options(params)
+        if method == "mean":
+            return IntAnalysis.linewise_flatten_mean(image_data, **options)
+        if method == "polyfit":
+            return IntAnalysis.linewise_flatten_polyfit(image_data, deg=int(params.get("degree", 1)), **options)
+        if method == "plane":
+            return IntAnalysis.plane_flatten(image_data, **options)
+        if method == "polynomial":
+            return IntAnalysis.polynomial_flatten(image_data, order=int(params.get("degree", 2)), **options)
+        raise ValueError(f"未知的平面化方法: {method}")
+
+    if operation == "tilt":
+        return IntAnalysis.tilt_image(image_data, params.get("direction"),
+                                      fine_tune=bool(params.get("fine_tune", False)))
+
+    raise ValueError(f"未知的處理操作: {operation}")
+
+
+class PipelineState:
+    """
+    管線某一步之後的數據：基底陣列加上參數化的平面修正
+
+    傾斜與平面校正只產生新的平面修正並共用同一個基底陣列，
+    修正後的陣列在第一次使用時才計算並保留。
+    """
+
+    def __init__(self, base, background=None, base_range=None):
+        self.base = base
+        self.background = background or PlaneBackground()
+        self._base_range = base_range
+        self._data = None
+        # 此狀態的統計數據（由 Dataset 計算後保留）
+        self.statistics = None
+
+    @property
+    def data(self):
+        if self.background.is_zero:
+            return self.base
+        if self._data is None:
+            self._data = self.background.apply(self.base)
+        return self._data
+
+    @property
+    def shape(self):
+        return self.base.shape
+
+    def __getitem__(self, key):
+        """以二維切片讀取時只修正切出的區域，不計算整張修正後的陣列（剖面等只需要小區域的操作）"""
+        if (self._data is None and not self.background.is_zero and isinstance(key, tuple) and len(key) == 2
+                and all(isinstance(item, slice) for item in key)):
+            return self.background.apply_region(self.base[key], self.base.shape, *key)
+        return self.data[key]
+
+    @property
+    def base_range(self):
+        """基底數據的範圍（傾斜步長使用），同一基底只計算一次"""
+        if self._base_range is None:
+            self._base_range = float(np.max(self.base)) - float(np.min(self.base))
+        return self._base_range
+
+    def with_background(self, background):
+        """共用基底、以新的平面修正建立狀態"""
+        return PipelineState(self.base, background, self._base_range)
+
+
+def step_key(operation, params):
+    """步驟的識別鍵：操作與參數相同的步驟產生相同的結果"""
+    def default(value):
+        if isinstance(value, np.ndarray):
+            return {"shape": value.shape, "sha1": hashlib.sha1(np.ascontiguousarray(value).data).hexdigest()}
+        return str(value)
+    text = json.dumps([operation, params or {}], sort_keys=True, default=default)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ProcessingPipeline:
+    """
+    數據集的處理管線
+
+    依序記錄處理操作與參數，目前的數據由原始數據重新套用前 position 個步驟得到。
+    每個步驟的結果以「到該步驟為止的步驟鍵」快取，修改或移除某一步時只從該步開始重新計算；
+    復原與重做只移動 position。快取以位元組數為上限，超過時移除最久未使用的中間結果。
+    """
+
+    def __init__(self, original, max_cache_bytes=512 * 1024 * 1024, max_cached_states=64):
+        """
+        Args:
+            original: 管線的原始數據（不會被修改）
+            max_cache_bytes: 中間結果快取的位元組上限（原始數據與目前的結果不計入、不會被移除）
+            max_cached_states: 快取的狀態數上限（連續傾斜的狀態共用基底，只佔少量記憶體）
+        """
+        self.original = original
+        self.max_cache_bytes = max_cache_bytes
+        self.max_cached_states = max_cached_states
+        self.steps = []
+        self.position = 0
+        self._origin = PipelineState(original)
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def can_undo(self):
+        return self.position > 0
+
+    @property
+    def can_redo(self):
+        return self.position < len(self.steps)
+
+    def current(self):
+        """返回目前位置的 PipelineState"""
+        with self._lock:
+            return self._state_at(self.position)
+
+    def push(self, operation, params=None):
+        """在目前位置之後加入一個步驟（捨棄可重做的步驟），返回新的狀態"""
+        if operation not in PIPELINE_OPERATIONS:
+            raise ValueError(f"未知的處理操作: {operation}")
+        with self._lock:
+            steps = self.steps[:self.position] + [self._make_step(operation, params)]
+            return self._commit(steps, len(steps))
+
+    def undo(self):
+        """復原一步，返回新的狀態"""
+        with self._lock:
+            if not self.can_undo:
+                raise ValueError("沒有可以復原的步驟")
+            self.position -= 1
+            return self._state_at(self.position)
+
+    def redo(self):
+        """重做一步，返回新的狀態"""
+        with self._lock:
+            if not self.can_redo:
+                raise ValueError("沒有可以重做的步驟")
+            self.position += 1
+            return self._state_at(self.position)
+
+    def update_step(self, index, params):
+        """修改第 index 步的參數，之後的步驟會以新的結果重新計算"""
+        with self._lock:
+            steps = list(self.steps)
+            steps[self._check_index(index)] = self._make_step(steps[index]["operation"], params)
+            return self._commit(steps, self.position)
+
+    def remove_step(self, index):
+        """移除第 index 步"""
+        with self._lock:
+            steps = list(self.steps)
+            del steps[self._check_index(index)]
+            return self._commit(steps, self.position - 1 if index < self.position else self.position)
+
+    def replay(self, steps):
+        """以另一組步驟取代目前的管線（例如將其他掃描的處理套用到此數據）
+
+        Args:
+            steps: [{"operation": ..., "params": {...}}, ...]，可直接使用 describe() 的 "steps"
+        """
+        with self._lock:
+            new_steps = []
+            for step in steps:
+                if step.get("operation") not in PIPELINE_OPERATIONS:
+                    raise ValueError(f"未知的處理操作: {step.get('operation')}")
+                new_steps.append(self._make_step(step["operation"], step.get("params")))
+            return self._commit(new_steps, len(new_steps))
+
+    def describe(self):
+        """返回前端使用的管線描述（遮罩只標示是否存在，不隨描述傳送）"""
+        with self._lock:
+            steps = []
+            for index, step in enumerate(self.steps):
+                params = {key: value for key, value in step["params"].items() if key != "mask"}
+                if step["params"].get("mask") is not None:
+                    params["masked"] = True
+                steps.append({"index": index, "operation": step["operation"], "params": params,
+                              "applied": index < self.position})
+            return {"steps": steps, "position": self.position,
+                    "canUndo": self.can_undo, "canRedo": self.can_redo}
+
+    def _commit(self, steps, position):
+        """以新的步驟列表計算目前的狀態；計算失敗時保留原本的步驟，失敗的步驟不會進入處理記錄"""
+        previous = self.steps, self.position
+        self.steps, self.position = steps, position
+        try:
+            return self._state_at(position)
+        except Exception:
+            self.steps, self.position = previous
+            raise
+
+    def _check_index(self, index):
+        if not 0 <= index < len(self.steps):
+            raise ValueError(f"步驟索引超出範圍: {index}（共 {len(self.steps)} 步）")
+        return index
+
+    @staticmethod
+    def _make_step(operation, params):
+        params = dict(params or {})
+        return {"operation": operation, "params": params, "key": step_key(operation, params)}
+
+    def _prefix_keys(self, count):
+        """前 1..count 個步驟的步驟鍵前綴（索引 i 為前 i 步，每次計算只建立一次）"""
+        keys, prefix = [()], ()
+        for step in self.steps[:count]:
+            prefix += (step["key"],)
+            keys.append(prefix)
+        return keys
+
+    def _state_at(self, count):
+        """返回套用前 count 個步驟後的狀態，從最近的快取結果開始計算"""
+        keys = self._prefix_keys(count)
+        start, state = 0, self._origin
+        for index in range(count, 0, -1):
+            cached = self._cache.get(keys[index])
+            if cached is not None:
+                start, state = index, cached
+                self._cache.move_to_end(keys[index])
+                break
+
+        for index in range(start, count):
+            step = self.steps[index]
+            state = self._run_step(state, step["operation"], step["params"])
+            self._cache[keys[index + 1]] = state
+        if count > start:
+            logger.debug(f"管線重新計算第 {start + 1}-{count} 步")
+        self._evict(keep=keys[count])
+        return state
+
+    def _run_step(self, state, operation, params):
+        if operation == "reset":
+            return self._origin
+        if operation == "tilt":
+            background = PlaneBackground(**state.background.to_dict())
+            fine_tune = bool(params.get("fine_tune", False))
+            background.tilt(params.get("direction"), state.base_range / (50 if fine_tune else 10))
+            return state.with_background(background)
+        if operation == "flatten" and params.get("method", "mean") == "plane":
+            options = fit_options(params)
+            if has_fit_options(options):
+                plane = PolynomialBackground.fit(state.base, 1, **options).to_plane()
+            else:
+                plane = PlaneBackground.fit(state.base)
+            return state.with_background(-plane)
+        return PipelineState(apply_operation(state.data, operation, params))
+
+    def _evict(self, keep):
+        """移除最久未使用的中間結果直到低於位元組上限（共用的基底只計算一次）"""
+        def state_arrays(state):
+            return [array for array in (state.base, state._data)
+                    if array is not None and array is not self.original]
+
+        # 每個陣列被多少個快取狀態引用，最後一個引用移除時才扣除其位元組數
+        references, total = {}, 0
+        for state in self._cache.values():
+            for array in state_arrays(state):
+                if id(array) not in references:
+                    total += array.nbytes
+                references[id(array)] = references.get(id(array), 0) + 1
+
+        while self._cache and (len(self._cache) > self.max_cached_states or total > self.max_cache_bytes):
+            for key in self._cache:
+                if key != keep:
+                    for array in state_arrays(self._cache.pop(key)):
+                        references[id(array)] -= 1
+                        if references[id(array)] == 0:
+                            total -= array.nbytes
+                    break
+            else:
+                break
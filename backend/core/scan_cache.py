@@ -0,0 +1,180 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import numpy as np
+from .cache_paths import get_user_cache_dir, get_file_identity
+from .analysis.thumbnail import make_thumbnail, encode_png
+
+logger = logging.getLogger(__name__)
+
+# 直方圖的分箱數
+HISTOGRAM_BINS = 256
+
+# 縮圖長邊像素數
+THUMBNAIL_SIZE = 128
+
+
+class ScanCache:
+    """
+    已處理掃描的磁碟快取
+
+    每個項目包含解碼後的 float32 陣列 (.npy)、統計數據與直方圖 (.json) 以及縮圖 (.png)，
+    以來源檔案身分（路徑、大小、修改時間）與解碼參數為鍵，來源變更後自動失效。
+    陣列以記憶體映射方式載入，總大小超過上限時移除最久未使用的項目。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=2 * 1024 ** 3):
+        """
+        Args:
+            cache_dir: 快取目錄，None 時使用使用者快取目錄下的 scans/
+            max_bytes: 快取總大小上限（位元組）
+        """
+        self.cache_dir = cache_dir or get_user_cache_dir('scans')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(file_path, scale, x_pixel, y_pixel):
+        """由來源檔案身分與解碼參數產生快取鍵"""
+        abs_path, size, mtime_ns = get_file_identity(file_path)
+        identity = f"{abs_path}|{size}|{mtime_ns}|{float(scale)!r}|{int(x_pixel)}|{int(y_pixel)}"
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.npy', base + '.json', base + '.png'
+
+    def get(self, file_path, scale, x_pixel, y_pixel):
+        """返回快取項目，未命中時返回 None
+
+        Returns:
+            dict: 'data'（記憶體映射的 float32 陣列）、'statistics'、'histogram'、'thumbnailPath'
+        """
+        try:
+            key = self.make_key(file_path, scale, x_pixel, y_pixel)
+        except OSError:
+            return None
+
+        data_path, meta_path, thumb_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            data = np.load(data_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        # 更新存取時間供 LRU 淘汰使用
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+        logger.info(f"掃描快取命中: {os.path.basename(file_path)}")
+        return {
+            "key": key,
+            "data": data,
+            "statistics": meta.get("statistics"),
+            "histogram": meta.get("histogram"),
+            "thumbnailPath": thumb_path if os.path.exists(thumb_path) else None
+        }
+
+    def put(self, file_path, scale, x_pixel, y_pixel, data, statistics=None):
+        """將解碼後的數據寫入快取，並計算直方圖與縮圖
+
+        Args:
+            data: 2D numpy數組，會以 float32 儲存
+            statistics: 呼叫端計算的統計數據字典
+
+        Returns:
+            與 get() 相同格式的快取項目
+        """
+        key = self.make_key(file_path, scale, x_pixel, y_pixel)
+        data_path, meta_path, thumb_path = self._paths(key)
+        data32 = np.asarray(data, dtype=np.float32)
+
+        finite = data32[np.isfinite(data32)]
+        counts, edges = np.histogram(finite, bins=HISTOGRAM_BINS) if finite.size else (np.zeros(0), np.zeros(0))
+        meta = {
+            "source": os.path.abspath(file_path),
+            "shape": list(data32.shape),
+            "statistics": statistics,
+            "histogram": {"counts": counts.astype(int).tolist(), "edges": edges.tolist()}
+        }
+
+        with self._lock:
+            try:
+                # 先寫入暫存檔再改名，避免其他執行緒讀到不完整的檔案
+                tmp_path = data_path + '.tmp.npy'
+                np.save(tmp_path, data32)
+                os.replace(tmp_path, data_path)
+                with open(thumb_path, 'wb') as f:
+                    f.write(encode_png(make_thumbnail(data32, THUMBNAIL_SIZE)))
+                with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(meta, f)
+                os.replace(meta_path + '.tmp', meta_path)
+            except OSError as e:
+                logger.warning(f"寫入掃描快取失敗: {str(e)}")
+                return {"key": key, "data": data32, "statistics": statistics,
+                        "histogram": meta["histogram"], "thumbnailPath": None}
+
+            self._evict()
+
+        return self.get(file_path, scale, x_pixel, y_pixel) or {
+            "key": key, "data": data32, "statistics": statistics,
+            "histogram": meta["histogram"], "thumbnailPath": None
+        }
+
+    def _evict(self):
+        """總大小超過上限時，依最後存取時間移除最舊的項目"""
+        entries = {}
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                key = entry.name.split('.', 1)[0]
+                stat = entry.stat()
+                size, atime = entries.get(key, (0, 0))
+                if entry.name.endswith('.json'):
+                    atime = stat.st_mtime
+                entries[key] = (size + stat.st_size, atime)
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            logger.info(f"掃描快取淘汰項目: {key}")
+
+    def clear(self):
+        """清空快取目錄"""
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_scan_cache():
+    """返回共用的掃描快取，位於使用者快取目錄"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ScanCache()
+        return _default_cache
@@ -0,0 +1,177 @@
+import os
+import time
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from .metadata_cache import get_metadata_cache
+from .folder_index import get_folder_index
+from .parsers.int_parser import IntParser
+
+logger = logging.getLogger(__name__)
+
+
+def _to_float(value, default=None):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+
+class ScanLoader:
+    """
+    多通道掃描載入器
+
+    一個 .txt 標頭列出多個 .int 通道（TopoFwd、TopoBwd、電流、鎖相等），
+    此類別以執行緒池同時解碼全部或指定的通道，返回共用尺寸、各自帶有比例與單位的數據組。
+    檔案讀取與 numpy 運算都會釋放 GIL，因此多執行緒可以有效重疊磁碟與解碼時間。
+    """
+
+    def __init__(self, txt_path, max_workers=None, dtype=np.float64):
+        self.txt_path = os.path.abspath(txt_path)
+        self.directory = os.path.dirname(self.txt_path)
+        self.max_workers = max_workers
+        self.dtype = np.dtype(dtype)
+        self.parameters, self.file_descriptions = get_metadata_cache().get_header(self.txt_path)
+
+    @property
+    def dimensions(self):
+        """掃描尺寸：像素數與掃描範圍"""
+        params = self.parameters
+        return {
+            "width": int(_to_float(params.get("xPixel"), 512)),
+            "height": int(_to_float(params.get("yPixel"), 512)),
+            "xRange": _to_float(params.get("XScanRange"), 100.0),
+            "yRange": _to_float(params.get("YScanRange"), 100.0)
+        }
+
+    def list_channels(self):
+        """返回標頭中所有存在於磁碟上的 .int 通道描述"""
+        channels = []
+        for desc in self.file_descriptions:
+            file_name = desc.get("FileName", "")
+            if not file_name.lower().endswith(".int"):
+                continue
+            path = os.path.join(self.directory, file_name)
+            if not os.path.exists(path):
+                continue
+            channels.append({
+                "caption": desc.get("Caption", os.path.splitext(file_name)[0]),
+                "fileName": file_name,
+                "path": path,
+                "scale": _to_float(desc.get("Scale"), 1.0),
+                "offset": _to_float(desc.get("Offset"), 0.0),
+                "physUnit": desc.get("PhysUnit", "")
+            })
+        return channels
+
+    def load(self, channels=None):
+        """同時載入多個通道
+
+        Args:
+            channels: 要載入的通道標題列表（如 ["TopoFwd", "TopoBwd"]），None 表示全部
+
+        Returns:
+            dict: 數據組
+                - 'txtPath': 標頭檔案路徑
+                - 'parameters': 標頭參數
+                - 'dimensions': 共用的掃描尺寸
+                - 'channels': {通道標題: {'data', 'scale', 'offset', 'physUnit', 'fileName', 'path'}}
+                - 'loadTime': 總載入時間（秒）
+        """
+        start_time = time.perf_counter()
+        dimensions = self.dimensions
+        available = self.list_channels()
+        if channels is not None:
+            wanted = set(channels)
+            available = [channel for channel in available if channel["caption"] in wanted]
+            missing = wanted - {channel["caption"] for channel in available}
+            if missing:
+                logger.warning(f"找不到通道: {', '.join(sorted(missing))}")
+
+        def load_channel(channel):
+            parser = IntParser(channel["path"], channel["scale"], dimensions["width"], dimensions["height"],
+                               dtype=self.dtype)
+            return dict(channel, data=parser.parse())
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            loaded = list(executor.map(load_channel, available))
+
+        load_time = time.perf_counter() - start_time
+        logger.info(f"已載入 {len(loaded)} 個通道: {os.path.basename(self.txt_path)}，"
+                    f"耗時 {load_time * 1000:.1f} ms")
+
+        return {
+            "txtPath": self.txt_path,
+            "parameters": self.parameters,
+            "dimensions": dimensions,
+            "channels": {channel["caption"]: channel for channel in loaded},
+            "loadTime": load_time
+        }
+
+
+def _channel_scan(record, channel):
+    """返回掃描中指定通道的處理資訊，沒有此通道時返回 None"""
+    loader = ScanLoader(record.txt_path)
+    found = next((c for c in loader.list_channels() if channel in c["fileName"]), None)
+    if found is None:
+        return None
+    dimensions = loader.dimensions
+    return {
+        "key": f"{record.prefix}_{record.number}",
+        "prefix": record.prefix,
+        "number": record.number,
+        "txtPath": record.txt_path,
+        "intPath": found["path"],
+        "caption": found["caption"],
+        "scale": found["scale"],
+        "physUnit": found["physUnit"],
+        "width": dimensions["width"],
+        "height": dimensions["height"],
+        "xRange": dimensions["xRange"],
+        "yRange": dimensions["yRange"]
+    }
+
+
+def list_folder_scans(directory, channel="TopoFwd", number_range=None):
+    """
+    列出資料夾中所有含指定通道的掃描（依編號排序）
+
+    Args:
+        directory: 資料夾路徑
+        channel: 通道（檔名包含此字串的 .int）
+        number_range: (起始, 結束) 編號，包含兩端；None 表示全部
+
+    Returns:
+        [{"key", "prefix", "number", "txtPath", "intPath", "caption", "scale", "physUnit",
+          "width", "height", "xRange", "yRange"}, ...]
+    """
+    index = get_folder_index(directory)
+    scans = []
+    for key in index.list_scans('number_asc'):
+        record = index.scans.get(key)
+        if record is None or not record.txt_path:
+            continue
+        if number_range is not None and not int(number_range[0]) <= record.number <= int(number_range[1]):
+            continue
+        try:
+            scan = _channel_scan(record, channel)
+            if scan is not None:
+                scans.append(scan)
+        except Exception as e:
+            logger.warning(f"無法讀取掃描 {record.txt_path}: {str(e)}")
+    return scans
+
+
+def find_scan(file_path, channel="TopoFwd"):
+    """
+    返回 .txt 標頭或 .int 通道檔案所屬掃描的處理資訊（格式同 list_folder_scans）
+
+    .int 檔案使用該檔案本身的通道，.txt 標頭使用 channel 指定的通道；找不到時返回 None。
+    """
+    file_path = os.path.abspath(file_path)
+    record = get_folder_index(os.path.dirname(file_path)).get_scan_for_file(file_path)
+    if record is None or not record.txt_path:
+        return None
+    if file_path.lower().endswith(".int"):
+        channel = os.path.basename(file_path)
+    return _channel_scan(record, channel)
@@ -0,0 +1,143 @@
+import os
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from .folder_index import get_folder_index
+from .cache_paths import get_file_identity
+
+logger = logging.getLogger(__name__)
+
+
+class ScanPrefetcher:
+    """
+    相鄰掃描的背景預載器
+
+    使用者通常依編號逐一瀏覽掃描（_456、_457、_458），開啟一個掃描後，
+    此類別在背景執行緒中依序載入前後 radius 個掃描的預覽結果，存入有上限的 LRU 快取。
+    每次開啟新的掃描都會遞增世代編號，舊世代尚未執行的預載工作會被捨棄。
+    快取鍵包含掃描所有檔案的大小與修改時間，檔案被改寫後不會返回過期的結果。
+    """
+
+    def __init__(self, loader, radius=2, max_entries=12):
+        """
+        Args:
+            loader: 載入函式 loader(txt_path, *args)，返回要快取的結果；
+                返回 None 表示只預熱了其他快取（如解碼後的掃描），不保存結果
+            radius: 前後各預載的掃描數
+            max_entries: 快取的最大項目數
+        """
+        self.loader = loader
+        self.radius = radius
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    @staticmethod
+    def _make_key(txt_path, args):
+        return (ScanPrefetcher._scan_identity(txt_path),) + tuple(args)
+
+    @staticmethod
+    def _scan_identity(txt_path):
+        """返回掃描 .txt 標頭與所有通道檔案的 (路徑, 大小, 修改時間 ns)"""
+        paths = [txt_path]
+        try:
+            index = get_folder_index(os.path.dirname(os.path.abspath(txt_path)), refresh=False)
+            record = index.get_scan_for_file(txt_path)
+            if record is not None:
+                paths += sorted(index.get_channels(record).values())
+        except Exception as e:
+            logger.warning(f"查找掃描通道失敗: {str(e)}")
+
+        identity = []
+        for path in paths:
+            try:
+                identity.append(get_file_identity(path))
+            except OSError:
+                identity.append((os.path.abspath(path), None, None))
+        return tuple(identity)
+
+    def get(self, txt_path, *args):
+        """返回已預載的結果，未命中時返回 None"""
+        key = self._make_key(txt_path, args)
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+        if result is not None:
+            logger.info(f"預載命中: {os.path.basename(txt_path)}")
+        return result
+
+    def schedule(self, txt_path, *args):
+        """以 txt_path 為目前開啟的掃描，排程載入其相鄰掃描
+
+        args 會原樣傳給 loader（如色彩映射與通道），並作為快取鍵的一部分。
+        """
+        try:
+            neighbors = get_folder_index(os.path.dirname(os.path.abspath(txt_path))).get_neighbor_scans(
+                txt_path, self.radius)
+        except Exception as e:
+            logger.warning(f"查找相鄰掃描失敗: {str(e)}")
+            return
+
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        for record in neighbors:
+            self._queue.put((generation, record.txt_path, tuple(args)))
+        self._ensure_thread()
+
+    def cancel(self):
+        """捨棄所有尚未執行的預載工作"""
+        with self._lock:
+            self._generation += 1
+
+    def clear(self):
+        """取消預載並清空快取"""
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="ScanPrefetcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            generation, txt_path, args = self._queue.get()
+            try:
+                self._prefetch(generation, txt_path, args)
+            finally:
+                self._queue.task_done()
+
+    def _prefetch(self, generation, txt_path, args):
+        key = self._make_key(txt_path, args)
+        with self._lock:
+            if generation != self._generation:
+                return
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return
+
+        try:
+            result = self.loader(txt_path, *args)
+        except Exception as e:
+            logger.warning(f"預載掃描失敗: {txt_path}: {str(e)}")
+            return
+        if result is None or isinstance(result, dict) and not result.get("success", True):
+            return
+
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        logger.debug(f"已預載掃描: {os.path.basename(txt_path)}")
+
+    def wait_idle(self):
+        """等待佇列中的預載工作全部處理完"""
+        self._queue.join()
@@ -0,0 +1,208 @@
+import os
+import time
+import base64
+import hashlib
+import logging
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .cache_paths import get_user_cache_dir, get_file_identity
+from .scan_loader import list_folder_scans
+from .parsers.int_parser import IntParser
+from .analysis.background import PlaneBackground
+from .analysis.thumbnail import make_thumbnail, apply_lut, encode_png, colormap_lut
+
+logger = logging.getLogger(__name__)
+
+# 縮圖處理方式改變時遞增，使舊的快取失效
+THUMBNAIL_VERSION = 1
+
+
+def render_thumbnail(int_path, scale, x_pixel, y_pixel, lut, size=128):
+    """
+    在工作程序中產生單一掃描的縮圖 PNG 位元組
+
+    解碼 .int、去除擬合平面、以區域平均縮小到 size 並套用色彩查找表。
+    只依賴 numpy，不載入 matplotlib。
+    """
+    data = IntParser(int_path, scale, x_pixel, y_pixel, dtype=np.float32).parse()
+    leveled = (-PlaneBackground.fit(data)).apply(data)
+    return encode_png(apply_lut(make_thumbnail(leveled, size), lut))
+
+
+class ThumbnailCache:
+    """以檔案身分（路徑、大小、修改時間）與縮圖設定為鍵的 PNG 磁碟快取"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or get_user_cache_dir('thumbnails')
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_path, size, colormap):
+        abs_path, file_size, mtime_ns = get_file_identity(file_path)
+        identity = f"{abs_path}|{file_size}|{mtime_ns}|{int(size)}|{colormap}|{THUMBNAIL_VERSION}"
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.png')
+
+    def get(self, key):
+        """返回快取的 PNG 位元組，未命中時返回 None"""
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, png):
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"寫入縮圖快取失敗: {str(e)}")
+
+
+class ThumbnailGenerator:
+    """
+    資料夾縮圖產生器
+
+    為資料夾中每個掃描產生固定大小、平面校正後套用固定色彩映射的縮圖。
+    快取命中的縮圖立即返回，其餘交給程序池平行產生，完成後寫入磁碟快取，
+    並以批次方式（每 batch_interval 秒）傳給 on_results 回呼，前端可以邊產生邊顯示。
+    """
+
+    def __init__(self, directory, size=128, colormap="viridis", channel="TopoFwd", max_workers=None,
+                 on_results=None, cache=None, batch_interval=0.2):
+        """
+        Args:
+            directory: 資料夾路徑
+            size: 縮圖長邊像素數
+            colormap: 色彩映射名稱
+            channel: 用於縮圖的通道（檔名包含此字串的 .int）
+            max_workers: 程序池大小，None 時為 CPU 數
+            on_results: 回呼函式，參數為 {"directory", "thumbnails", "done", "total", "finished"}
+            cache: ThumbnailCache，None 時使用使用者快取目錄
+            batch_interval: 合併推送結果的間隔（秒）
+        """
+        self.directory = os.path.abspath(directory)
+        self.size = int(size)
+        self.colormap = colormap
+        self.channel = channel
+        self.max_workers = max_workers
+        self.on_results = on_results
+        self.cache = cache or ThumbnailCache()
+        self.batch_interval = batch_interval
+        self.total = 0
+        self.done = 0
+        self._pending = []
+        self._last_flush = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def collect_jobs(self):
+        """列出資料夾中所有含指定通道的掃描"""
+        jobs = list_folder_scans(self.directory, self.channel)
+        for job in jobs:
+            job["cacheKey"] = ThumbnailCache.make_key(job["intPath"], self.size, self.colormap)
+        return jobs
+
+    def start(self):
+        """在背景執行緒中產生縮圖，返回掃描總數"""
+        self.stop()
+        self._stop_event.clear()
+        jobs = self.collect_jobs()
+        self.total = len(jobs)
+        self._thread = threading.Thread(target=self.run, args=(jobs,), name="ThumbnailGenerator", daemon=True)
+        self._thread.start()
+        return self.total
+
+    def stop(self, timeout=None):
+        """停止產生，尚未開始的工作會被取消"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def run(self, jobs=None):
+        """產生所有縮圖（阻塞），返回縮圖結果列表"""
+        start_time = time.perf_counter()
+        if jobs is None:
+            jobs = self.collect_jobs()
+        self.total = len(jobs)
+        self.done = 0
+        results = []
+
+        # 先返回快取命中的縮圖
+        misses = []
+        for job in jobs:
+            png = self.cache.get(job["cacheKey"])
+            if png is None:
+                misses.append(job)
+            else:
+                results.append(self._emit(job, png, cached=True))
+
+        if misses and not self._stop_event.is_set():
+            lut = colormap_lut(self.colormap)
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {
+                    pool.submit(render_thumbnail, job["intPath"], job["scale"], job["width"], job["height"],
+                                lut, self.size): job
+                    for job in misses
+                }
+                for future in as_completed(futures):
+                    if self._stop_event.is_set():
+                        for pending in futures:
+                            pending.cancel()
+                        break
+                    job = futures[future]
+                    try:
+                        png = future.result()
+                    except Exception as e:
+                        logger.warning(f"產生縮圖失敗: {job['intPath']}: {str(e)}")
+                        self.done += 1
+                        continue
+                    self.cache.put(job["cacheKey"], png)
+                    results.append(self._emit(job, png, cached=False))
+
+        self._flush(finished=True)
+        logger.info(f"縮圖產生完成: {self.directory}，{len(results)}/{self.total} 個"
+                    f"（快取命中 {len(jobs) - len(misses)}），耗時 {time.perf_counter() - start_time:.2f} 秒")
+        return results
+
+    def _emit(self, job, png, cached):
+        self.done += 1
+        thumbnail = {
+            "key": job["key"],
+            "number": job["number"],
+            "txtPath": job["txtPath"],
+            "image": base64.b64encode(png).decode('ascii'),
+            "cached": cached
+        }
+        self._pending.append(thumbnail)
+        if time.perf_counter() - self._last_flush >= self.batch_interval:
+            self._flush()
+        return thumbnail
+
+    def _flush(self, finished=False):
+        self._last_flush = time.perf_counter()
+        if self.on_results is None or not (self._pending or finished):
+            self._pending = []
+            return
+        batch, self._pending = self._pending, []
+        try:
+            self.on_results({
+                "directory": self.directory,
+                "thumbnails": batch,
+                "done": self.done,
+                "total": self.total,
+                "finished": finished
+            })
+        except Exception as e:
+            logger.error(f"縮圖結果回呼失敗: {str(e)}")
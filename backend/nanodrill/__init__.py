@@ -0,0 +1 @@
+"""Nanodrill 的無介面命令列工具（見 nanodrill.cli）"""
@@ -0,0 +1,8 @@
+import sys
+import multiprocessing
+from .cli import main
+
+if __name__ == '__main__':
+    # 批次處理使用程序池，打包後的執行檔需要此呼叫
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+Nanodrill 命令列介面
+
+不需要視窗、pywebview 或前端開發伺服器，直接對檔案與資料夾執行載入、處理、統計、剖面與匯出：
+
+    python -m nanodrill info <資料夾 | .txt | .int>
+    python -m nanodrill stats <路徑...> --step flatten:method=polyfit,degree=1 [--output stats.csv]
+    python -m nanodrill export <.txt | .int> --output scan.npy|scan.csv|scan.png [--step ...]
+    python -m nanodrill profile <.txt | .int> --start ROW COL --end ROW COL [--output profile.csv]
+    python -m nanodrill batch <資料夾> --range 100 200 --recipe recipe.json [--output-dir 輸出資料夾]
+    python -m nanodrill bench <.txt | .int> --repeat 10 --step ...
+
+處理步驟與數據集管線相同：--step 的格式為「操作:參數=值,參數=值」，值以 JSON 解析
+（例如 degree=2、robust=true），也可以用 --recipe 讀取批次處理輸出的 recipe.json 或步驟列表。
+只在匯出彩色影像時才載入 matplotlib（用於色彩映射），其餘指令不需要 matplotlib 或 plotly。
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import numpy as np
+from core.scan_loader import ScanLoader, list_folder_scans, find_scan
+from core.parsers.int_parser import IntParser
+from core.analysis_service import AnalysisService
+from core.processing_pipeline import ProcessingPipeline, PIPELINE_OPERATIONS
+from core.batch_processor import BatchProcessor, STATISTICS_FIELDS
+from core.analysis.int_analysis import IntAnalysis
+from core.analysis.profile_analysis import ProfileAnalysis
+from core.analysis.thumbnail import normalize_to_uint8, colormap_lut, apply_lut, encode_png
+
+logger = logging.getLogger(__name__)
+
+
+class CommandError(Exception):
+    """命令列參數或輸入檔案無法使用（顯示訊息並以狀態碼 1 結束）"""
+
+
+def parse_step(text):
+    """解析 --step 的「操作:參數=值,參數=值」格式"""
+    operation, _, arguments = text.partition(":")
+    operation = operation.strip()
+    if operation not in PIPELINE_OPERATIONS:
+        raise CommandError(f"未知的處理操作: {operation}（可用: {', '.join(PIPELINE_OPERATIONS)}）")
+    params = {}
+    for item in filter(None, (part.strip() for part in arguments.split(","))):
+        name, separator, value = item.partition("=")
+        if not separator:
+            raise CommandError(f"無法解析步驟參數: {item}（格式為 參數=值）")
+        try:
+            params[name.strip()] = json.loads(value)
+        except ValueError:
+            params[name.strip()] = value.strip()
+    return {"operation": operation, "params": params}
+
+
+def load_steps(args):
+    """合併 --recipe 與 --step 指定的處理步驟"""
+    steps = []
+    if getattr(args, "recipe", None):
+        with open(args.recipe, "r", encoding="utf-8") as f:
+            recipe = json.load(f)
+        steps.extend(recipe["steps"] if isinstance(recipe, dict) else recipe)
+    steps.extend(parse_step(text) for text in getattr(args, "step", None) or [])
+    return steps
+
+
+def resolve_scans(paths, channel="TopoFwd", number_range=None):
+    """將資料夾、.txt 標頭與 .int 檔案路徑展開為掃描列表"""
+    scans = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = list_folder_scans(path, channel, number_range)
+            if not found:
+                logger.warning(f"資料夾中沒有含 {channel} 通道的掃描: {path}")
+            scans.extend(found)
+            continue
+        if not os.path.exists(path):
+            raise CommandError(f"檔案不存在: {path}")
+        scan = find_scan(path, channel)
+        if scan is None:
+            raise CommandError(f"找不到掃描標頭或 {channel} 通道: {path}")
+        scans.append(scan)
+    return scans
+
+
+def resolve_scan(path, channel="TopoFwd"):
+    """返回單一掃描（指令只接受一個檔案時使用）"""
+    if os.path.isdir(path):
+        raise CommandError(f"此指令需要 .txt 或 .int 檔案: {path}")
+    return resolve_scans([path], channel)[0]
+
+
+def load_scan_data(scan, steps=None):
+    """以與 GUI 相同的方式載入掃描（經由掃描快取的 float32 陣列）並套用處理步驟"""
+    data, _ = AnalysisService.load_scan(scan["intPath"], scan["scale"], scan["width"], scan["height"])
+    if steps:
+        data = ProcessingPipeline(data).replay(steps).data
+    return data
+
+
+def open_output(path):
+    """返回輸出檔案（None 或 "-" 表示標準輸出）"""
+    if path in (None, "-"):
+        return _StdoutWriter()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+class _StdoutWriter:
+    """可用於 with 敘述、但不會關閉標準輸出的包裝"""
+
+    def __enter__(self):
+        return sys.stdout
+
+    def __exit__(self, *exc_info):
+        sys.stdout.flush()
+
+
+def command_info(args):
+    """列出掃描的尺寸與通道"""
+    rows = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            scans = list_folder_scans(path, args.channel, args.range)
+        else:
+            scans = resolve_scans([path], args.channel)
+        for scan in scans:
+            loader = ScanLoader(scan["txtPath"])
+            rows.append(dict(scan, channels=[channel["caption"] for channel in loader.list_channels()]))
+
+    if args.json:
+        json.dump(rows, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for row in rows:
+            print(f"{row['key']}\t{row['width']}x{row['height']} px\t"
+                  f"{row['xRange']:g}x{row['yRange']:g}\t{', '.join(row['channels'])}")
+    return 0
+
+
+def command_stats(args):
+    """計算每個掃描處理後的統計數據"""
+    steps = load_steps(args)
+    scans = resolve_scans(args.paths, args.channel, args.range)
+    rows, failed = [], 0
+    for scan in scans:
+        row = {"number": scan["number"], "key": scan["key"], "txtPath": scan["txtPath"],
+               "width": scan["width"], "height": scan["height"]}
+        try:
+            row.update(IntAnalysis.get_topo_stats(load_scan_data(scan, steps)))
+        except Exception as e:
+            logger.error(f"處理失敗: {scan['txtPath']}: {str(e)}")
+            row["error"] = str(e)
+            failed += 1
+        rows.append(row)
+
+    with open_output(args.output) as f:
+        if args.json:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        else:
+            fields = ("number", "key", "txtPath", "width", "height") + STATISTICS_FIELDS + ("error",)
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+    return 1 if failed else 0
+
+
+def command_export(args):
+    """匯出處理後的陣列（.npy、.csv）或影像（.png）"""
+    scan = resolve_scan(args.path, args.channel)
+    data = load_scan_data(scan, load_steps(args))
+    extension = os.path.splitext(args.output)[1].lower()
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    if extension == ".npy":
+        np.save(args.output, data.astype(args.dtype, copy=False))
+    elif extension == ".csv":
+        np.savetxt(args.output, data, delimiter=",", fmt="%.8g")
+    elif extension == ".png":
+        # PNG 第一列為影像頂端，與預覽圖 origin='lower' 的方向一致
+        with open(args.output, "wb") as f:
+            f.write(encode_png(apply_lut(normalize_to_uint8(data)[::-1], colormap_lut(args.colormap))))
+    else:
+        raise CommandError(f"不支援的輸出格式: {extension}（可用: .npy、.csv、.png）")
+    logger.info(f"已匯出 {scan['key']} 到 {args.output}")
+    return 0
+
+
+def command_profile(args):
+    """擷取兩點之間的線性剖面"""
+    scan = resolve_scan(args.path, args.channel)
+    data = load_scan_data(scan, load_steps(args))
+    # 以 X 方向的每像素物理尺寸換算距離
+    pixel_size = scan["xRange"] / scan["width"] if scan["width"] else 1.0
+    profile = IntAnalysis.get_line_profile(data, args.start, args.end, pixel_size)
+    if not profile["height"]:
+        raise CommandError(f"無法擷取剖面: {args.start} -> {args.end}")
+    profile["roughness"] = ProfileAnalysis.calculate_roughness(profile["height"])
+
+    with open_output(args.output) as f:
+        if args.json:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        else:
+            writer = csv.writer(f)
+            writer.writerow(("distance", "height"))
+            writer.writerows(zip(profile["distance"], profile["height"]))
+    return 0
+
+
+def command_batch(args):
+    """以程序池批次處理資料夾"""
+    def report(progress):
+        if args.quiet:
+            return
+        sys.stderr.write(f"\r{progress['done']}/{progress['total']} 個掃描"
+                         f"（失敗 {progress['failed']}），{progress['elapsed']:.1f} 秒")
+        if progress["finished"]:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+    processor = BatchProcessor(
+        args.folder, load_steps(args), output_dir=args.output_dir, channel=args.channel,
+        number_range=args.range, colormap=args.colormap, save_arrays=not args.no_arrays,
+        save_images=not args.no_images, max_workers=args.workers, on_progress=report
+    )
+    try:
+        results = processor.run()
+    except KeyboardInterrupt:
+        processor.stop()
+        raise
+    print(processor.csv_path)
+    return 1 if processor.failed or not results else 0
+
+
+def command_bench(args):
+    """量測解碼、每個處理步驟與統計數據的耗時"""
+    steps = load_steps(args)
+    scan = resolve_scan(args.path, args.channel)
+    names = ["load"] + [f"{step['operation']} {json.dumps(step['params'], sort_keys=True)}" for step in steps]
+    names.append("statistics")
+    timings = {name: [] for name in names}
+
+    for _ in range(max(1, args.repeat)):
+        start = time.perf_counter()
+        # 不經過快取以量測解碼時間，轉為與 GUI 相同的 float32
+        data = IntParser(scan["intPath"], scan["scale"], scan["width"], scan["height"]).parse().astype(np.float32)
+        timings["load"].append(time.perf_counter() - start)
+
+        pipeline = ProcessingPipeline(data)
+        for name, step in zip(names[1:], steps):
+            start = time.perf_counter()
+            data = pipeline.push(step["operation"], step.get("params")).data
+            timings[name].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        IntAnalysis.get_topo_stats(data)
+        timings["statistics"].append(time.perf_counter() - start)
+
+    rows = [{"step": name, "median_ms": 1000 * float(np.median(values)), "min_ms": 1000 * min(values)}
+            for name, values in timings.items()]
+    if args.json:
+        json.dump({"scan": scan["key"], "shape": [scan["height"], scan["width"]], "repeat": args.repeat,
+                   "timings": rows}, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print(f"{scan['key']} ({scan['width']}x{scan['height']})，重複 {args.repeat} 次")
+        for row in rows:
+            print(f"{row['median_ms']:10.2f} ms  (最快 {row['min_ms']:.2f} ms)  {row['step']}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="nanodrill", description="Nanodrill SPM 數據處理命令列工具")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="顯示處理記錄（-vv 顯示除錯記錄）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_channel(sub):
+        sub.add_argument("--channel", default="TopoFwd", help="處理的通道（檔名包含此字串的 .int），預設 TopoFwd")
+
+    def add_range(sub):
+        sub.add_argument("--range", nargs=2, type=int, metavar=("START", "END"),
+                         help="只處理此範圍內的掃描編號（包含兩端）")
+
+    def add_steps(sub):
+        sub.add_argument("--step", action="append", metavar="OPERATION:PARAM=VALUE,...",
+                         help="處理步驟，可重複，例如 flatten:method=polyfit,degree=1 或 tilt:direction=up")
+        sub.add_argument("--recipe", help="處理步驟的 JSON 檔案（步驟列表或批次處理的 recipe.json）")
+
+    sub = commands.add_parser("info", help="列出掃描的尺寸與通道")
+    sub.add_argument("paths", nargs="+", help="資料夾、.txt 標頭或 .int 檔案")
+    add_channel(sub)
+    add_range(sub)
+    sub.add_argument("--json", action="store_true", help="以 JSON 輸出")
+    sub.set_defaults(handler=command_info)
+
+    sub = commands.add_parser("stats", help="計算處理後的統計數據")
+    sub.add_argument("paths", nargs="+", help="資料夾、.txt 標頭或 .int 檔案")
+    add_channel(sub)
+    add_range(sub)
+    add_steps(sub)
+    sub.add_argument("--output", help="輸出檔案，預設為標準輸出")
+    sub.add_argument("--json", action="store_true", help="以 JSON 輸出（預設為 CSV）")
+    sub.set_defaults(handler=command_stats)
+
+    sub = commands.add_parser("export", help="匯出處理後的陣列或影像")
+    sub.add_argument("path", help=".txt 標頭或 .int 檔案")
+    sub.add_argument("--output", required=True, help="輸出檔案，依副檔名為 .npy、.csv 或 .png")
+    add_channel(sub)
+    add_steps(sub)
+    sub.add_argument("--dtype", default="float32", help=".npy 的數據型別，預設 float32")
+    sub.add_argument("--colormap", default="viridis", help=".png 的色彩映射，預設 viridis")
+    sub.set_defaults(handler=command_export)
+
+    sub = commands.add_parser("profile", help="擷取兩點之間的線性剖面")
+    sub.add_argument("path", help=".txt 標頭或 .int 檔案")
+    sub.add_argument("--start", nargs=2, type=float, required=True, metavar=("ROW", "COL"), help="起點像素座標")
+    sub.add_argument("--end", nargs=2, type=float, required=True, metavar=("ROW", "COL"), help="終點像素座標")
+    add_channel(sub)
+    add_steps(sub)
+    sub.add_argument("--output", help="輸出檔案，預設為標準輸出")
+    sub.add_argument("--json", action="store_true", help="以 JSON 輸出剖面、統計與粗糙度（預設為 CSV）")
+    sub.set_defaults(handler=command_profile)
+
+    sub = commands.add_parser("batch", help="以程序池批次處理資料夾")
+    sub.add_argument("folder", help="資料夾路徑")
+    sub.add_argument("--output-dir", help="輸出資料夾，預設為資料夾下的 nanodrill_batch")
+    add_channel(sub)
+    add_range(sub)
+    add_steps(sub)
+    sub.add_argument("--workers", type=int, help="程序池大小，預設為 CPU 數")
+    sub.add_argument("--colormap", default="viridis", help="輸出影像的色彩映射，預設 viridis")
+    sub.add_argument("--no-arrays", action="store_true", help="不寫入處理後的陣列（.npy）")
+    sub.add_argument("--no-images", action="store_true", help="不寫入處理後的影像（.png）")
+    sub.add_argument("--quiet", action="store_true", help="不顯示進度")
+    sub.set_defaults(handler=command_batch)
+
+    sub = commands.add_parser("bench", help="量測載入、處理步驟與統計數據的耗時")
+    sub.add_argument("path", help=".txt 標頭或 .int 檔案")
+    add_channel(sub)
+    add_steps(sub)
+    sub.add_argument("--repeat", type=int, default=10, help="重複次數，預設 10")
+    sub.add_argument("--json", action="store_true", help="以 JSON 輸出")
+    sub.set_defaults(handler=command_bench)
+    return parser
+
+
+def main(argv=None):
+    """命令列進入點，返回結束狀態碼"""
+    args = build_parser().parse_args(argv)
+    level = logging.WARNING if args.verbose == 0 else logging.INFO if args.verbose == 1 else logging.DEBUG
+    logging.basicConfig(level=level, format="%(levelname)s %(name)s: %(message)s", stream=sys.stderr)
+    try:
+        return args.handler(args)
+    except CommandError as e:
+        sys.stderr.write(f"nanodrill: {e}\n")
+        return 1
+    except KeyboardInterrupt:
+        sys.stderr.write("\n已中斷\n")
+        return 130
+    except BrokenPipeError:
+        # 輸出被提前關閉（例如接到 head），不再寫入標準輸出
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+比較舊有逐參數 re.search 解析與單次走訪標頭解析的效能
+
+此腳本將測試標頭複製成數千個檔案，再分別以兩種方式解析整個資料夾。
+使用方式：
+    python benchmark_txt_header.py [檔案數量]
+
+範例：
+    python benchmark_txt_header.py
+    python benchmark_txt_header.py 5000
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+
+# 添加父目錄到系統路徑以便引入模組
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.parsers.txt_header import read_txt_header
+
+# 預設測試檔案路徑
+DEFAULT_TEST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'testfiles', '20250425_Janus Stacking SiO2_13K_457.txt')
+
+LEGACY_PARAMETERS = [
+    'Version', 'Date', 'Time', 'UserName',
+    'SetPoint', 'SetPointPhysUnit', 'FeedBackModus', 'Bias', 'BiasPhysUnit',
+    'Ki', 'Kp', 'FeedbackOnCh', 'XScanRange', 'YScanRange', 'XPhysUnit',
+    'YPhysUnit', 'Speed', 'LineRate', 'Angle', 'xPixel', 'yPixel',
+    'yCenter', 'xCenter', 'LockInFreq', 'LockInFreqPhysUnit', 'LockInAmpl',
+    'LockInAmplPhysUnit'
+]
+
+
+def legacy_parse(file_path):
+    """舊有實作：每個參數各自以 re.search 掃描整個內容"""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+
+    parameters = {}
+    for param in LEGACY_PARAMETERS:
+        match = re.search(fr'{param}\s*:\s*([^\n]+)', content)
+        if match:
+            parameters[param] = match.group(1).strip()
+
+    file_descriptions = []
+    for desc_content in re.findall(r'FileDescBegin(.*?)FileDescEnd', content, re.DOTALL):
+        desc = {}
+        for key in ('FileName', 'Caption', 'Scale', 'PhysUnit', 'Offset'):
+            match = re.search(fr'{key}\s*:\s*([^\n]+)', desc_content)
+            if match:
+                desc[key] = match.group(1).strip()
+        file_descriptions.append(desc)
+
+    return parameters, file_descriptions
+
+
+def time_folder(parse_func, paths):
+    """解析資料夾內所有標頭並返回耗時（秒）"""
+    start = time.perf_counter()
+    for path in paths:
+        parse_func(path)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+
+    folder = tempfile.mkdtemp(prefix='nanodrill_bench_')
+    try:
+        paths = []
+        for i in range(count):
+            path = os.path.join(folder, f'bench_{i}.txt')
+            shutil.copyfile(DEFAULT_TEST_FILE, path)
+            paths.append(path)
+
+        # 預熱檔案系統快取
+        time_folder(legacy_parse, paths)
+
+        legacy_time = time_folder(legacy_parse, paths)
+        tokenizer_time = time_folder(read_txt_header, paths)
+
+        print(f"標頭數量: {count}")
+        print(f"舊有 re.search 解析: {legacy_time:.3f} s")
+        print(f"單次走訪解析:       {tokenizer_time:.3f} s")
+        print(f"加速倍數:           {legacy_time / tokenizer_time:.1f}x")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+測試陣列的二進位傳輸編碼
+"""
+
+import os
+import sys
+import json
+import base64
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from core.array_transport import encode_array, decode_array, encode_profile, decode_profile
+
+
+def test_binary_roundtrip():
+    """float32/float64 編碼應為 little-endian 緩衝區並可完整還原"""
+    data = np.linspace(-1.5, 2.5, 12).reshape(3, 4)
+
+    encoded = encode_array(data, "float64")
+    assert encoded["shape"] == [3, 4] and encoded["dtype"] == "float64"
+    assert base64.b64decode(encoded["data"]) == data.astype('<f8').tobytes()
+    assert np.array_equal(decode_array(json.loads(json.dumps(encoded))), data)
+
+    encoded = encode_array(data, "float32")
+    decoded = decode_array(encoded)
+    assert decoded.dtype == np.float32 and decoded.flags.writeable
+    assert np.allclose(decoded, data, rtol=1e-6)
+
+    # 預設仍為巢狀列表
+    assert encode_array(data) == data.tolist()
+    assert np.array_equal(decode_array(data.tolist()), data)
+
+
+def test_quantized_roundtrip():
+    """量化編碼的誤差應在半個量化間隔內，NaN 以 nodata 保留"""
+    data = np.random.default_rng(0).normal(size=(40, 30))
+    data[5, 7] = np.nan
+
+    for encoding, nodata in (("uint16", 65535), ("uint8", 255)):
+        encoded = encode_array(data, encoding)
+        assert encoded["nodata"] == nodata
+        assert encoded["offset"] == np.nanmin(data)
+        assert len(base64.b64decode(encoded["data"])) == data.size * np.dtype(encoding).itemsize
+
+        decoded = decode_array(encoded)
+        assert np.isnan(decoded[5, 7])
+        assert np.nanmax(np.abs(decoded - data)) <= encoded["scale"] / 2 + 1e-12
+        assert np.isclose(np.nanmax(decoded), np.nanmax(data))
+
+    # 常數影像不應除以零
+    assert np.array_equal(decode_array(encode_array(np.full((3, 3), 2.0), "uint16")), np.full((3, 3), 2.0))
+
+
+def test_profile_encoding():
+    """剖面的 distance/height 應被編碼，其他欄位保持不變"""
+    profile = {"distance": [0.0, 0.5, 1.0], "height": [1.0, 2.0, 3.0], "length": 1.0, "stats": {}}
+    encoded = encode_profile(profile, "float32")
+
+    assert encoded["length"] == 1.0
+    assert encoded["height"]["encoding"] == "base64"
+    assert decode_profile(encoded) == profile
+    assert encode_profile(profile) is profile
+
+
+if __name__ == "__main__":
+    test_binary_roundtrip()
+    test_quantized_roundtrip()
+    test_profile_encoding()
+    print("陣列傳輸編碼測試通過")
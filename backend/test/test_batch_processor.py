@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+測試資料夾批次處理
+"""
+
+import os
+import sys
+import csv
+import json
+import shutil
+import threading
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import core.scan_cache
+from core.batch_processor import BatchProcessor, CSV_FIELDS
+from core.cache_paths import CACHE_DIR_ENV
+from core.analysis_service import AnalysisService
+from core.parsers.int_parser import IntParser
+from core.processing_pipeline import ProcessingPipeline
+from core.analysis.int_analysis import IntAnalysis
+from test_thumbnail_service import _make_folder, PREFIX
+
+STEPS = [
+    {"operation": "flatten", "params": {"method": "polyfit", "degree": 1}},
+    {"operation": "flatten", "params": {"method": "plane"}},
+]
+
+
+def test_batch_writes_statistics_arrays_and_images():
+    """編號範圍內的掃描應以相同步驟處理，與 GUI 同樣經由掃描快取載入 float32 數據，統計結果一致"""
+    folder = _make_folder([1, 2, 3, 4])
+    # 工作程序使用暫存的快取目錄（fork 時沿用主程序的 _default_cache，因此一併清除）
+    default_cache, cache_env = core.scan_cache._default_cache, os.environ.get(CACHE_DIR_ENV)
+    os.environ[CACHE_DIR_ENV] = os.path.join(folder, 'cache')
+    core.scan_cache._default_cache = None
+    try:
+        progress = []
+        processor = BatchProcessor(folder, STEPS, number_range=(2, 3), max_workers=2,
+                                   on_progress=progress.append, progress_interval=0)
+        results = processor.run()
+
+        assert [result["number"] for result in results] == [2, 3]
+        assert progress[-1]["finished"] and not progress[-1]["cancelled"]
+        assert progress[-1]["done"] == 2 and progress[-1]["failed"] == 0
+        assert sum(len(report["results"]) for report in progress) == 2
+
+        # 工作程序已將掃描寫入快取，GUI 開啟同一掃描時載入相同的數據
+        job = processor.collect_jobs()[0]
+        data = IntParser(job["intPath"], job["scale"], job["width"], job["height"]).parse().astype(np.float32)
+        assert len([name for name in os.listdir(os.path.join(folder, 'cache', 'scans')) if name.endswith('.npy')]) == 2
+        gui_data, _ = AnalysisService.load_scan(job["intPath"], job["scale"], job["width"], job["height"])
+        assert isinstance(gui_data, np.memmap) and np.array_equal(gui_data, data)
+
+        expected = ProcessingPipeline(gui_data).replay(STEPS).data
+        saved = np.load(results[0]["arrayPath"])
+        assert saved.dtype == np.float32 and np.array_equal(saved, expected)
+        assert results[0]["statistics"] == IntAnalysis.get_topo_stats(expected)
+
+        with open(results[0]["imagePath"], 'rb') as f:
+            assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+
+        with open(processor.csv_path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert tuple(rows[0].keys()) == CSV_FIELDS
+        assert [row["key"] for row in rows] == [f'{PREFIX}_2', f'{PREFIX}_3']
+        assert float(rows[0]["rms"]) == results[0]["statistics"]["rms"]
+
+        with open(os.path.join(processor.output_dir, 'recipe.json'), encoding='utf-8') as f:
+            assert json.load(f)["steps"] == STEPS
+    finally:
+        core.scan_cache._default_cache = default_cache
+        if cache_env is None:
+            os.environ.pop(CACHE_DIR_ENV, None)
+        else:
+            os.environ[CACHE_DIR_ENV] = cache_env
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_batch_reports_failures_and_stops():
+    """無法處理的掃描記錄在 CSV 的 error 欄位；停止後不再處理其餘掃描"""
+    folder = _make_folder([1, 2])
+    try:
+        # 截斷第 2 個掃描的數據檔
+        with open(os.path.join(folder, f'{PREFIX}_2TopoFwd.int'), 'r+b') as f:
+            f.truncate(100)
+        processor = BatchProcessor(folder, STEPS, save_images=False, max_workers=1)
+        results = processor.run()
+        assert processor.failed == 1
+        assert results[0].get("error") is None and results[1]["error"]
+        assert results[0]["imagePath"] is None and os.path.exists(results[0]["arrayPath"])
+
+        processor = BatchProcessor(folder, STEPS, output_dir=os.path.join(folder, 'stopped'))
+        processor.stop()
+        assert processor.run() == []
+        with open(processor.csv_path, newline='', encoding='utf-8') as f:
+            assert list(csv.DictReader(f)) == []
+
+        try:
+            BatchProcessor(folder, [{"operation": "unknown"}])
+            assert False, "未知的操作應該失敗"
+        except ValueError:
+            pass
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_batch_stop_records_finished_scans():
+    """處理中途停止時，已寫入輸出檔的掃描都應記錄在 CSV；逾時未結束的執行緒不應被視為已停止"""
+    folder = _make_folder([1, 2, 3, 4, 5, 6])
+    try:
+        progress = []
+
+        def on_progress(report):
+            progress.append(report)
+            processor.stop()
+
+        processor = BatchProcessor(folder, STEPS, save_images=False, max_workers=1,
+                                   on_progress=on_progress, progress_interval=0)
+        results = processor.run()
+
+        assert progress[-1]["finished"] and progress[-1]["cancelled"]
+        assert results
+        arrays = sorted(name for name in os.listdir(processor.output_dir) if name.endswith('.npy'))
+        assert arrays == sorted(os.path.basename(result["arrayPath"]) for result in results)
+        with open(processor.csv_path, newline='', encoding='utf-8') as f:
+            assert len(list(csv.DictReader(f))) == len(results)
+
+        release = threading.Event()
+        processor._thread = threading.Thread(target=release.wait, daemon=True)
+        processor._thread.start()
+        processor.stop(timeout=0.01)
+        assert processor.is_running
+        release.set()
+        processor.stop()
+        assert not processor.is_running and processor._thread is None
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_batch_writes_statistics_arrays_and_images()
+    test_batch_reports_failures_and_stops()
+    test_batch_stop_records_finished_scans()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+測試無介面命令列工具
+"""
+
+import os
+import sys
+import csv
+import json
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from nanodrill.cli import main, parse_step, CommandError
+from test_thumbnail_service import _make_folder, PREFIX
+
+
+def test_parse_step():
+    """--step 的參數值以 JSON 解析，無法解析時保留字串"""
+    assert parse_step("flatten:method=polyfit,degree=2,robust=true") == {
+        "operation": "flatten", "params": {"method": "polyfit", "degree": 2, "robust": True}}
+    assert parse_step("reset") == {"operation": "reset", "params": {}}
+    for text in ("bogus:x=1", "tilt:direction"):
+        try:
+            parse_step(text)
+            assert False, f"{text} 應該失敗"
+        except CommandError:
+            pass
+
+
+def test_stats_export_and_profile():
+    """統計、匯出與剖面應與相同步驟的管線結果一致"""
+    folder = _make_folder([1, 2, 3])
+    output = tempfile.mkdtemp(prefix='nanodrill_cli_')
+    try:
+        stats_path = os.path.join(output, 'stats.csv')
+        assert main(['stats', folder, '--range', '2', '3', '--step', 'flatten:method=plane',
+                     '--output', stats_path]) == 0
+        with open(stats_path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert [row['key'] for row in rows] == [f'{PREFIX}_2', f'{PREFIX}_3']
+        # 與 GUI 相同以 float32 處理
+        assert abs(float(rows[0]['mean'])) < 1e-6
+
+        txt_path = os.path.join(folder, f'{PREFIX}_1.txt')
+        array_path = os.path.join(output, 'scan.npy')
+        assert main(['export', txt_path, '--output', array_path, '--step', 'flatten:method=plane']) == 0
+        array = np.load(array_path)
+        assert array.shape == (500, 500) and array.dtype == np.float32
+        assert main(['export', txt_path, '--output', os.path.join(output, 'scan.tif')]) == 1
+
+        profile_path = os.path.join(output, 'profile.json')
+        assert main(['profile', os.path.join(folder, f'{PREFIX}_1TopoFwd.int'), '--start', '10', '10',
+                     '--end', '10', '110', '--step', 'flatten:method=plane', '--json',
+                     '--output', profile_path]) == 0
+        with open(profile_path, encoding='utf-8') as f:
+            profile = json.load(f)
+        # 水平剖面的取樣點落在像素上，高度與匯出的陣列相同
+        np.testing.assert_allclose(profile['height'][0], array[10, 10], rtol=1e-5)
+        assert {'Ra', 'Rq'} <= set(profile['roughness'])
+
+        assert main(['stats', os.path.join(folder, 'missing.txt')]) == 1
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+        shutil.rmtree(output, ignore_errors=True)
+
+
+def test_headless_imports():
+    """命令列在處理與統計時不載入 matplotlib、plotly 或 pywebview"""
+    folder = _make_folder([1])
+    try:
+        script = ("import sys; from nanodrill.cli import main; "
+                  "code = main(['stats', sys.argv[1], '--step', 'flatten:method=polyfit,degree=1']); "
+                  "loaded = [m for m in ('matplotlib', 'plotly', 'webview') if m in sys.modules]; "
+                  "sys.exit(code or len(loaded))")
+        result = subprocess.run([sys.executable, '-c', script, folder], cwd=backend_path,
+                                capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.startswith('number,key,txtPath')
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_parse_step()
+    test_stats_export_and_profile()
+    test_headless_imports()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+測試 .dat 光譜檔案解析
+以合成的矩陣格式與一般欄位格式檔案驗證分塊解析結果
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from core.parsers.dat_parser import DatParser
+
+PARAMETERS = {
+    'FileDescriptions': [
+        {'FileName': 'scan_1It_to_PCFwd.int', 'Caption': 'It_to_PCFwd', 'PhysUnit': 'A'},
+        {'FileName': 'scan_1It_to_PC_Matrix.dat', 'Caption': 'X(U)-It_to_PC(4/3)',
+         'HeaderCols': '3', 'HeaderRows': '2'},
+    ]
+}
+
+
+def write_matrix_file(path, n_curves, n_points):
+    """寫入矩陣格式：兩列標頭，每列前三欄為位置資訊"""
+    axis = np.linspace(-1, 1, n_points)
+    curves = np.random.default_rng(0).normal(size=(n_curves, n_points))
+    positions = np.column_stack([np.arange(n_curves) % 4, np.arange(n_curves) // 4, np.arange(n_curves)])
+    with open(path, 'w') as f:
+        f.write('\t'.join(['0', '0', '0'] + [f'{v:.6E}' for v in axis]) + '\n')
+        f.write('\t'.join(['0'] * (3 + n_points)) + '\n')
+        for pos, curve in zip(positions, curves):
+            f.write('\t'.join([str(p) for p in pos] + [f'{v:.9E}' for v in curve]) + '\r\n')
+    return axis, positions, curves
+
+
+def test_matrix_format_in_chunks():
+    """以很小的區塊解析矩陣格式，結果應與整體相同"""
+    folder = tempfile.mkdtemp(prefix='nanodrill_test_')
+    try:
+        path = os.path.join(folder, 'scan_1It_to_PC_Matrix.dat')
+        axis, positions, curves = write_matrix_file(path, 12, 50)
+
+        parser = DatParser(path, PARAMETERS['FileDescriptions'][1], PARAMETERS, chunk_bytes=1000)
+        result = parser.parse()
+
+        assert result['channel'] == 'It_to_PC'
+        assert result['unit'] == 'A'
+        assert result['axisUnit'] == 'V'
+        assert np.allclose(result['axis'], axis)
+        assert np.array_equal(result['positions'], positions)
+        assert np.allclose(result['curves'], curves)
+        assert len(list(parser.iter_chunks())) > 1
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_column_format():
+    """一般欄位格式應取得欄位名稱與單位"""
+    folder = tempfile.mkdtemp(prefix='nanodrill_test_')
+    try:
+        path = os.path.join(folder, 'spectrum.dat')
+        bias = np.linspace(-2, 2, 1000)
+        current = bias ** 3
+        with open(path, 'w') as f:
+            f.write('Spectroscopy export\n')
+            f.write('Bias [V]\tCurrent [A]\n')
+            for b, c in zip(bias, current):
+                f.write(f'{b:.9E}\t{c:.9E}\n')
+
+        result = DatParser(path, chunk_bytes=4096).parse()
+
+        assert list(result['columns']) == ['Bias', 'Current']
+        assert result['units'] == {'Bias': 'V', 'Current': 'A'}
+        assert np.allclose(result['columns']['Bias'], bias)
+        assert np.allclose(result['columns']['Current'], current)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_matrix_format_in_chunks()
+    test_column_format()
+    print("DAT 解析測試通過")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+測試本機 HTTP 數據通道
+"""
+
+import os
+import sys
+import urllib.request
+import urllib.error
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from core.data_server import DataServer, parse_range
+from core.dataset_registry import DatasetRegistry
+
+
+def _request(server, path, token=True, headers=None):
+    request = urllib.request.Request(server.base_url + path, headers=dict(headers or {}))
+    if token:
+        request.add_header("X-Nanodrill-Token", server.token)
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_data_server_arrays_ranges_and_etags():
+    """陣列以二進位傳送，支援 Range、ETag 與權杖檢查"""
+    registry = DatasetRegistry()
+    data = np.arange(300 * 200, dtype=np.float64).reshape(300, 200)
+    handle = registry.register(data, title="test")
+    server = DataServer(registry=registry)
+    server.start()
+    try:
+        status, headers, body = _request(server, f"/datasets/{handle}/data?dtype=float32")
+        assert status == 200 and headers["X-Array-Shape"] == "300,200"
+        assert np.array_equal(np.frombuffer(body, dtype='<f4').reshape(300, 200), data)
+        etag = headers["ETag"]
+
+        # 內容未改變時返回 304，處理後 ETag 改變
+        status, _, _ = _request(server, f"/datasets/{handle}/data?dtype=float32", headers={"If-None-Match": etag})
+        assert status == 304
+        registry.get(handle).apply("tilt", {"direction": "up"})
+        status, headers, _ = _request(server, f"/datasets/{handle}/data?dtype=float32", headers={"If-None-Match": etag})
+        assert status == 200 and headers["ETag"] != etag
+
+        status, headers, part = _request(server, f"/datasets/{handle}/data?dtype=float32",
+                                         headers={"Range": "bytes=8-15"})
+        assert status == 206 and len(part) == 8
+        assert headers["Content-Range"] == f"bytes 8-15/{300 * 200 * 4}"
+        status, _, _ = _request(server, f"/datasets/{handle}/data", headers={"Range": "bytes=999999999-"})
+        assert status == 416
+
+        status, headers, tile = _request(server, f"/datasets/{handle}/tiles/0/0/1?size=128&dtype=uint16")
+        assert status == 200 and headers["X-Array-Origin"] == "0,128" and headers["X-Array-Shape"] == "128,128"
+        assert "X-Array-Scale" in headers and len(tile) == 128 * 128 * 2
+
+        status, headers, png = _request(server, f"/datasets/{handle}/image.png?colormap=gray")
+        assert status == 200 and png.startswith(b"\x89PNG")
+
+        assert _request(server, f"/datasets/{handle}/data", token=False)[0] == 403
+        assert _request(server, "/datasets/0123abcd/data")[0] == 404
+        assert _request(server, f"/datasets/{handle}/data?dtype=int7")[0] == 400
+    finally:
+        server.stop()
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-999", 100) == (0, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range(None, 100) is None
+
+
+if __name__ == "__main__":
+    test_data_server_arrays_ranges_and_etags()
+    test_parse_range()
+    print("數據通道測試通過")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+測試後端數據集登錄表
+"""
+
+import os
+import sys
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from core.dataset_registry import DatasetRegistry
+from core.analysis_service import AnalysisService
+from core.analysis.int_analysis import IntAnalysis
+from core.analysis.pyramid import ImagePyramid
+
+
+def test_register_process_and_undo():
+    """處理操作應產生新陣列並可復原為原始數據"""
+    registry = DatasetRegistry()
+    original = np.add.outer(np.arange(4.0), np.arange(6.0))
+    original.setflags(write=False)
+    handle = registry.register(original, title="scan", physUnit="nm")
+
+    dataset = registry.get(handle)
+    dataset.apply("flatten", {"method": "mean"})
+
+    assert np.allclose(registry.get(handle).data.mean(axis=1), 0)
+    assert np.array_equal(original, np.add.outer(np.arange(4.0), np.arange(6.0)))
+    assert registry.get(handle).describe()["width"] == 6
+
+    tilted = AnalysisService.apply_operation(original, "tilt", {"direction": "up"})
+    assert np.allclose(tilted, IntAnalysis.tilt_image(original, "up"))
+
+    dataset.undo()
+    assert registry.get(handle).data is original
+
+
+def test_registry_evicts_and_releases():
+    """超過上限時移除最久未使用的數據集，釋放後 handle 失效"""
+    registry = DatasetRegistry(max_datasets=2)
+    first = registry.register(np.zeros((2, 2)))
+    second = registry.register(np.zeros((2, 2)))
+    registry.get(first)
+    third = registry.register(np.zeros((2, 2)))
+
+    assert first in registry and third in registry
+    assert second not in registry
+    assert registry.release(first)
+    try:
+        registry.get(first)
+        assert False, "已釋放的 handle 應拋出 KeyError"
+    except KeyError:
+        pass
+
+
+def test_pyramid_levels_and_tiles():
+    """金字塔各層以 2x2 區域平均縮小，並依顯示尺寸選擇層級"""
+    image = np.random.default_rng(0).normal(size=(300, 500))
+    pyramid = ImagePyramid(image, min_size=64)
+
+    assert pyramid.shapes == [(300, 500), (150, 250), (75, 125), (38, 63)]
+    assert np.allclose(pyramid.get_level(1)[0, 0], image[:2, :2].mean())
+    assert pyramid.get_level(3).shape == (38, 63)
+
+    assert pyramid.level_for_viewport(200, 120) == 1
+    assert pyramid.level_for_viewport(600, 600) == 0
+    assert pyramid.level_for_viewport(50, 30) == 3
+
+    tile, (x, y) = pyramid.get_tile(0, 1, 1, tile_size=256)
+    assert (x, y) == (256, 256)
+    assert tile.shape == (44, 244)
+    assert np.array_equal(tile, image[256:, 256:])
+    assert pyramid.describe_levels(256)[0]["tilesX"] == 2
+
+
+def test_pyramid_follows_dataset_updates():
+    """數據集更新後金字塔應重新建立"""
+    registry = DatasetRegistry()
+    handle = registry.register(np.ones((128, 128)))
+    assert registry.get(handle).pyramid.get_level(1).min() == 1
+
+    registry.get(handle).apply("flatten", {"method": "mean"})
+    assert registry.get(handle).pyramid.get_level(1).max() == 0
+
+
+def test_parametric_tilt_and_plane():
+    """傾斜只累加平面係數，修正後的影像延後計算；平面校正與 plane_flatten 結果一致"""
+    registry = DatasetRegistry()
+    base = np.random.default_rng(1).normal(size=(40, 60)) + np.linspace(0, 5, 60)
+    handle = registry.register(base)
+    dataset = registry.get(handle)
+
+    AnalysisService.process_dataset(dataset, "tilt", {"direction": "up"})
+    assert dataset._state._data is None
+    assert np.allclose(dataset.data, IntAnalysis.tilt_image(base, "up"))
+    assert dataset.data is dataset.data
+
+    AnalysisService.process_dataset(dataset, "tilt", {"direction": "up"})
+    AnalysisService.process_dataset(dataset, "tilt", {"direction": "down", "fine_tune": True})
+    step = np.ptp(base) / 10
+    assert np.isclose(dataset.background.gy, 2 * step - step / 5)
+    assert dataset.base is base
+
+    # 以 handle 取剖面時只修正剖面經過的區域
+    profile = IntAnalysis.get_line_profile(dataset.state, (5, 3), (30, 41))
+    assert dataset._state._data is None
+    assert np.allclose(profile["height"], IntAnalysis.get_line_profile(dataset.data, (5, 3), (30, 41))["height"])
+    assert np.array_equal(dataset.state[2:9, 10:30], dataset.data[2:9, 10:30])
+
+    AnalysisService.process_dataset(dataset, "flatten", {"method": "plane"})
+    assert np.allclose(dataset.data, IntAnalysis.plane_flatten(base))
+
+    # 其他平面化會產生新的基底並清除平面修正
+    AnalysisService.process_dataset(dataset, "flatten", {"method": "mean"})
+    assert dataset.background.is_zero
+    assert np.allclose(dataset.data.mean(axis=1), 0)
+
+
+def test_analysis_artifacts_are_opt_in():
+    """未要求靜態預覽圖時不應繪圖，只產生要求的項目"""
+    image = np.random.default_rng(3).normal(size=(64, 64))
+    rendered = []
+    original_render = AnalysisService.render_preview
+    AnalysisService.render_preview = staticmethod(lambda *args, **kwargs: rendered.append(args) or "png")
+    try:
+        result = AnalysisService.analyze_image_data(image, "scan", 1.0, 1.0)
+        assert not rendered
+        assert "image" not in result and "rawData" in result and "statistics" in result
+
+        result = AnalysisService.analyze_image_data(image, "scan", 1.0, 1.0, artifacts=["image"])
+        assert len(rendered) == 1
+        assert result["image"] == "png" and "rawData" not in result and "statistics" not in result
+    finally:
+        AnalysisService.render_preview = original_render
+
+
+if __name__ == "__main__":
+    test_register_process_and_undo()
+    test_registry_evicts_and_releases()
+    test_pyramid_levels_and_tiles()
+    test_pyramid_follows_dataset_updates()
+    test_parametric_tilt_and_plane()
+    test_analysis_artifacts_are_opt_in()
+    print("數據集登錄表測試通過")
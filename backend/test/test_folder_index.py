@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+測試資料夾掃描索引
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from core.folder_index import FolderIndex, get_folder_index, parse_scan_filename
+from core.folder_watcher import FolderWatcher, FolderChangeQueue
+from core.scan_prefetcher import ScanPrefetcher
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testfiles')
+PREFIX = '20250425_Janus Stacking SiO2_13K'
+
+
+def test_parse_scan_filename():
+    """檔名規則應正確切出前綴、編號與通道"""
+    assert parse_scan_filename(f'{PREFIX}_457TopoFwd.int') == (PREFIX, 457, 'TopoFwd', 'int')
+    assert parse_scan_filename(f'{PREFIX}_457.txt') == (PREFIX, 457, '', 'txt')
+    assert parse_scan_filename(f'{PREFIX}_457It_to_PCFwd.int') == (PREFIX, 457, 'It_to_PCFwd', 'int')
+    assert parse_scan_filename('notes.txt') is None
+    # 通道名稱可以含底線
+    assert parse_scan_filename(f'{PREFIX}_457_Matrix.dat') == (PREFIX, 457, '_Matrix', 'dat')
+
+
+def test_index_maps_channels_to_header():
+    """通道檔案應對應到同一個 .txt 標頭"""
+    index = FolderIndex(TEST_DIR).build()
+    txt_path = os.path.join(TEST_DIR, f'{PREFIX}_457.txt')
+
+    assert index.find_txt_file(os.path.join(TEST_DIR, f'{PREFIX}_457TopoFwd.int')) == txt_path
+    assert index.find_txt_file(os.path.join(TEST_DIR, f'{PREFIX}_457Lia1RBwd.int')) == txt_path
+    assert index.find_txt_file(os.path.join(TEST_DIR, f'{PREFIX}_457It_to_PCFwd.int')) == txt_path
+
+    records = index.get_scans_by_number(457)
+    assert len(records) == 1
+    channels = index.get_channels(records[0])
+    assert f'{PREFIX}_457TopoBwd.int' in channels
+    assert len(channels) == 12
+
+    # .bmp 不屬於掃描檔案
+    assert f'{PREFIX}_457Topo  Fwd.bmp' not in index.files
+
+
+def test_shared_index_is_reused():
+    """資料夾內容未變更時應重用同一個索引"""
+    assert get_folder_index(TEST_DIR) is get_folder_index(TEST_DIR)
+
+
+def test_watcher_applies_deltas():
+    """輪詢模式下新增與刪除的檔案應以增量方式套用到索引"""
+    folder = tempfile.mkdtemp(prefix='nanodrill_test_')
+    watcher = None
+    try:
+        txt_name = f'{PREFIX}_457.txt'
+        int_name = f'{PREFIX}_457TopoFwd.int'
+        shutil.copyfile(os.path.join(TEST_DIR, txt_name), os.path.join(folder, txt_name))
+
+        received = []
+        watcher = FolderWatcher(folder, on_changes=received.append, poll_interval=0.1, use_inotify=False)
+        watcher.start()
+
+        shutil.copyfile(os.path.join(TEST_DIR, int_name), os.path.join(folder, int_name))
+        deadline = time.time() + 5
+        while not received and time.time() < deadline:
+            time.sleep(0.05)
+
+        assert received and [info['name'] for info in received[0]['added']] == [int_name]
+        index = get_folder_index(folder, refresh=False)
+        assert index.find_txt_file(int_name) == os.path.join(os.path.abspath(folder), txt_name)
+
+        os.remove(os.path.join(folder, txt_name))
+        deadline = time.time() + 5
+        while len(received) < 2 and time.time() < deadline:
+            time.sleep(0.05)
+
+        assert received[1]['removed'] == [txt_name]
+        assert index.find_txt_file(int_name) is None
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_change_queue_coalesces_per_file():
+    """未取走的變更應依檔名合併為淨變更"""
+    def info(name, size):
+        return {"name": name, "size": size}
+
+    queue = FolderChangeQueue()
+    assert queue.drain() is None
+    for size in range(100):
+        queue.push({"directory": "d", "added": [], "modified": [info("a.int", size)], "removed": []})
+    queue.push({"directory": "d", "added": [info("b.int", 0)], "modified": [], "removed": []})
+    queue.push({"directory": "d", "added": [], "modified": [info("b.int", 1)], "removed": []})
+    queue.push({"directory": "d", "added": [info("c.int", 0)], "modified": [], "removed": []})
+    queue.push({"directory": "d", "added": [], "modified": [], "removed": ["c.int", "e.txt"]})
+    queue.push({"directory": "d", "added": [], "modified": [], "removed": ["f.int"]})
+    queue.push({"directory": "d", "added": [info("f.int", 2)], "modified": [], "removed": []})
+    assert len(queue) == 4
+
+    changes = queue.drain()
+    assert changes["added"] == [info("b.int", 1)]
+    assert changes["modified"] == [info("a.int", 99), info("f.int", 2)]
+    assert changes["removed"] == ["e.txt"]
+    assert queue.drain() is None
+
+    # 切換資料夾時捨棄舊資料夾的變更
+    queue.push({"directory": "d", "added": [info("a.int", 0)], "modified": [], "removed": []})
+    queue.push({"directory": "other", "added": [], "modified": [], "removed": ["x.txt"]})
+    assert queue.drain() == {"directory": "other", "added": [], "modified": [], "removed": ["x.txt"]}
+
+
+def test_grouped_listing_pages():
+    """分組列表應包含所有通道，且分頁資訊正確"""
+    index = FolderIndex(TEST_DIR).build()
+
+    listing = index.get_listing(group_by_scan=True)
+    assert listing['total'] == 1
+    scan = listing['items'][0]
+    assert scan['number'] == 457
+    assert scan['header']['name'] == f'{PREFIX}_457.txt'
+    assert len(scan['channels']) == 12
+
+    listing = index.get_listing(sort_option='name_desc', page=1, page_size=5)
+    assert listing['total'] == 13
+    assert listing['totalPages'] == 3
+    assert len(listing['items']) == 5
+    names = index.list_files('name_desc')
+    assert [item['name'] for item in listing['items']] == names[5:10]
+
+    # 以已載入的項目數接續載入
+    listing = index.get_listing(sort_option='name_desc', page_size=4, offset=3)
+    assert [item['name'] for item in listing['items']] == names[3:7]
+
+    # 資料夾變更涉及的掃描：存在的返回目前描述，不存在的返回掃描鍵
+    scans, removed = index.describe_scans_for_files([f'{PREFIX}_457TopoFwd.int', f'{PREFIX}_457.txt',
+                                                     'gone_9.txt', 'notes.txt'])
+    assert [scan['key'] for scan in scans] == [f'{PREFIX}_457']
+    assert len(scans[0]['channels']) == 12
+    assert removed == ['gone_9']
+
+
+def test_prefetch_neighbor_scans():
+    """開啟掃描後應在背景載入編號相鄰的掃描，跳到別處時捨棄舊的預載工作"""
+    folder = tempfile.mkdtemp(prefix='nanodrill_test_')
+    try:
+        for number in range(1, 8):
+            with open(os.path.join(folder, f'scan_{number}.txt'), 'w') as f:
+                f.write('')
+        txt = lambda number: os.path.join(folder, f'scan_{number}.txt')
+
+        neighbors = get_folder_index(folder).get_neighbor_scans(txt(4), radius=2)
+        assert [record.number for record in neighbors] == [5, 3, 6, 2]
+
+        loaded = []
+
+        def loader(txt_path, colormap):
+            loaded.append(os.path.basename(txt_path))
+            return {"success": True, "path": txt_path, "colormap": colormap}
+
+        prefetcher = ScanPrefetcher(loader, radius=1)
+        prefetcher.schedule(txt(4), 'viridis')
+        prefetcher.wait_idle()
+        assert sorted(loaded) == ['scan_3.txt', 'scan_5.txt']
+        assert prefetcher.get(txt(5), 'viridis')["path"] == txt(5)
+        assert prefetcher.get(txt(5), 'Oranges') is None
+
+        # 已取消的世代不應再載入
+        prefetcher.cancel()
+        prefetcher._queue.put((0, txt(7), ('viridis',)))
+        prefetcher.wait_idle()
+        assert 'scan_7.txt' not in loaded
+
+        # 檔案被改寫後不應返回過期的預載結果
+        with open(txt(5), 'w') as f:
+            f.write('rewritten')
+        assert prefetcher.get(txt(5), 'viridis') is None
+
+        # 只預熱其他快取的載入函式（返回 None）不保存結果
+        warmed = []
+        prefetcher = ScanPrefetcher(lambda txt_path: warmed.append(txt_path), radius=1)
+        prefetcher.schedule(txt(4))
+        prefetcher.wait_idle()
+        assert sorted(warmed) == [txt(3), txt(5)]
+        assert prefetcher.get(txt(5)) is None
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_parse_scan_filename()
+    test_index_maps_channels_to_header()
+    test_shared_index_is_reused()
+    test_grouped_listing_pages()
+    test_watcher_applies_deltas()
+    test_change_queue_coalesces_per_file()
+    test_prefetch_neighbor_scans()
+    print("資料夾索引測試通過")
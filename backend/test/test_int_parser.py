@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+測試 IntParser 的向量化解碼
+以逐像素 struct.unpack 的舊有實作作為參考結果進行比對
+"""
+
+import os
+import sys
+import struct
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from core.parsers.int_parser import IntParser, LazyIntArray
+from core.analysis.int_analysis import IntAnalysis
+from core.scan_loader import ScanLoader
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testfiles')
+TEST_FILE = os.path.join(TEST_DIR, '20250425_Janus Stacking SiO2_13K_457TopoFwd.int')
+TEST_TXT = os.path.join(TEST_DIR, '20250425_Janus Stacking SiO2_13K_457.txt')
+SCALE = -2.60913687478663E-0007
+PIXELS = 500
+
+
+def reference_parse(file_path, scale, x_pixel, y_pixel):
+    """逐像素解碼的參考實作"""
+    with open(file_path, 'rb') as f:
+        int_file = f.read()
+    values = [struct.unpack('<i', int_file[4*i:4*i+4])[0] for i in range(len(int_file) // 4)]
+    return np.flipud(np.array(values).reshape(y_pixel, x_pixel) * scale)
+
+
+def test_parse_matches_reference():
+    """向量化解碼結果應與逐像素解碼完全一致"""
+    parser = IntParser(TEST_FILE, SCALE, PIXELS, PIXELS)
+    data = parser.parse()
+
+    expected = reference_parse(TEST_FILE, SCALE, PIXELS, PIXELS)
+    assert data.shape == (PIXELS, PIXELS)
+    assert data.dtype == np.float64
+    assert np.array_equal(data, expected)
+    assert parser.load_time is not None and parser.load_time >= 0
+
+
+def test_parse_float32():
+    """指定 float32 輸出時應保留數值精度"""
+    data = IntParser(TEST_FILE, SCALE, PIXELS, PIXELS, dtype=np.float32).parse()
+
+    expected = reference_parse(TEST_FILE, SCALE, PIXELS, PIXELS)
+    assert data.dtype == np.float32
+    assert np.allclose(data, expected, rtol=1e-6)
+
+
+def test_memmap_matches_parse():
+    """記憶體映射的列範圍與矩形區域讀取應與完整解析一致"""
+    parser = IntParser(TEST_FILE, SCALE, PIXELS, PIXELS)
+    data = parser.parse()
+    scan = parser.open_memmap()
+
+    assert isinstance(scan, LazyIntArray)
+    assert scan.shape == data.shape
+    assert np.array_equal(scan.read_rows(10, 20), data[10:20])
+    assert np.array_equal(scan.read_window(100, 150, 30, 90), data[100:150, 30:90])
+    assert np.array_equal(scan[::7, ::3], data[::7, ::3])
+    assert np.array_equal(np.asarray(scan), data)
+
+    blocks = [block for _, block in scan.iter_row_blocks(128)]
+    assert np.array_equal(np.vstack(blocks), data)
+    scan.close()
+
+
+def test_line_profile_on_memmap():
+    """剖面在記憶體映射數據上的結果應與完整陣列相同"""
+    parser = IntParser(TEST_FILE, SCALE, PIXELS, PIXELS)
+    data = parser.parse()
+    scan = parser.open_memmap()
+
+    expected = IntAnalysis.get_line_profile(data, (12.5, 40.2), (300.7, 250.1))
+    profile = IntAnalysis.get_line_profile(scan, (12.5, 40.2), (300.7, 250.1))
+    assert np.allclose(profile['height'], expected['height'])
+    assert profile['length'] == expected['length']
+
+
+def test_scan_loader_channels():
+    """多通道載入應與單獨解析的結果一致，並帶有各自的單位"""
+    bundle = ScanLoader(TEST_TXT).load(["TopoFwd", "Lia1XFwd"])
+
+    assert set(bundle["channels"]) == {"TopoFwd", "Lia1XFwd"}
+    assert bundle["dimensions"]["width"] == PIXELS
+    topo = bundle["channels"]["TopoFwd"]
+    assert topo["physUnit"] == "nm"
+    assert np.array_equal(topo["data"], IntParser(TEST_FILE, SCALE, PIXELS, PIXELS).parse())
+    assert bundle["channels"]["Lia1XFwd"]["physUnit"] == "A"
+
+    assert len(ScanLoader(TEST_TXT).load()["channels"]) == 12
+
+
+if __name__ == "__main__":
+    test_parse_matches_reference()
+    test_parse_float32()
+    test_memmap_matches_parse()
+    test_line_profile_on_memmap()
+    test_scan_loader_channels()
+    print("IntParser 測試通過")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+測試數據集處理管線
+"""
+
+import os
+import sys
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+import core.processing_pipeline as processing_pipeline
+from core.processing_pipeline import ProcessingPipeline
+from core.dataset_registry import DatasetRegistry
+from core.analysis.int_analysis import IntAnalysis
+
+
+def _scan(seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(40, 50)) + np.linspace(0, 3, 50) + np.linspace(0, 2, 40)[:, np.newaxis]
+
+
+def _count_operations():
+    """包裝 apply_operation 以計算實際執行的非參數化步驟數"""
+    calls = []
+    original = processing_pipeline.apply_operation
+
+    def counting(image_data, operation, params=None):
+        calls.append((operation, dict(params or {})))
+        return original(image_data, operation, params)
+    processing_pipeline.apply_operation = counting
+    return calls, original
+
+
+def test_undo_redo_reuses_cached_states():
+    """復原與重做使用快取的中間結果，不重新計算"""
+    scan = _scan()
+    pipeline = ProcessingPipeline(scan)
+    calls, original = _count_operations()
+    try:
+        flattened = pipeline.push("flatten", {"method": "polyfit", "degree": 1})
+        tilted = pipeline.push("tilt", {"direction": "up"})
+        assert tilted.base is flattened.base and len(calls) == 1
+
+        assert pipeline.undo() is flattened
+        assert pipeline.undo().base is scan
+        assert pipeline.redo() is flattened
+        assert pipeline.redo() is tilted
+        assert len(calls) == 1
+        assert np.allclose(tilted.data, IntAnalysis.tilt_image(IntAnalysis.linewise_flatten_polyfit(scan, 1), "up"))
+
+        # 復原後加入新步驟會捨棄可重做的步驟
+        pipeline.undo()
+        pipeline.push("flatten", {"method": "plane"})
+        assert [step["operation"] for step in pipeline.describe()["steps"]] == ["flatten", "flatten"]
+        assert not pipeline.can_redo
+    finally:
+        processing_pipeline.apply_operation = original
+
+
+def test_update_recomputes_from_changed_step():
+    """修改某一步只重新計算該步與之後的步驟"""
+    pipeline = ProcessingPipeline(_scan())
+    pipeline.push("flatten", {"method": "polyfit", "degree": 1})
+    pipeline.push("flatten", {"method": "mean"})
+    pipeline.push("flatten", {"method": "polyfit", "degree": 2})
+
+    calls, original = _count_operations()
+    try:
+        pipeline.update_step(1, {"method": "polyfit", "degree": 3})
+        assert [params.get("degree") for _, params in calls] == [3, 2]
+
+        # 改回原本的參數時，之後的結果仍在快取中
+        calls.clear()
+        pipeline.update_step(1, {"method": "mean"})
+        assert calls == []
+
+        pipeline.remove_step(0)
+        assert len(calls) == 2 and pipeline.position == 2
+    finally:
+        processing_pipeline.apply_operation = original
+
+
+def test_cache_evicts_least_recently_used_states():
+    """快取超過位元組上限時移除最久未使用的結果，共用基底的傾斜狀態只計算一次位元組數"""
+    scan = _scan()
+    pipeline = ProcessingPipeline(scan, max_cache_bytes=2 * scan.nbytes)
+    for degree in (1, 2, 3):
+        pipeline.push("flatten", {"method": "polyfit", "degree": degree})
+    for _ in range(5):
+        pipeline.push("tilt", {"direction": "up"})
+    # 傾斜狀態共用第 3 步的基底（修正後的陣列尚未計算），只有第 1 步被移除
+    assert len(pipeline._cache) == 7
+    assert [len(key) for key in pipeline._cache] == list(range(2, 9))
+
+    # 計算修正後的陣列並加入新基底後超過上限；傾斜狀態全部移除後第 3 步的基底才不再計入
+    pipeline.current().data
+    pipeline.push("flatten", {"method": "mean"})
+    assert [len(key) for key in pipeline._cache] == [9]
+
+
+def test_replay_pipeline_on_another_scan():
+    """同一組步驟套用到其他掃描，結果與直接處理相同；reset 步驟可復原"""
+    registry = DatasetRegistry()
+    first = registry.get(registry.register(_scan(1)))
+    second = registry.get(registry.register(_scan(2)))
+
+    first.apply("flatten", {"method": "polyfit", "degree": 2})
+    first.apply("tilt", {"direction": "left", "fine_tune": True})
+    first.apply("flatten", {"method": "plane", "robust": True})
+    second.replay(first.pipeline.describe()["steps"])
+
+    expected = IntAnalysis.linewise_flatten_polyfit(second.original, 2)
+    expected = IntAnalysis.plane_flatten(expected, robust=True)
+    assert np.allclose(second.data, expected)
+    assert second.version == 1
+
+    statistics = first.statistics
+    first.apply("reset")
+    assert first.data is first.original
+    first.undo()
+    assert first.statistics is statistics
+
+
+def test_failed_step_is_not_recorded():
+    """參數錯誤的步驟應拋出錯誤，且不進入處理記錄"""
+    registry = DatasetRegistry()
+    dataset = registry.get(registry.register(_scan()))
+    dataset.apply("flatten", {"method": "mean"})
+    describe = dataset.pipeline.describe()
+
+    for params in ({"method": "plane", "mask": np.ones((5, 5), dtype=bool)},
+                   {"method": "polyfit", "threshold": "high"}):
+        try:
+            dataset.apply("flatten", params)
+            assert False, params
+        except ValueError:
+            pass
+        assert dataset.pipeline.describe() == describe
+        assert dataset.version == 1
+
+    try:
+        dataset.pipeline.update_step(0, {"method": "mean", "mask": np.ones((5, 5), dtype=bool)})
+        assert False, "遮罩尺寸錯誤應該失敗"
+    except ValueError:
+        pass
+    assert dataset.pipeline.describe() == describe
+
+
+if __name__ == "__main__":
+    test_undo_redo_reuses_cached_states()
+    test_update_recomputes_from_changed_step()
+    test_cache_evicts_least_recently_used_states()
+    test_replay_pipeline_on_another_scan()
+    test_failed_step_is_not_recorded()
+    print("處理管線測試通過")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+測試向量化的逐行平面化
+"""
+
+import os
+import sys
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from core.analysis.row_flatten import flatten_rows_polynomial, flatten_rows_mean
+from core.analysis.background import PolynomialBackground, surface_terms, normalized_axes
+from core.analysis.int_analysis import IntAnalysis
+
+
+def _polyfit_rows(image_data, degree):
+    """逐列 np.polyfit 的參考實作"""
+    result = image_data.copy()
+    x = np.arange(image_data.shape[1])
+    for i in range(image_data.shape[0]):
+        result[i] -= np.poly1d(np.polyfit(x, result[i], degree))(x)
+    return result
+
+
+def test_polynomial_matches_polyfit():
+    """各階數結果與逐列 np.polyfit 相同，float32 輸入保持 float32"""
+    rng = np.random.default_rng(0)
+    image = rng.normal(size=(64, 200)).cumsum(axis=1)
+    for degree in (0, 1, 2, 4):
+        assert np.allclose(flatten_rows_polynomial(image, degree), _polyfit_rows(image, degree), atol=1e-9)
+
+    result = flatten_rows_polynomial(image.astype(np.float32), 2)
+    assert result.dtype == np.float32
+    assert np.allclose(result, _polyfit_rows(image, 2), atol=1e-3)
+
+    # 原地運算
+    work = image.copy()
+    assert flatten_rows_polynomial(work, 1, out=work) is work
+    assert np.allclose(work, _polyfit_rows(image, 1), atol=1e-9)
+
+
+def test_mean_flatten():
+    image = np.arange(12).reshape(3, 4)
+    result = flatten_rows_mean(image)
+    assert result.dtype == np.float64
+    assert np.allclose(result, image - image.mean(axis=1, keepdims=True))
+
+
+def test_polynomial_background_matches_lstsq():
+    """由動差求得的曲面係數與設計矩陣的 lstsq 結果相同，可原地扣除"""
+    rng = np.random.default_rng(1)
+    v, u = normalized_axes((90, 120))
+    u, v = u[np.newaxis, :], v[:, np.newaxis]
+    image = 1 + 2 * u - 3 * v + 0.5 * u * u + 0.7 * u * v - 0.2 * v ** 3 + rng.normal(scale=0.01, size=(90, 120))
+
+    for order in (1, 2, 3):
+        design = np.column_stack([np.broadcast_to(u ** i * v ** j, image.shape).ravel()
+                                  for i, j in surface_terms(order)])
+        expected = np.linalg.lstsq(design, image.ravel(), rcond=None)[0]
+        background = PolynomialBackground.fit(image, order)
+        assert np.allclose(background.coefficients, expected)
+        assert np.allclose(background.subtract(image), image - background.evaluate(image.shape))
+
+    work = image.astype(np.float32)
+    assert PolynomialBackground.fit(work, 3).subtract(work, out=work) is work
+    assert np.abs(work).max() < 0.1
+
+    # 全局平面校正與一階曲面相同，float32 輸入保持 float32
+    plane = IntAnalysis.plane_flatten(image.astype(np.float32))
+    assert plane.dtype == np.float32
+    assert np.allclose(plane, IntAnalysis.polynomial_flatten(image, 1), atol=1e-4)
+
+
+def _terraced_surface():
+    """傾斜的基底加上一塊高出 5 的島嶼"""
+    rng = np.random.default_rng(2)
+    y, x = np.mgrid[0:120, 0:160]
+    background = 0.02 * x - 0.03 * y
+    islands = np.zeros(background.shape, dtype=bool)
+    islands[20:70, 90:150] = True
+    image = background + 5.0 * islands + rng.normal(scale=0.01, size=background.shape)
+    return image, islands
+
+
+def test_masked_and_robust_plane_flatten():
+    """遮罩、閾值與穩健擬合都能排除島嶼，取樣擬合結果相近"""
+    image, islands = _terraced_surface()
+    biased = IntAnalysis.plane_flatten(image)
+    assert np.abs(biased[~islands]).max() > 0.5
+
+    for options in ({"mask": ~islands}, {"robust": True}, {"robust": True, "subsample": 3}):
+        result = IntAnalysis.plane_flatten(image, **options)
+        background = result[~islands]
+        assert np.abs(background - background.mean()).max() < 0.1, options
+        assert abs(result[islands].mean() - background.mean() - 5.0) < 0.1
+
+    # 先校平再以閾值排除高處
+    leveled = IntAnalysis.plane_flatten(image, robust=True)
+    result = IntAnalysis.polynomial_flatten(leveled, 1, threshold=2.0)
+    assert np.abs(result[~islands] - result[~islands].mean()).max() < 0.1
+
+
+def test_masked_and_robust_row_flatten():
+    """逐行擬合排除島嶼後，島嶼所在的列不再被拉低"""
+    image, islands = _terraced_surface()
+    # 均值平面化只去除每列的偏移，先扣除欄方向的斜率
+    without_slope = image - 0.02 * np.arange(image.shape[1])
+    for flatten, image in ((IntAnalysis.linewise_flatten_mean, without_slope),
+                           (lambda data, **options: IntAnalysis.linewise_flatten_polyfit(data, 1, **options), image)):
+        assert np.abs(flatten(image)[~islands]).max() > 0.5
+        for options in ({"mask": ~islands}, {"robust": True}, {"robust": True, "subsample": 2}):
+            result = flatten(image, **options)
+            assert np.abs(result[~islands]).max() < 0.1, options
+            assert abs(result[islands].mean() - 5.0) < 0.1
+
+
+def test_invalid_fit_options_raise():
+    """遮罩尺寸或閾值錯誤時應拋出 ValueError，不可靜默返回原數據；沒有擬合像素時改用所有像素"""
+    image, _ = _terraced_surface()
+    flattens = (IntAnalysis.linewise_flatten_mean, IntAnalysis.linewise_flatten_polyfit,
+                IntAnalysis.plane_flatten, IntAnalysis.polynomial_flatten)
+    for flatten in flattens:
+        for options in ({"mask": np.ones((5, 5), dtype=bool)}, {"threshold": "high"}):
+            try:
+                flatten(image, **options)
+                assert False, (flatten.__name__, options)
+            except ValueError:
+                pass
+
+    # 閾值低於所有像素：與逐行平面化相同，改以所有像素擬合
+    np.testing.assert_allclose(IntAnalysis.plane_flatten(image, threshold=image.min() - 1),
+                               IntAnalysis.plane_flatten(image), atol=1e-9)
+
+
+if __name__ == "__main__":
+    test_polynomial_matches_polyfit()
+    test_mean_flatten()
+    test_polynomial_background_matches_lstsq()
+    test_masked_and_robust_plane_flatten()
+    test_masked_and_robust_row_flatten()
+    test_invalid_fit_options_raise()
+    print("逐行平面化測試通過")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+測試已處理掃描的磁碟快取
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+import core.scan_cache
+from core.scan_cache import ScanCache
+from core.analysis_service import AnalysisService
+from core.parsers.int_parser import IntParser
+from core.analysis.thumbnail import area_downsample
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testfiles')
+TEST_FILE = os.path.join(TEST_DIR, '20250425_Janus Stacking SiO2_13K_457TopoFwd.int')
+SCALE = -2.60913687478663E-0007
+PIXELS = 500
+
+
+def test_cache_roundtrip_and_invalidation():
+    """寫入後應以記憶體映射讀回，來源變更或參數不同時不應命中"""
+    folder = tempfile.mkdtemp(prefix='nanodrill_test_')
+    try:
+        source = os.path.join(folder, 'scan_1TopoFwd.int')
+        shutil.copyfile(TEST_FILE, source)
+        cache = ScanCache(os.path.join(folder, 'cache'))
+
+        assert cache.get(source, SCALE, PIXELS, PIXELS) is None
+        data = IntParser(source, SCALE, PIXELS, PIXELS).parse()
+        cache.put(source, SCALE, PIXELS, PIXELS, data, {"min": float(data.min())})
+
+        entry = cache.get(source, SCALE, PIXELS, PIXELS)
+        assert isinstance(entry["data"], np.memmap)
+        assert entry["data"].dtype == np.float32
+        assert np.allclose(entry["data"], data, rtol=1e-6)
+        assert entry["statistics"] == {"min": float(data.min())}
+        assert sum(entry["histogram"]["counts"]) == data.size
+        with open(entry["thumbnailPath"], 'rb') as f:
+            assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+
+        assert cache.get(source, SCALE * 2, PIXELS, PIXELS) is None
+        os.utime(source, ns=(0, 0))
+        assert cache.get(source, SCALE, PIXELS, PIXELS) is None
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_cache_evicts_least_recently_used():
+    """超過大小上限時應淘汰最久未使用的項目"""
+    folder = tempfile.mkdtemp(prefix='nanodrill_test_')
+    try:
+        sources = []
+        for i in range(3):
+            source = os.path.join(folder, f'scan_{i}TopoFwd.int')
+            shutil.copyfile(TEST_FILE, source)
+            sources.append(source)
+
+        # 每個項目約 1 MB，上限只容得下兩個
+        cache = ScanCache(os.path.join(folder, 'cache'), max_bytes=2.5 * 1024 ** 2)
+        data = IntParser(TEST_FILE, SCALE, PIXELS, PIXELS).parse()
+        cache.put(sources[0], SCALE, PIXELS, PIXELS, data)
+        cache.put(sources[1], SCALE, PIXELS, PIXELS, data)
+        meta_path = cache._paths(cache.make_key(sources[0], SCALE, PIXELS, PIXELS))[1]
+        os.utime(meta_path, (1, 1))
+        cache.put(sources[2], SCALE, PIXELS, PIXELS, data)
+
+        assert cache.get(sources[0], SCALE, PIXELS, PIXELS) is None
+        assert cache.get(sources[1], SCALE, PIXELS, PIXELS) is not None
+        assert cache.get(sources[2], SCALE, PIXELS, PIXELS) is not None
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_load_scan_same_data_on_hit_and_miss():
+    """同一掃描第二次開啟（快取命中）應得到相同型別的數據與相同的處理結果"""
+    folder = tempfile.mkdtemp(prefix='nanodrill_test_')
+    default_cache = core.scan_cache._default_cache
+    try:
+        source = os.path.join(folder, 'scan_1TopoFwd.int')
+        shutil.copyfile(TEST_FILE, source)
+        core.scan_cache._default_cache = ScanCache(os.path.join(folder, 'cache'))
+
+        opened = [AnalysisService.load_scan(source, SCALE, PIXELS, PIXELS) for _ in range(2)]
+        (first, first_statistics), (second, second_statistics) = opened
+        assert first.dtype == second.dtype == np.float32
+        assert not first.flags.writeable and not second.flags.writeable
+        assert np.array_equal(first, second)
+        assert first_statistics == second_statistics
+
+        params = {"method": "plane", "robust": True}
+        assert np.array_equal(AnalysisService.apply_operation(first, "flatten", params),
+                              AnalysisService.apply_operation(second, "flatten", params))
+    finally:
+        core.scan_cache._default_cache = default_cache
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_area_downsample():
+    """區域平均縮小應正確處理無法整除的邊緣"""
+    image = np.arange(25, dtype=np.float64).reshape(5, 5)
+    small = area_downsample(image, 2)
+
+    assert small.shape == (3, 3)
+    assert small[0, 0] == np.mean([0, 1, 5, 6])
+    assert small[2, 2] == 24
+    assert small[0, 2] == np.mean([4, 9])
+
+
+if __name__ == "__main__":
+    test_cache_roundtrip_and_invalidation()
+    test_cache_evicts_least_recently_used()
+    test_load_scan_same_data_on_hit_and_miss()
+    test_area_downsample()
+    print("掃描快取測試通過")
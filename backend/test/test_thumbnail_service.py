@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+測試資料夾縮圖產生器
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from core.thumbnail_service import ThumbnailGenerator, ThumbnailCache
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testfiles')
+PREFIX = '20250425_Janus Stacking SiO2_13K'
+
+
+def _make_folder(numbers):
+    """以測試掃描複製出多個編號的掃描（只含標頭與 TopoFwd 通道）"""
+    folder = tempfile.mkdtemp(prefix='nanodrill_test_')
+    with open(os.path.join(TEST_DIR, f'{PREFIX}_457.txt'), 'r', encoding='utf-8', errors='ignore') as f:
+        header = f.read()
+    for number in numbers:
+        with open(os.path.join(folder, f'{PREFIX}_{number}.txt'), 'w', encoding='utf-8') as f:
+            f.write(header.replace(f'{PREFIX}_457', f'{PREFIX}_{number}'))
+        shutil.copyfile(os.path.join(TEST_DIR, f'{PREFIX}_457TopoFwd.int'),
+                        os.path.join(folder, f'{PREFIX}_{number}TopoFwd.int'))
+    return folder
+
+
+def test_thumbnails_stream_and_cache():
+    """縮圖應分批回呼，第二次執行全部由磁碟快取取得"""
+    folder = _make_folder([1, 2, 3])
+    try:
+        cache = ThumbnailCache(os.path.join(folder, 'cache'))
+        batches = []
+        generator = ThumbnailGenerator(folder, size=64, max_workers=2, on_results=batches.append,
+                                       cache=cache, batch_interval=0)
+        results = generator.run()
+
+        assert sorted(result["number"] for result in results) == [1, 2, 3]
+        assert not any(result["cached"] for result in results)
+        assert batches[-1]["finished"] and batches[-1]["done"] == 3
+        assert sum(len(batch["thumbnails"]) for batch in batches) == 3
+
+        results = ThumbnailGenerator(folder, size=64, cache=cache).run()
+        assert len(results) == 3 and all(result["cached"] for result in results)
+
+        # 不同的尺寸或色彩映射使用不同的快取鍵
+        int_path = os.path.join(folder, f'{PREFIX}_1TopoFwd.int')
+        assert ThumbnailCache.make_key(int_path, 64, 'viridis') != ThumbnailCache.make_key(int_path, 128, 'viridis')
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_thumbnails_stream_and_cache()
+    print("縮圖產生器測試通過")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+測試單次走訪的 .txt 標頭解析器
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+# 添加 backend 路徑到 Python 路徑
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from core.parsers.txt_header import parse_txt_header, read_txt_header, coerce_value
+from core.parsers.txt_parser import TxtParser
+from core.metadata_cache import MetadataCache
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testfiles')
+TEST_FILE = os.path.join(TEST_DIR, '20250425_Janus Stacking SiO2_13K_457.txt')
+
+
+def test_read_header_strings():
+    """預設返回原始字串，包含未列於舊清單中的參數"""
+    parameters, file_descriptions = read_txt_header(TEST_FILE)
+
+    assert parameters['Version'] == '1.12'
+    assert parameters['Time'] == '8:29:30 PM'
+    assert parameters['xPixel'] == '500'
+    assert parameters['Speed'] == '1.500 ; lines/sec'
+    assert parameters['overscan[%]'] == '0.000'
+
+    assert len(file_descriptions) == 16
+    assert file_descriptions[0] == {
+        'FileName': '20250425_Janus Stacking SiO2_13K_457TopoFwd.int',
+        'Caption': 'TopoFwd',
+        'Scale': '-2.60913687478663E-0007',
+        'PhysUnit': 'nm',
+        'Offset': '0.00000000000000E+0000',
+    }
+
+
+def test_read_header_typed():
+    """typed=True 時數值參數應轉換為 int 或 float"""
+    parameters, file_descriptions = read_txt_header(TEST_FILE, typed=True)
+
+    assert parameters['xPixel'] == 500
+    assert parameters['XScanRange'] == 5.0
+    assert parameters['Speed'] == 1.5
+    assert parameters['BiasPhysUnit'] == 'mV'
+    assert file_descriptions[0]['Scale'] == -2.60913687478663E-0007
+
+
+def test_blocks_and_comments():
+    """註解行被忽略，區段內的參數不會覆蓋區段外的同名參數"""
+    content = "\n".join([
+        ";comment : ignored",
+        "Scale : 2",
+        "FileDescBegin",
+        "FileName : a.int",
+        "Scale : 3",
+        "FileDescEnd",
+        "FileDescBegin",
+        "FileName : b.int",
+        "FileDescEnd",
+    ])
+    parameters, file_descriptions = parse_txt_header(content, typed=True)
+
+    assert parameters == {'Scale': 2}
+    assert file_descriptions == [{'FileName': 'a.int', 'Scale': 3}, {'FileName': 'b.int'}]
+    assert coerce_value('dz/dx=0.000') == 'dz/dx=0.000'
+
+
+def test_txt_parser_uses_header():
+    """TxtParser 的結果應與標頭解析一致"""
+    metadata = TxtParser(TEST_FILE).parse()
+    parameters, file_descriptions = read_txt_header(TEST_FILE)
+
+    assert metadata['fileDescriptions'] == file_descriptions
+    assert metadata['YScanRange'] == parameters['YScanRange']
+
+
+def test_metadata_cache_persistence():
+    """快取項目應持久化，並在檔案大小或修改時間變更時失效"""
+    folder = tempfile.mkdtemp(prefix='nanodrill_test_')
+    try:
+        txt_path = os.path.join(folder, 'scan_1.txt')
+        shutil.copyfile(TEST_FILE, txt_path)
+        db_path = os.path.join(folder, 'cache', 'metadata.sqlite')
+
+        cache = MetadataCache(db_path=db_path)
+        parameters, _ = cache.get_header(txt_path)
+        assert parameters['xPixel'] == '500'
+
+        # 新的快取實例應直接從磁碟取得，不再解析標頭
+        reopened = MetadataCache(db_path=db_path)
+        reopened._parse = None
+        parameters, file_descriptions = reopened.get_header(txt_path)
+        assert parameters['xPixel'] == '500'
+        assert len(file_descriptions) == 16
+        assert ';ANFATEC Parameterfile' in reopened.get_content(txt_path)
+
+        # 修改檔案後應重新解析
+        with open(txt_path, 'a') as f:
+            f.write('\nExtraKey : 42\n')
+        fresh = MetadataCache(db_path=db_path)
+        parameters, _ = fresh.get_header(txt_path)
+        assert parameters['ExtraKey'] == '42'
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_read_header_strings()
+    test_read_header_typed()
+    test_blocks_and_comments()
+    test_txt_parser_uses_header()
+    test_metadata_cache_persistence()
+    print("標頭解析測試通過")